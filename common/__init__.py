@@ -0,0 +1,9 @@
+# Modules shared by the lecture directories.
+#
+# The lecture scripts are run from their own directory, so a module that uses
+# this package first appends the repository root to sys.path:
+#
+#   _ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+#   if _ROOT not in sys.path:
+#       sys.path.append(_ROOT)      # the repository root, for common/
+#   from common.rng_streams import as_generator
@@ -0,0 +1,59 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+# An executor.map that keeps its results in order and its memory bounded.
+#
+# executor.map submits every task up front, so on a long input (chunks of a
+# large CSV, thousands of rendered frames) all of the results can pile up in
+# memory while the consumer handles the first one.  ordered_map submits at
+# most `max_in_flight` tasks ahead of the result being consumed and yields
+# the results in input order:
+#
+#   for chunk in ordered_map(transform, chunks, workers=4):
+#       sink.write(chunk)
+#
+# With workers=0 (and no executor) the tasks run inline, one at a time, which
+# is handy for debugging and for functions that can't be pickled.
+
+
+def ordered_starmap(function, arg_tuples, workers=0, max_in_flight=None, executor=None):
+    """
+    Yields function(*args) for every tuple in arg_tuples, in order.
+
+    Parameters:
+    - workers: worker processes of the pool created for this call; 0 runs
+      the tasks inline.
+    - max_in_flight: tasks submitted ahead of the result being consumed
+      (default twice the number of workers, or of CPUs for an executor).
+    - executor: an existing executor to submit to instead of creating one;
+      it is left running.
+    """
+    if executor is None and not workers:
+        for args in arg_tuples:
+            yield function(*args)
+        return
+
+    pool = executor or ProcessPoolExecutor(max_workers=workers)
+    if max_in_flight is None:
+        max_in_flight = 2 * (workers or os.cpu_count() or 1)
+    pending = deque()
+    try:
+        for args in arg_tuples:
+            pending.append(pool.submit(function, *args))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # reached early when the consumer stops or a task raised
+        for future in pending:
+            future.cancel()
+        if executor is None:
+            pool.shutdown()
+
+
+def ordered_map(function, items, workers=0, max_in_flight=None, executor=None):
+    """Yields function(item) for every item, in order; see ordered_starmap."""
+    return ordered_starmap(function, ((item,) for item in items), workers, max_in_flight, executor)
@@ -0,0 +1,202 @@
+from collections import namedtuple
+import numpy as np
+from scipy import stats
+
+
+# Two-sample t-tests for many segment pairs at once.
+#
+# The worksheet compares two groups by hand:
+#
+#   s_p_sq = ((n_A-1)*s_A**2 + (n_B-1)*s_B**2)/(n_A + n_B -2)
+#   SE = s_p * sqrt(1 / n_A + 1 / n_B)
+#   t_stat = (mean_A - mean_B) / SE
+#
+# Here every quantity is an array with one entry per segment, so thousands of
+# comparisons cost a handful of numpy operations.  Inputs are either summary
+# statistics (n, mean, std) or raw values for all segments concatenated into
+# one flat array, with offsets marking where each segment starts:
+#
+#   values  = [3.1, 2.7, 4.0,   5.2, 4.8,   ...]
+#   offsets = [0,              3,          5, ...]     (len = segments + 1)
+#
+# GroupStats keeps the per-segment sufficient statistics (count, mean, sum of
+# squared deviations) and can be updated as new batches of data arrive.
+#
+# p-values use the survival function t.sf rather than 1 - t.cdf, which rounds
+# to 0 once the p-value drops below about 1e-16.
+
+TTestResult = namedtuple("TTestResult", ["statistic", "df", "pvalue", "se"])
+
+
+def segment_ids(offsets):
+    offsets = np.asarray(offsets)
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+class GroupStats:
+    """
+    Count, mean and sum of squared deviations (m2) for each segment.
+    """
+    def __init__(self, count, mean, m2):
+        self.count = np.asarray(count, dtype=float)
+        self.mean = np.asarray(mean, dtype=float)
+        self.m2 = np.asarray(m2, dtype=float)
+
+    @classmethod
+    def empty(cls, segments):
+        return cls(np.zeros(segments), np.zeros(segments), np.zeros(segments))
+
+    @classmethod
+    def from_summary(cls, n, mean, std, ddof=1):
+        n = np.asarray(n, dtype=float)
+        return cls(n, mean, np.asarray(std, dtype=float) ** 2 * (n - ddof))
+
+    @classmethod
+    def from_segments(cls, values, offsets):
+        """
+        Statistics of each values[offsets[i]:offsets[i+1]].  Empty segments get
+        count 0 and NaN mean.
+        """
+        values = np.asarray(values, dtype=float)
+        ids = segment_ids(offsets)
+        segments = len(offsets) - 1
+        count = np.bincount(ids, minlength=segments).astype(float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.bincount(ids, weights=values, minlength=segments) / count
+        # two passes (mean first, then squared deviations) to avoid the
+        # cancellation of sum(x^2) - n * mean^2.
+        centered = values - mean[ids]
+        m2 = np.bincount(ids, weights=centered * centered, minlength=segments)
+        return cls(count, mean, m2)
+
+    def merge(self, other):
+        # Chan et al. pairwise combination; segments with no data yet are
+        # replaced by the other side.
+        n = self.count + other.count
+        safe_n = np.where(n > 0, n, 1.0)
+        self_mean = np.where(self.count > 0, self.mean, 0.0)
+        other_mean = np.where(other.count > 0, other.mean, 0.0)
+        delta = other_mean - self_mean
+        mean = self_mean + delta * other.count / safe_n
+        m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / safe_n
+        return GroupStats(n, np.where(n > 0, mean, np.nan), m2)
+
+    def update(self, values, offsets):
+        """
+        Folds in one more batch laid out with the same segments.
+        """
+        merged = self.merge(GroupStats.from_segments(values, offsets))
+        self.count, self.mean, self.m2 = merged.count, merged.mean, merged.m2
+        return self
+
+    def variance(self, ddof=1):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.m2 / (self.count - ddof)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
+
+
+def _p_value(t_stat, df, alternative):
+    if alternative == "two-sided":
+        return 2 * stats.t.sf(np.abs(t_stat), df)
+    if alternative == "greater":
+        return stats.t.sf(t_stat, df)
+    if alternative == "less":
+        return stats.t.sf(-t_stat, df)
+    raise ValueError(f"alternative must be 'two-sided', 'greater' or 'less', got {alternative!r}")
+
+
+def ttest_from_stats(group_a, group_b, equal_var=True, alternative="two-sided"):
+    """
+    Two-sample t-test for every segment.
+
+    Parameters:
+    - group_a, group_b: GroupStats with the same number of segments.
+    - equal_var: True for the pooled-variance (Student) test of the worksheet,
+      False for Welch's test with Welch-Satterthwaite degrees of freedom.
+    - alternative: 'two-sided', 'greater' (mean_A > mean_B) or 'less'.
+
+    Returns a TTestResult of arrays.  Segments with fewer than two values in
+    a group give NaN.
+    """
+    n_a, n_b = group_a.count, group_b.count
+    var_a, var_b = group_a.variance(), group_b.variance()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if equal_var:
+            df = n_a + n_b - 2
+            s_p_sq = (group_a.m2 + group_b.m2) / df
+            se = np.sqrt(s_p_sq * (1 / n_a + 1 / n_b))
+        else:
+            v_a, v_b = var_a / n_a, var_b / n_b
+            se = np.sqrt(v_a + v_b)
+            df = (v_a + v_b) ** 2 / (v_a ** 2 / (n_a - 1) + v_b ** 2 / (n_b - 1))
+        t_stat = (group_a.mean - group_b.mean) / se
+    return TTestResult(t_stat, df, _p_value(t_stat, df, alternative), se)
+
+
+def ttest_summary(mean_a, std_a, n_a, mean_b, std_b, n_b, equal_var=True, alternative="two-sided"):
+    """
+    Same as ttest_from_stats, from arrays of means, sample standard
+    deviations (ddof=1) and sizes.
+    """
+    return ttest_from_stats(GroupStats.from_summary(n_a, mean_a, std_a),
+                            GroupStats.from_summary(n_b, mean_b, std_b),
+                            equal_var=equal_var, alternative=alternative)
+
+
+def ttest_segments(values_a, offsets_a, values_b, offsets_b, equal_var=True, alternative="two-sided"):
+    """
+    Same as ttest_from_stats, from raw values of both groups in flat arrays
+    with offsets (segment i of A is compared with segment i of B).
+    """
+    if len(offsets_a) != len(offsets_b):
+        raise ValueError("both groups need the same number of segments")
+    return ttest_from_stats(GroupStats.from_segments(values_a, offsets_a),
+                            GroupStats.from_segments(values_b, offsets_b),
+                            equal_var=equal_var, alternative=alternative)
+
+
+if __name__ == "__main__":
+    import time
+
+    # the worksheet example: two classes of 25 with means 88 and 82.
+    result = ttest_summary(88, 6, 25, 82, 7, 25)
+    print(f"pooled: t = {float(result.statistic):.3f}, df = {float(result.df):.0f}, "
+          f"p = {float(result.pvalue):.5f}")
+    result = ttest_summary(88, 6, 25, 82, 7, 25, equal_var=False)
+    print(f"Welch:  t = {float(result.statistic):.3f}, df = {float(result.df):.2f}, "
+          f"p = {float(result.pvalue):.5f}")
+
+    # 10,000 segment pairs of random sizes, arriving in two batches.
+    rng = np.random.default_rng(0)
+    segments = 10_000
+    sizes_a = rng.integers(5, 200, size=segments)
+    sizes_b = rng.integers(5, 200, size=segments)
+    offsets_a = np.concatenate([[0], np.cumsum(sizes_a)])
+    offsets_b = np.concatenate([[0], np.cumsum(sizes_b)])
+    values_a = rng.normal(50, 10, size=offsets_a[-1])
+    values_b = rng.normal(51, 12, size=offsets_b[-1])
+
+    start_time = time.time()
+    result = ttest_segments(values_a, offsets_a, values_b, offsets_b, equal_var=False)
+    elapsed = time.time() - start_time
+    print(f"{segments} Welch tests in {1000 * elapsed:.1f} ms, "
+          f"{np.sum(result.pvalue < 0.05)} significant at 0.05")
+
+    start_time = time.time()
+    for i in range(200):
+        a = values_a[offsets_a[i]:offsets_a[i + 1]]
+        b = values_b[offsets_b[i]:offsets_b[i + 1]]
+        stats.ttest_ind(a, b, equal_var=False)
+    print(f"scipy.stats.ttest_ind loop: {(time.time() - start_time) / 200 * segments:.2f} s for {segments}")
+
+    # streaming: the same statistics built from two halves of every segment.
+    group_a = GroupStats.empty(segments)
+    half = offsets_a[:-1] + sizes_a // 2
+    first = np.concatenate([np.arange(s, h) for s, h in zip(offsets_a[:-1], half)])
+    second = np.concatenate([np.arange(h, e) for h, e in zip(half, offsets_a[1:])])
+    group_a.update(values_a[first], np.concatenate([[0], np.cumsum(sizes_a // 2)]))
+    group_a.update(values_a[second], np.concatenate([[0], np.cumsum(sizes_a - sizes_a // 2)]))
+    print(f"streaming matches one pass: "
+          f"{np.allclose(group_a.variance(), GroupStats.from_segments(values_a, offsets_a).variance())}")
@@ -1,7 +1,8 @@
-import numpy as np
 import time
-from numpy import random
-import csv
+
+
+# NumPy and csv are imported inside the functions that use them, so the pure
+# Python path (and `import example_1_array_add`) starts without loading them.
 
 
 def python_add_constant():
@@ -15,6 +16,8 @@ def python_add_constant():
 
 
 def numpy_add_constant():
+    import numpy as np
+
     # Create a one-dimensional NumPy array
     array = np.array([1, 2, 3, 4, 5])
 
@@ -26,8 +29,10 @@ def numpy_add_constant():
     print("New array:", new_array)
 
 
-def python_add_c(c:int, n:int):
-    arr = [random.rand() for _ in range(n)]
+def python_add_c(c:int, n:int, rng=None):
+    import numpy as np
+    rng = np.random.default_rng() if rng is None else rng
+    arr = rng.random(n).tolist()
     new_arr = [0] * n
     start_time = time.time()
     for i in range(len(arr)):
@@ -37,8 +42,10 @@ def python_add_c(c:int, n:int):
     return end_time - start_time
 
 
-def numpy_add_c(c: int, n: int):
-    A = np.array([random.rand() for _ in range(n)])
+def numpy_add_c(c: int, n: int, rng=None):
+    import numpy as np
+    rng = np.random.default_rng() if rng is None else rng
+    A = rng.random(n)
     start_time = time.time()
     A = A + c
     end_time = time.time()
@@ -46,6 +53,8 @@ def numpy_add_c(c: int, n: int):
 
 
 def read_c_lang_results(csv_file):
+    import csv
+
     n_values = []
     t_values = []
 
@@ -66,6 +75,7 @@ def read_c_lang_results(csv_file):
 
 if __name__ == "__main__":
     import matplotlib.pyplot as plt
+    import numpy as np
     import sys
 
     # hack to ensure we are executing in the same
@@ -78,14 +88,16 @@ if __name__ == "__main__":
     # python_add_constant()
     # numpy_add_constant()
 
+    rng = np.random.default_rng()
+
     N = range(1000, 10000, 100)
     numpy_times = []
     python_times = []
     for n in N:
         sys.stdout.write("..")
         sys.stdout.flush()
-        python_times.append(python_add_c(5, n))
-        numpy_times.append(numpy_add_c(5, n))
+        python_times.append(python_add_c(5, n, rng))
+        numpy_times.append(numpy_add_c(5, n, rng))
 
     # open the results from C.
     c_n, c_times = read_c_lang_results("example_1_array_c_output.csv")
@@ -104,7 +116,7 @@ if __name__ == "__main__":
     for n in N2:
         sys.stdout.write(".")
         sys.stdout.flush()
-        numpy_times.append(numpy_add_c(5, n))
+        numpy_times.append(numpy_add_c(5, n, rng))
 
     c_n, c_times = read_c_lang_results(
         "example_1_array_c_big_output.csv")
@@ -1,12 +1,16 @@
-import numpy as np
 import time
-from numpy import random
 
 
-def mult_nxn(n: int):
+# NumPy is imported inside the functions (see example1), so importing this
+# module for its timing functions stays cheap.
 
-    A = [[random.rand() for _ in range(n)] for _ in range(n)]
-    B = [[random.rand() for _ in range(n)] for _ in range(n)]
+
+def mult_nxn(n: int, rng=None):
+    import numpy as np
+    rng = np.random.default_rng() if rng is None else rng
+
+    A = rng.random((n, n)).tolist()
+    B = rng.random((n, n)).tolist()
     C = [[0]*n]*n
 
     # Matrix multiplication using Python lists
@@ -18,10 +22,13 @@ def mult_nxn(n: int):
     return time.time() - start_time
 
 
-def numpy_nxn(n: int):
+def numpy_nxn(n: int, rng=None):
+    import numpy as np
+    rng = np.random.default_rng() if rng is None else rng
+
     # Creating two 100x100 matrices using NumPy arrays
-    A_np = np.random.rand(n, n)
-    B_np = np.random.rand(n, n)
+    A_np = rng.random((n, n))
+    B_np = rng.random((n, n))
     
     # Matrix multiplication using NumPy
     start_time = time.time()
@@ -31,6 +38,7 @@ def numpy_nxn(n: int):
 
 if __name__ == "__main__":
     import matplotlib.pyplot as plt
+    import numpy as np
     import sys
 
     # hack to ensure we are executing in the same
@@ -40,14 +48,16 @@ if __name__ == "__main__":
     os.chdir(script_dir)
     # print("pwd={}".format(os.getcwd()))
 
+    rng = np.random.default_rng()
+
     N = range(10, 200, 10)
     python_times = []
     numpy_times = []
     for n in N:
         sys.stdout.write("%d " % n)
         sys.stdout.flush()
-        python_time = mult_nxn(n)
-        numpy_time = numpy_nxn(n)
+        python_time = mult_nxn(n, rng)
+        numpy_time = numpy_nxn(n, rng)
         python_times.append(python_time)
         numpy_times.append(numpy_time)
 
@@ -62,7 +72,7 @@ if __name__ == "__main__":
     N2 = range(10, 1400, 50)
     numpy_times = []
     for n in N2:
-        numpy_time = numpy_nxn(n)
+        numpy_time = numpy_nxn(n, rng)
         numpy_times.append(numpy_time)
 
     plt.scatter(N2, numpy_times, color="red")
@@ -74,4 +84,17 @@ if __name__ == "__main__":
     plt.ylabel("seconds")
     plt.show()
 
+    # numpy_nxn stops where A, B and C no longer fit in RAM; past that point
+    # the sweep continues out of core, from disk (out_of_core_matmul.py).  The
+    # RAM budget is pretended to be 64 MB so the crossover comes at n ~ 1700.
+    import tempfile
+    from out_of_core_matmul import plot_throughput, throughput_sweep
+
+    ram_budget = 64 * 2**20
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = throughput_sweep(range(200, 3400, 400), work_dir, ram_budget, rng=rng)
+    for n, mode, seconds, rate, _ in results:
+        print(f"n={n:5d} {mode:<12} {seconds:7.2f} s {rate:6.2f} GFLOP/s")
+    plot_throughput(results, ram_budget)
+
   
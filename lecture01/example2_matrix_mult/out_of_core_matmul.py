@@ -0,0 +1,254 @@
+import math
+import os
+import queue
+import threading
+import time
+
+
+# Matrix multiplication for matrices that don't fit in memory.
+#
+# numpy_nxn in example_2_matrix_multi.py holds A, B and C in RAM, which caps n
+# at what the machine can hold (3 * n^2 * 8 bytes).  Here A and B are
+# np.memmap arrays on disk (.npy files), and C = A @ B is computed one tile at
+# a time:
+#
+#   for every tile C[i, j]:
+#       acc = 0
+#       for every k:  acc += A[i, k] @ B[k, j]     (np.dot on in-memory tiles)
+#       C[i, j] = acc                               (written to the C memmap)
+#
+# Tiles are square, t x t, with t chosen so that everything alive at once fits
+# the memory budget: the accumulator, the product buffer np.dot writes into,
+# the pair of tiles being multiplied, the pair the reader thread is loading,
+# and `prefetch` pairs waiting in the queue.
+#
+# A reader thread loads the next (A, B) tile pairs from disk into a bounded
+# queue while the main thread multiplies.  np.dot and the memmap copies both
+# release the GIL, so reading tile k+1 overlaps multiplying tile k; when the
+# disk is slower than the multiply the main thread waits on the queue, and
+# that wait is reported separately.
+
+DEFAULT_BUDGET = 256 * 2**20
+
+
+def tile_size(shape_a, shape_b, itemsize, memory_budget=DEFAULT_BUDGET, prefetch=2):
+    """
+    Largest square tile edge whose working set (accumulator, product buffer
+    and prefetch + 2 pairs of operand tiles) fits in memory_budget bytes.
+    """
+    tiles = 2 * (prefetch + 2) + 2
+    t = math.isqrt(memory_budget // (tiles * itemsize))
+    if t < 1:
+        raise ValueError(f"memory budget of {memory_budget} bytes is too small for one tile")
+    return min(t, max(shape_a[0], shape_a[1], shape_b[1]))
+
+
+def _tile_ranges(size, t):
+    return [(start, min(start + t, size)) for start in range(0, size, t)]
+
+
+def _read_tiles(A, B, schedule, tiles, stop):
+    # reader thread: copy every (A, B) tile pair of the schedule into memory.
+    import numpy as np
+    try:
+        for (i0, i1), (j0, j1), (k0, k1) in schedule:
+            a = np.array(A[i0:i1, k0:k1])
+            b = np.array(B[k0:k1, j0:j1])
+            while not stop.is_set():
+                try:
+                    tiles.put((a, b), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if stop.is_set():
+                return
+    except BaseException as error:
+        tiles.put(error)
+
+
+def matmul(A, B, out, memory_budget=DEFAULT_BUDGET, prefetch=2, tile=None, timings=None):
+    """
+    C = A @ B for memory-mapped (or any sliceable) A and B.
+
+    Parameters:
+    - A, B: 2-d arrays of shape (m, k) and (k, n), typically np.memmap or
+      np.load(path, mmap_mode="r").
+    - out: path of the .npy file to create for C, or an existing writable
+      (m, n) array.
+    - memory_budget: bytes the tiles may use in total.
+    - prefetch: tile pairs the reader thread may load ahead.
+    - tile: tile edge; overrides the size derived from memory_budget.
+    - timings: optional dict, filled with seconds spent waiting for tiles
+      ('wait'), multiplying ('compute') and writing C ('write'), and the
+      tile edge ('tile').
+
+    Returns C (an np.memmap when out is a path).
+    """
+    import numpy as np
+    m, k = A.shape
+    k_b, n = B.shape
+    if k != k_b:
+        raise ValueError(f"shapes {A.shape} and {B.shape} not aligned")
+    dtype = np.result_type(A.dtype, B.dtype)
+    if isinstance(out, (str, os.PathLike)):
+        C = np.lib.format.open_memmap(out, mode="w+", dtype=dtype, shape=(m, n))
+    else:
+        C = out
+        if C.shape != (m, n):
+            raise ValueError(f"out has shape {C.shape}, expected {(m, n)}")
+    t = tile or tile_size(A.shape, B.shape, dtype.itemsize, memory_budget, prefetch)
+
+    rows, cols, inner = _tile_ranges(m, t), _tile_ranges(n, t), _tile_ranges(k, t)
+    schedule = [(i, j, kk) for i in rows for j in cols for kk in inner]
+    tiles = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_tiles, args=(A, B, schedule, tiles, stop), daemon=True)
+    reader.start()
+
+    wait = compute = write = 0.0
+    try:
+        for i0, i1 in rows:
+            for j0, j1 in cols:
+                acc = np.zeros((i1 - i0, j1 - j0), dtype=dtype)
+                product = np.empty_like(acc)
+                for _ in inner:
+                    start_time = time.perf_counter()
+                    item = tiles.get()
+                    wait += time.perf_counter() - start_time
+                    if isinstance(item, BaseException):
+                        raise item
+                    a, b = item
+                    start_time = time.perf_counter()
+                    np.dot(a, b, out=product)
+                    acc += product
+                    compute += time.perf_counter() - start_time
+                start_time = time.perf_counter()
+                C[i0:i1, j0:j1] = acc
+                write += time.perf_counter() - start_time
+        if isinstance(C, np.memmap):
+            start_time = time.perf_counter()
+            C.flush()
+            write += time.perf_counter() - start_time
+    finally:
+        stop.set()
+        reader.join()
+
+    if timings is not None:
+        timings.update(wait=wait, compute=compute, write=write, tile=t)
+    return C
+
+
+def random_npy(path, shape, rng=None, dtype="float64", rows_per_chunk=None):
+    """
+    Writes a matrix of U[0, 1) values to a .npy file a block of rows at a time
+    (so it never has to fit in memory) and returns it memory-mapped read-only.
+    """
+    import numpy as np
+    rng = np.random.default_rng() if rng is None else rng
+    array = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+    rows_per_chunk = rows_per_chunk or max(1, (64 * 2**20) // (shape[1] * array.itemsize))
+    for start in range(0, shape[0], rows_per_chunk):
+        stop = min(start + rows_per_chunk, shape[0])
+        array[start:stop] = rng.random((stop - start, shape[1]), dtype=dtype)
+    array.flush()
+    del array
+    return np.load(path, mmap_mode="r")
+
+
+def total_memory():
+    # physical memory in bytes, where the OS reports it
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def gflops(n, seconds):
+    # an n x n matmul is n^3 multiply-adds
+    return 2 * n ** 3 / seconds / 1e9
+
+
+def throughput_sweep(ns, work_dir, ram_budget, memory_budget=None, rng=None):
+    """
+    GFLOP/s of C = A @ B for each n: in memory (numpy_nxn) while A, B and C
+    fit in ram_budget bytes, out of core from disk beyond it.  Returns a list
+    of (n, mode, seconds, gflops, timings).
+    """
+    import numpy as np
+    from example_2_matrix_multi import numpy_nxn
+    rng = np.random.default_rng() if rng is None else rng
+    memory_budget = memory_budget or ram_budget // 2
+    results = []
+    for n in ns:
+        if 3 * n * n * 8 <= ram_budget:
+            seconds = numpy_nxn(n, rng)
+            results.append((n, "in memory", seconds, gflops(n, seconds), {}))
+            continue
+        a_path, b_path, c_path = (os.path.join(work_dir, f"{name}_{n}.npy") for name in "ABC")
+        A = random_npy(a_path, (n, n), rng)
+        B = random_npy(b_path, (n, n), rng)
+        timings = {}
+        start_time = time.time()
+        C = matmul(A, B, c_path, memory_budget=memory_budget, timings=timings)
+        seconds = time.time() - start_time
+        results.append((n, "out of core", seconds, gflops(n, seconds), timings))
+        del A, B, C
+        for path in (a_path, b_path, c_path):
+            os.remove(path)
+    return results
+
+
+def plot_throughput(results, ram_budget):
+    # GFLOP/s against n for the results of throughput_sweep
+    import matplotlib.pyplot as plt
+    for mode, color in (("in memory", "red"), ("out of core", "purple")):
+        points = [(n, rate) for n, m, _, rate, _ in results if m == mode]
+        if points:
+            plt.scatter(*zip(*points), color=color, label=mode)
+    plt.axvline(math.isqrt(ram_budget // 24), color="gray", linestyle="dotted", label="RAM budget")
+    plt.title("Matrix multiplication throughput")
+    plt.xlabel("N")
+    plt.ylabel("GFLOP/s")
+    plt.legend()
+    plt.show()
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    import numpy as np
+
+    # usage: out_of_core_matmul.py [RAM_MB]
+    #
+    # The sweep of example_2_matrix_multi.py continued past the point where
+    # the matrices no longer fit in RAM.  RAM_MB pretends the machine has that
+    # much memory (default 64 MB, so the crossover happens at n ~ 1700 rather
+    # than at real RAM sizes that take hours to sweep); pass the real size,
+    # e.g. $(( $(getconf _PHYS_PAGES) * $(getconf PAGE_SIZE) / 2**20 )), for
+    # the real thing.
+    ram_budget = int(sys.argv[1]) * 2**20 if len(sys.argv) > 1 else 64 * 2**20
+    physical = total_memory()
+    if physical:
+        print(f"physical memory {physical / 2**30:.1f} GB; sweeping with a {ram_budget / 2**20:.0f} MB budget")
+    boundary = math.isqrt(ram_budget // 24)
+
+    # correctness on a small case with an awkward tile size
+    rng = np.random.default_rng(47)
+    with tempfile.TemporaryDirectory() as work_dir:
+        A = random_npy(os.path.join(work_dir, "A.npy"), (300, 170), rng)
+        B = random_npy(os.path.join(work_dir, "B.npy"), (170, 230), rng)
+        C = matmul(A, B, os.path.join(work_dir, "C.npy"), tile=64)
+        print(f"max |C - A @ B| = {np.max(np.abs(C - np.asarray(A) @ np.asarray(B))):.2e}")
+        del A, B, C
+
+        ns = sorted(set(int(n) for n in np.linspace(200, 2 * boundary, 12)))
+        results = throughput_sweep(ns, work_dir, ram_budget, rng=rng)
+
+    for n, mode, seconds, rate, timings in results:
+        detail = ""
+        if timings:
+            detail = (f"  tile {timings['tile']}, waiting for disk {timings['wait']:.2f} s, "
+                      f"multiplying {timings['compute']:.2f} s, writing {timings['write']:.2f} s")
+        print(f"n={n:5d} {mode:<12} {seconds:7.2f} s {rate:6.2f} GFLOP/s{detail}")
+
+    plot_throughput(results, ram_budget)
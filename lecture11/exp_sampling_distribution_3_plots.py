@@ -1,15 +1,27 @@
+import os
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
-import scipy.stats as stats
-
-def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None):
-    np.random.seed(seed)
+from stats_kernels import lazy_import, norm_pdf
+from sampling_distributions import exponential_mean_pdf
+from precision import as_policy
+from trial_prefetch import TrialPrefetcher
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)      # the repository root, for common/
+from common.instrumentation import counter, timed
+from common.rng_streams import as_generator
+
+plt = lazy_import("matplotlib.pyplot")
+
+def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None, rng=None, policy=None):
+    rng = as_generator(rng, seed)
+    policy = as_policy(policy)  # e.g. 'float32'; see precision.py
     
     lambda_param = 1  # Exponential distribution parameter (rate = 1/lambda)
     population_mean = 1 / lambda_param  # Theoretical mean of Exp(1)
     
-    sample_means = []  # Stores sample means over trials
-    all_samples = []   # Stores all individual sample values
+    sample_means = policy.store()  # Stores sample means over trials
+    all_samples = policy.store()   # Stores all individual sample values
     total_trials = 0   # Tracks the number of trials
 
     x_max = 3 / lambda_param  # ✅ Fixed x-axis range: [0, 3/lambda]
@@ -22,38 +34,46 @@ def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None
     plt.subplots_adjust(left=0.05, right=0.98, top=0.96, bottom=0.06, hspace=0.22)
 
 
+    # ✅ Trials are drawn ahead on a background thread (see trial_prefetch.py)
+    prefetch = TrialPrefetcher(lambda g, size: policy.exponential(g, 1/lambda_param, size=size), n, rng, policy)
+
+    trials = counter("trials_total", "sample means drawn by keypresses")
+
     def on_key(event):
         nonlocal total_trials, n, sample_means, all_samples  # Access state variables
 
         if event.key == 'a':  # ✅ Skip 500 samples
             num_iterations = 500  
             print(f"Advancing 500 sample means (n={n})...")
-            for _ in range(num_iterations):
-                total_trials += 1
-                sample = np.random.exponential(scale=1/lambda_param, size=n)
-                sample_mean = np.mean(sample)
-                sample_means.append(sample_mean)
-                all_samples.extend(sample)  # Keep accumulating samples
+            samples, means = prefetch.next_batch()  # ✅ Drawn ahead on the prefetch thread
+            total_trials += num_iterations
+            trials.inc(num_iterations)
+            sample_means.extend(means)
+            all_samples.extend(samples.ravel())  # Keep accumulating samples
+            sample = samples[-1]
 
         elif event.key == 'n':  # ✅ Increase n and regenerate from scratch
             n += 1  
             print(f"Increasing sample size to n={n} and regenerating from scratch...")
             recompute_sample_means()
+            return
 
         elif event.key == 'q':  # Quit
             print("Exiting...")
+            prefetch.close()
             plt.close()
             return
 
         else:  # Default: advance by 1 sample mean
             total_trials += 1
-            sample = np.random.exponential(scale=1/lambda_param, size=n)
-            sample_mean = np.mean(sample)
+            trials.inc()
+            sample, sample_mean = prefetch.next_trial()
             sample_means.append(sample_mean)
             all_samples.extend(sample)  # Keep accumulating samples
 
         update_plot(sample, sample_means, all_samples, total_trials)
 
+    @timed("recompute_sample_means_seconds")
     def recompute_sample_means():
         """ Resets and recomputes sample means with the updated `n`. """
         nonlocal total_trials
@@ -61,13 +81,13 @@ def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None
         sample_means.clear()  # Reset sample means
         all_samples.clear()  # Reset individual sample values
 
-        for _ in range(total_trials):  # Regenerate the same number of trials
-            sample = np.random.exponential(scale=1/lambda_param, size=n)
-            sample_means.append(np.mean(sample))
-            all_samples.extend(sample)
+        samples, means = prefetch.increase_n()  # History for the new n, regenerated in the background
+        sample_means.extend(means)
+        all_samples.extend(samples.ravel())
 
         update_plot([], sample_means, all_samples, total_trials)
 
+    @timed("update_plot_seconds")
     def update_plot(sample, sample_means, all_samples, total_trials):
         axes[0].clear()
         axes[1].clear()
@@ -97,7 +117,7 @@ def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None
 
         # --- Middle Plot: Histogram of Population Samples ---
         if len(all_samples) > 0:
-            axes[1].hist(all_samples, bins=bins, density=True, alpha=0.6, color='lightblue', edgecolor='black')
+            axes[1].hist(all_samples.view(), bins=bins, density=True, alpha=0.6, color='lightblue', edgecolor='black')
 
             x_vals = np.linspace(0, x_max, 1000)
             exp_pdf = lambda_param * np.exp(-lambda_param * x_vals)
@@ -111,11 +131,12 @@ def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None
 
         # --- Bottom Plot: Histogram of Sample Means ---
         if len(sample_means) > 0:
-            axes[2].hist(sample_means, bins=bins, density=True, alpha=0.6, color='steelblue', edgecolor='black')
+            axes[2].hist(sample_means.view(), bins=bins, density=True, alpha=0.6, color='steelblue', edgecolor='black')
 
             x_vals = np.linspace(0, x_max, 1000)
-            normal_approx = stats.norm.pdf(x_vals, loc=population_mean, scale=population_mean / np.sqrt(n))
+            normal_approx = norm_pdf(x_vals, loc=population_mean, scale=population_mean / np.sqrt(n))
             axes[2].plot(x_vals, normal_approx, color='red', linestyle='dashed', label="Normal Approximation")
+            axes[2].plot(x_vals, exponential_mean_pdf(x_vals, n, scale=1/lambda_param), color='black', linestyle=':', linewidth=2, label="Exact (Gamma)")
 
             latest_sample_mean = sample_means[-1]
             axes[2].axvline(latest_sample_mean, color='magenta', linestyle='-', linewidth=2, zorder=4, label="Latest Sample Mean")  # ✅ Restored magenta sample mean line
@@ -136,8 +157,7 @@ def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None
     fig.canvas.mpl_connect('key_press_event', on_key)
 
     # ✅ Run the first trial automatically
-    first_sample = np.random.exponential(scale=1/lambda_param, size=n)
-    first_sample_mean = np.mean(first_sample)
+    first_sample, first_sample_mean = prefetch.next_trial()
     sample_means.append(first_sample_mean)
     all_samples.extend(first_sample)
     total_trials += 1
@@ -145,5 +165,6 @@ def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None
 
     plt.show(block=True)  
 
-# Run the interactive animation
-animated_sampling_distribution(n=4, seed=42)
+if __name__ == "__main__":
+    # Run the interactive animation
+    animated_sampling_distribution(n=4, seed=42)
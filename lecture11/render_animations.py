@@ -0,0 +1,461 @@
+import os
+import shutil
+import subprocess
+import sys
+import time
+import numpy as np
+from stats_kernels import norm_pdf, uniform_pdf, t_ppf
+from sampling_distributions import uniform_mean_pdf, exponential_mean_pdf
+from precision import DtypePolicy
+from trial_prefetch import SINGLE, stream_entropy, trial_stream
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)      # the repository root, for common/
+from common.ordered_map import ordered_starmap
+
+
+# Headless export of the lecture 11 animations.
+#
+# The scripts in this directory advance one trial per keypress through
+# plt.ion() / mpl_connect / waitforbuttonpress, which needs a display.  Here
+# the whole trial sequence is drawn up front in one vectorized call, and every
+# frame is rendered with the Agg canvas.  SamplingDistributionScene draws from
+# the same per-n stream as the script's single-trial keypresses (see
+# trial_prefetch.py), and a Generator produces the same numbers for one
+# (frames, n) draw as for frames separate draws of n: with one trial per
+# frame, a given seed shows the trials of pressing a key that many times.
+#
+# Scenes:
+#   ConfidenceIntervalScene(method)     t_ci_plots / s_ci_plots / sigma_ci_plots
+#   SamplingDistributionScene(dist)     u_ / exp_sampling_distribution_3_plots
+#
+# Each worker process builds its own figure once.  Everything static (axes,
+# ticks, legends, theoretical curves) is rendered once into a background
+# image; a frame restores that image and draws only the artists that change
+# (blitting), which is several times cheaper than redrawing the axes.  The
+# background is re-rendered only when a frame needs different axis limits;
+# y-limits move in coarse steps so that happens rarely.  Frames never
+# accumulate in memory:
+#
+#   directory/     workers write frame_000000.png ... themselves
+#   *.gif          workers encode GIF frames against one shared palette; the
+#                  parent appends them to the file in order
+#   *.mp4, ...     raw RGBA frames are piped to ffmpeg in order
+#
+#   python render_animations.py t_ci t_ci.gif --frames 10000 --workers 4
+
+CONFIDENCE_METHODS = ("t", "s", "sigma")
+
+
+class ConfidenceIntervalScene:
+    """
+    95% confidence intervals for the mean of U[a, b] samples:
+    'sigma' uses the known sigma and 1.96, 's' the sample std and 1.96, and
+    't' the sample std and the t critical value.
+    """
+    figsize = (10, 6)
+
+    def __init__(self, method="t", num_samples=10, seed=51, a=0, b=1):
+        if method not in CONFIDENCE_METHODS:
+            raise ValueError(f"method must be one of {CONFIDENCE_METHODS}, got {method!r}")
+        self.params = dict(method=method, num_samples=num_samples, seed=seed, a=a, b=b)
+
+    def precompute(self, frames):
+        p = self.params
+        n, a, b = p["num_samples"], p["a"], p["b"]
+        rng = np.random.default_rng(p["seed"])
+        self.mu = (a + b) / 2
+        self.samples = rng.uniform(a, b, size=(frames, n))
+        self.means = self.samples.mean(axis=1)
+        if p["method"] == "sigma":
+            std_error = np.full(frames, (b - a) / np.sqrt(12) / np.sqrt(n))
+        else:
+            std_error = self.samples.std(axis=1, ddof=1) / np.sqrt(n)
+        critical = t_ppf(0.975, n - 1) if p["method"] == "t" else 1.96
+        self.left = self.means - critical * std_error
+        self.right = self.means + critical * std_error
+        self.inside = (self.left <= self.mu) & (self.mu <= self.right)
+        self.covered = np.cumsum(self.inside)
+
+    def setup(self, fig):
+        p = self.params
+        a, b, n = p["a"], p["b"], p["num_samples"]
+        ax = fig.add_subplot()
+        x = np.linspace(a, b, 1000)
+        y = uniform_pdf(x, loc=a, scale=b - a)
+        self.line_y = np.max(y) + 0.2
+        ax.fill_between(x, y, color='gray', alpha=0.5, label=f'Uniform PDF U[{a}, {b}]')
+        ax.axvline(self.mu, color='green', linestyle='--', label=rf'True Mean ($\mu = {self.mu}$)')
+        self.points = ax.scatter(np.zeros(n), np.full(n, self.line_y), color='black', zorder=5)
+        self.mean_line = ax.axvline(0, color='magenta', linestyle='-', label=r'Sample Mean ($\overline{x}$)')
+        self.arrow = ax.annotate('', xy=(0, self.line_y + 0.15), xytext=(0, self.line_y + 0.15),
+                                 arrowprops=dict(arrowstyle="<->", lw=1.5, color='red'))
+        label = {"t": r"t_{\alpha/2, df}", "s": "1.96", "sigma": "1.96"}[p["method"]]
+        self.ci_text = ax.text(0, self.line_y + 0.25, rf"$95\% \, \text{{CI}} = \overline{{x}} \pm {label} \cdot \text{{SE}}$",
+                               horizontalalignment='center', color='red',
+                               bbox=dict(facecolor='white', alpha=1, edgecolor='none'))
+        self.stats_text = ax.text(0.98, 0.02, "", fontsize=12, color='blue', transform=ax.transAxes,
+                                  horizontalalignment='right', verticalalignment='bottom',
+                                  bbox=dict(facecolor='white', alpha=1, edgecolor='black'))
+        ax.set_ylim(bottom=0, top=1.8)
+        ax.set_xlabel('X value')
+        ax.set_ylabel('Probability Density')
+        ax.set_title(f'Confidence Interval Visualization (n={n}, {p["method"]})')
+        self.ax = ax
+        self.animated = [self.points, self.mean_line, self.arrow, self.ci_text, self.stats_text]
+        self.overlays = [ax.legend(loc='upper right', framealpha=1)]
+
+    def limits(self, i):
+        a, b = self.params["a"], self.params["b"]
+        return (min(self.left[i], a - 0.05), max(self.right[i], b + 0.05))
+
+    def apply_limits(self, limits):
+        self.ax.set_xlim(*limits)
+
+    def draw(self, i):
+        mean, left, right = self.means[i], self.left[i], self.right[i]
+        self.points.set_offsets(np.column_stack([self.samples[i], np.full(self.samples.shape[1], self.line_y)]))
+        self.mean_line.set_xdata([mean, mean])
+        self.arrow.xy = (left, self.line_y + 0.15)
+        self.arrow.set_position((right, self.line_y + 0.15))
+        self.ci_text.set_x(mean)
+        trials = i + 1
+        self.stats_text.set_text(f"Trials: {trials}\nμ inside CI: {self.covered[i]} "
+                                 f"({100 * self.covered[i] / trials:.2f}%)")
+
+
+class SamplingDistributionScene:
+    """
+    Sample means of n draws from U[0, 1] ('uniform') or Exp(1)
+    ('exponential'), laid out like the *_sampling_distribution_3_plots
+    scripts: the current sample, a histogram of every value drawn, and the
+    histogram of sample means against the normal approximation and the exact
+    density.  `trials_per_frame` > 1 skips ahead like the 'a' key.
+    dtype="float32" halves the memory of the precomputed draws (see
+    precision.py).
+
+    The bins are fixed for the whole animation so the histograms can be
+    accumulated once for all frames.
+    """
+    figsize = (8, 12)
+
+    def __init__(self, distribution="uniform", n=4, seed=42, bins=60, trials_per_frame=1, dtype="float64"):
+        if distribution not in ("uniform", "exponential"):
+            raise ValueError(f"distribution must be 'uniform' or 'exponential', got {distribution!r}")
+        self.params = dict(distribution=distribution, n=n, seed=seed, bins=bins,
+                           trials_per_frame=trials_per_frame, dtype=dtype)
+
+    def precompute(self, frames):
+        p = self.params
+        n, per_frame = p["n"], p["trials_per_frame"]
+        # the stream TrialPrefetcher uses for single trials at this n
+        rng = trial_stream(stream_entropy(np.random.default_rng(p["seed"])), n, SINGLE)
+        policy = DtypePolicy(p["dtype"])
+        if p["distribution"] == "uniform":
+            self.samples = policy.uniform(rng, 0, 1, size=(frames * per_frame, n))
+            self.x_min, self.x_max, self.population_mean = -0.2, 1.2, 0.5
+            population_std = 1 / np.sqrt(12)
+        else:
+            self.samples = policy.exponential(rng, 1, size=(frames * per_frame, n))
+            self.x_min, self.x_max, self.population_mean = 0, 3, 1.0
+            population_std = 1.0
+        self.population_std = population_std
+        self.means = policy.mean(self.samples, axis=1)
+        self.edges = np.linspace(self.x_min, self.x_max, p["bins"] + 1)
+
+        # cumulative histogram counts after every frame, shape (frames, bins)
+        frame_of_trial = np.arange(len(self.samples)) // per_frame
+        self.value_counts = self._cumulative_counts(self.samples, frame_of_trial[:, None], frames)
+        self.mean_counts = self._cumulative_counts(self.means, frame_of_trial, frames)
+
+    def _cumulative_counts(self, values, frame, frames):
+        bins = len(self.edges) - 1
+        index = np.searchsorted(self.edges, values, side="right") - 1
+        index = np.where(values == self.edges[-1], bins - 1, index)
+        keep = (index >= 0) & (index < bins)
+        frame = np.broadcast_to(frame, values.shape)
+        flat = np.bincount(frame[keep] * bins + index[keep], minlength=frames * bins)
+        return np.cumsum(flat.reshape(frames, bins), axis=0)
+
+    def setup(self, fig):
+        p = self.params
+        n = p["n"]
+        axes = fig.subplots(3, 1, gridspec_kw={'height_ratios': [0.5, 2, 2]})
+        fig.subplots_adjust(left=0.08, right=0.98, top=0.95, bottom=0.08, hspace=0.3)
+        x_vals = np.linspace(self.x_min, self.x_max, 1000)
+
+        top, middle, bottom = axes
+        self.points = top.scatter(np.zeros(n), np.full(n, 0.5), color='black', zorder=5, label="Samples")
+        self.labels = [top.text(0, 0.6, "", ha='center', fontsize=9, color='blue') for _ in range(n)]
+        self.sample_mean_line = top.axvline(0, color='magenta', linestyle='-', linewidth=2, zorder=4, label="Sample Mean")
+        top.axvline(self.population_mean, color='green', linestyle='--', linewidth=2, zorder=3, label="Population Mean")
+        top.set_xlim(self.x_min, self.x_max)
+        top.set_ylim(0, 1)
+        top.set_yticks([])
+        top.set_title(f"Current Sample (n={n})")
+
+        zeros = np.zeros(len(self.edges) - 1)
+        self.value_hist = middle.stairs(zeros, self.edges, fill=True, alpha=0.6, color='lightblue')
+        if p["distribution"] == "uniform":
+            population_pdf = uniform_pdf(x_vals, 0, 1)
+            exact = uniform_mean_pdf(x_vals, n)
+            pdf_label, exact_label = "Uniform PDF", "Exact (Irwin-Hall)"
+        else:
+            population_pdf = np.where(x_vals >= 0, np.exp(-x_vals), 0.0)
+            exact = exponential_mean_pdf(x_vals, n)
+            pdf_label, exact_label = "Exponential PDF", "Exact (Gamma)"
+        curves = middle.plot(x_vals, population_pdf, color='blue', label=pdf_label)
+        curves.append(middle.axvline(self.population_mean, color='green', linestyle='--', linewidth=2, zorder=3, label="Population Mean"))
+        middle.set_xlim(self.x_min, self.x_max)
+        middle.set_ylabel("Relative Frequency")
+        middle.set_title("Histogram of All Sampled Values")
+        self.middle_top = 1.1 * np.max(population_pdf)
+
+        self.mean_hist = bottom.stairs(zeros, self.edges, fill=True, alpha=0.6, color='steelblue')
+        normal_approx = norm_pdf(x_vals, loc=self.population_mean, scale=self.population_std / np.sqrt(n))
+        curves += bottom.plot(x_vals, normal_approx, color='red', linestyle='dashed', label="Normal Approximation")
+        curves += bottom.plot(x_vals, exact, color='black', linestyle=':', linewidth=2, label=exact_label)
+        self.latest_mean_line = bottom.axvline(0, color='magenta', linestyle='-', linewidth=2, zorder=4, label="Latest Sample Mean")
+        curves.append(bottom.axvline(self.population_mean, color='green', linestyle='--', linewidth=2, zorder=3, label="Population Mean"))
+        bottom.set_xlim(self.x_min, self.x_max)
+        bottom.set_xlabel("Values")
+        bottom.set_ylabel("Relative Frequency")
+        self.bottom_top = 1.1 * max(np.max(normal_approx), np.max(exact))
+        self.axes = axes
+        # the curves never change but are drawn over the histograms, as in
+        # the interactive scripts, so they are redrawn after them.
+        self.animated = [self.points, *self.labels, self.sample_mean_line,
+                         self.value_hist, self.mean_hist, *curves, self.latest_mean_line, bottom.title]
+        self.overlays = [ax.legend(loc="upper right", framealpha=1) for ax in axes]
+
+    def _density(self, counts):
+        return counts / max(counts.sum(), 1) / (self.edges[1] - self.edges[0])
+
+    def limits(self, i):
+        # y-limits grow in steps of a quarter of the theoretical peak
+        tops = []
+        for counts, base in ((self.value_counts[i], self.middle_top), (self.mean_counts[i], self.bottom_top)):
+            needed = 1.05 * self._density(counts).max()
+            tops.append(base if needed <= base else base * np.ceil(4 * needed / base) / 4)
+        return tuple(tops)
+
+    def apply_limits(self, limits):
+        self.axes[1].set_ylim(0, limits[0])
+        self.axes[2].set_ylim(0, limits[1])
+
+    def draw(self, i):
+        last = (i + 1) * self.params["trials_per_frame"] - 1
+        sample, mean = self.samples[last], self.means[last]
+
+        self.points.set_offsets(np.column_stack([sample, np.full(len(sample), 0.5)]))
+        for label, x in zip(self.labels, sample):
+            label.set_x(x)
+            label.set_text(f"{x:.2f}")
+        self.sample_mean_line.set_xdata([mean, mean])
+
+        self.value_hist.set_data(self._density(self.value_counts[i]))
+        self.mean_hist.set_data(self._density(self.mean_counts[i]))
+        self.latest_mean_line.set_xdata([mean, mean])
+        self.axes[2].set_title(f"Sampling Distribution of Sample Means (n={self.params['n']}), Trials = {last + 1}")
+
+
+SCENES = {
+    "t_ci": lambda: ConfidenceIntervalScene("t"),
+    "s_ci": lambda: ConfidenceIntervalScene("s"),
+    "sigma_ci": lambda: ConfidenceIntervalScene("sigma"),
+    "u_sampling": lambda: SamplingDistributionScene("uniform"),
+    "exp_sampling": lambda: SamplingDistributionScene("exponential"),
+}
+
+
+# --- rendering (worker side) -------------------------------------------------------
+
+_prepared = {}
+
+
+def _prepare(scene, frames, dpi):
+    # one figure per worker process and scene, reused for all of its frames
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    key = (type(scene).__name__, tuple(sorted(scene.params.items())), frames, dpi)
+    if key not in _prepared:
+        _prepared.clear()
+        # a private copy, so the caller's scene stays small enough to pickle
+        scene = type(scene)(**scene.params)
+        scene.precompute(frames)
+        fig = Figure(figsize=scene.figsize, dpi=dpi)
+        FigureCanvasAgg(fig)
+        scene.setup(fig)
+        for artist in scene.animated + scene.overlays:
+            artist.set_animated(True)
+        fig._background = None
+        fig._limits = None
+        _prepared[key] = (scene, fig)
+    return _prepared[key]
+
+
+def _rgba(scene, fig, i):
+    limits = scene.limits(i)
+    if limits != fig._limits:
+        # new axis limits: render the static parts again (animated artists
+        # are skipped by canvas.draw) and keep them as the background.
+        scene.apply_limits(limits)
+        fig.canvas.draw()
+        fig._background = fig.canvas.copy_from_bbox(fig.bbox)
+        # overlays (legends) sit on top of everything but never change, so
+        # their pixels are captured once here and pasted onto every frame.
+        renderer = fig.canvas.get_renderer()
+        for artist in scene.overlays:
+            fig.draw_artist(artist)
+        fig._overlays = [fig.canvas.copy_from_bbox(artist.get_window_extent(renderer).expanded(1.02, 1.05))
+                         for artist in scene.overlays]
+        fig._limits = limits
+    scene.draw(i)
+    fig.canvas.restore_region(fig._background)
+    for artist in scene.animated:
+        fig.draw_artist(artist)
+    for region in fig._overlays:
+        fig.canvas.restore_region(region)
+    return np.asarray(fig.canvas.buffer_rgba())
+
+
+def _gif_frame(rgba, palette, duration):
+    from PIL import Image, GifImagePlugin
+    image = Image.fromarray(rgba[..., :3]).quantize(palette=palette, dither=Image.Dither.NONE)
+    return b"".join(GifImagePlugin.getdata(image, duration=duration))
+
+
+def _render_range(scene, frames, dpi, start, stop, mode, target, palette=None, duration=50):
+    """
+    Renders frames [start, stop).  mode 'png' writes files into the target
+    directory; 'gif' and 'raw' return the encoded frames for the parent to
+    write in order.
+    """
+    scene, fig = _prepare(scene, frames, dpi)
+    out = []
+    for i in range(start, stop):
+        rgba = _rgba(scene, fig, i)
+        if mode == "png":
+            from PIL import Image
+            Image.fromarray(rgba).save(os.path.join(target, f"frame_{i:06d}.png"), compress_level=1)
+        elif mode == "gif":
+            out.append(_gif_frame(rgba, palette, duration))
+        else:
+            out.append(rgba.tobytes())
+    return out
+
+
+# --- writers (parent side) -----------------------------------------------------------
+
+class GifWriter:
+    """
+    Streams GIF frames to a file: the header and palette are written once and
+    each encoded frame is appended as it arrives.
+    """
+    def __init__(self, path, first_rgba, fps):
+        from PIL import Image, GifImagePlugin
+        self.palette = Image.fromarray(first_rgba[..., :3]).quantize(colors=256, method=Image.Quantize.MEDIANCUT)
+        self.duration = int(round(1000 / fps))
+        header, _ = GifImagePlugin.getheader(self.palette.copy(), info={"loop": 0})
+        self.fh = open(path, "wb")
+        self.fh.write(b"".join(header))
+
+    def write(self, frame):
+        self.fh.write(frame)
+
+    def close(self):
+        self.fh.write(b";")
+        self.fh.close()
+
+
+class FFmpegWriter:
+    def __init__(self, path, width, height, fps):
+        command = ["ffmpeg", "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgba",
+                   "-s", f"{width}x{height}", "-r", str(fps), "-i", "-"]
+        if path.endswith(".mp4"):
+            command += ["-pix_fmt", "yuv420p", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+        self.process = subprocess.Popen(command + [path], stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        self.process.stdin.write(frame)
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError("ffmpeg failed")
+
+
+def render(scene, output, frames=1000, workers=None, fps=20, dpi=80, chunk_size=16):
+    """
+    Renders `frames` frames of `scene` to `output`.
+
+    Parameters:
+    - scene: a ConfidenceIntervalScene or SamplingDistributionScene.
+    - output: a directory (PNG sequence), a .gif file, or any file ffmpeg
+      can write (.mp4, .webm, ...; needs ffmpeg on the PATH).
+    - frames: number of frames (one trial each, or trials_per_frame).
+    - workers: worker processes (default os.cpu_count(); 0 renders inline).
+    - fps, dpi: frame rate and resolution of the output.
+    - chunk_size: frames per task; each worker renders contiguous ranges.
+
+    Returns the number of frames written.
+    """
+    workers = os.cpu_count() if workers is None else workers
+    extension = os.path.splitext(output)[1].lower()
+    if not extension:
+        mode = "png"
+        os.makedirs(output, exist_ok=True)
+    elif extension == ".gif" and shutil.which("ffmpeg") is None:
+        mode = "gif"
+    else:
+        if shutil.which("ffmpeg") is None:
+            raise RuntimeError(f"writing {extension} needs ffmpeg; use a .gif file or a directory instead")
+        mode = "raw"
+
+    # the first frame fixes the frame size and, for GIFs, the shared palette.
+    first_scene, first_fig = _prepare(scene, frames, dpi)
+    first = _rgba(first_scene, first_fig, 0)
+    height, width = first.shape[:2]
+    writer, palette, duration = None, None, int(round(1000 / fps))
+    if mode == "gif":
+        writer = GifWriter(output, first, fps)
+        palette = writer.palette
+    elif mode == "raw":
+        writer = FFmpegWriter(output, width, height, fps)
+
+    # never more than 2 * workers chunks ahead, so rendered frames waiting to
+    # be written stay bounded.
+    tasks = ((scene, frames, dpi, start, min(start + chunk_size, frames), mode, output, palette, duration)
+             for start in range(0, frames, chunk_size))
+    try:
+        for chunk in ordered_starmap(_render_range, tasks, workers):
+            if writer is not None:
+                for frame in chunk:
+                    writer.write(frame)
+    finally:
+        if writer is not None:
+            writer.close()
+    return frames
+
+
+def main(argv):
+    usage = f"usage: render_animations.py {{{','.join(SCENES)}}} OUTPUT [--frames N] [--workers N] [--fps N] [--dpi N]"
+    if len(argv) < 2 or argv[0] not in SCENES:
+        raise SystemExit(usage)
+    options = {"--frames": 1000, "--workers": None, "--fps": 20, "--dpi": 80}
+    args = iter(argv[2:])
+    for arg in args:
+        if arg not in options:
+            raise SystemExit(usage)
+        options[arg] = int(next(args))
+
+    start_time = time.time()
+    frames = render(SCENES[argv[0]](), argv[1], frames=options["--frames"], workers=options["--workers"],
+                    fps=options["--fps"], dpi=options["--dpi"])
+    elapsed = time.time() - start_time
+    print(f"{frames} frames -> {argv[1]} in {elapsed:.1f} s ({frames / elapsed:.1f} frames/s)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,9 +1,16 @@
+import os
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
-import scipy.stats as stats
+from stats_kernels import lazy_import, uniform_pdf
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)      # the repository root, for common/
+from common.rng_streams import as_generator
 
-def plot_interactive_uniform_ci(num_samples, seed=None):
-    np.random.seed(seed)
+plt = lazy_import("matplotlib.pyplot")
+
+def plot_interactive_uniform_ci(num_samples, seed=None, rng=None):
+    rng = as_generator(rng, seed)
     
     a, b = 0, 1  # Parameters for U[0, 1]
     mu = (a + b) / 2  # True mean
@@ -21,7 +28,7 @@ def plot_interactive_uniform_ci(num_samples, seed=None):
         total_trials += 1  # Increment keypress count
 
         # Generate samples from U[0, 1]
-        samples = np.random.uniform(a, b, num_samples)
+        samples = rng.uniform(a, b, num_samples)
         sample_mean = np.mean(samples)
         std_dev = np.std(samples, ddof=1)  # Sample standard deviation
         std_error = std_dev / np.sqrt(num_samples)  # Standard error of the mean
@@ -38,7 +45,7 @@ def plot_interactive_uniform_ci(num_samples, seed=None):
 
         # Uniform PDF shaded in gray
         x = np.linspace(a, b, 1000)
-        y = stats.uniform.pdf(x, loc=a, scale=b-a)
+        y = uniform_pdf(x, loc=a, scale=b-a)
         ax.fill_between(x, y, color='gray', alpha=0.5, label='Uniform PDF U[0, 1]')
 
         # True mean line
@@ -90,6 +97,6 @@ def plot_interactive_uniform_ci(num_samples, seed=None):
     plt.ioff()  # Turn off interactive mode
     plt.close()
 
-# Run the interactive plot
-plot_interactive_uniform_ci(num_samples=10, seed=51)
-
+if __name__ == "__main__":
+    # Run the interactive plot
+    plot_interactive_uniform_ci(num_samples=10, seed=51)
@@ -0,0 +1,166 @@
+import math
+import numpy as np
+from stats_kernels import norm_pdf, uniform_pdf
+
+
+# Exact densities of the sample mean X̄ = (X_1 + ... + X_n) / n.
+#
+# The animations in this directory show a histogram of simulated sample means
+# next to the normal approximation from the central limit theorem.  The true
+# distribution of the mean is known, so it can be drawn directly:
+#
+#   uniform U[a, b]     n * (b - a) * X̄ is Irwin-Hall (sum of n U[0, 1]).
+#   exponential         X̄ ~ Gamma(shape=n, scale=scale / n).
+#   normal              X̄ ~ Normal(mu, sigma / sqrt(n)).
+#   anything else       discretize the PDF on a grid and convolve it with
+#                       itself n times.  The n-fold convolution is one FFT,
+#                       raising the spectrum to the n-th power, and one
+#                       inverse FFT.
+
+# The Irwin-Hall sum alternates in sign and loses precision as n grows, so
+# larger n use the FFT route instead.
+IRWIN_HALL_MAX_N = 20
+
+
+def irwin_hall_pdf(s, n):
+    """
+    Density of the sum of n independent U[0, 1] variables:
+    f(s) = 1/(n-1)! * sum_{k=0}^{floor(s)} (-1)^k C(n, k) (s - k)^(n-1).
+    """
+    s = np.asarray(s, dtype=float)
+    k = np.arange(n + 1)
+    coef = np.array([math.comb(n, j) for j in range(n + 1)], dtype=float) / math.factorial(n - 1)
+    terms = np.clip(s[..., None] - k, 0, None) ** (n - 1)
+    if n == 1:
+        # (s - k)^0 must only count where s > k
+        terms = (s[..., None] > k).astype(float)
+    density = np.sum((-1.0) ** k * coef * terms, axis=-1)
+    density = np.where((s >= 0) & (s <= n), density, 0.0)
+    return np.clip(density, 0, None)
+
+
+def uniform_mean_pdf(x, n, a=0, b=1):
+    x = np.asarray(x, dtype=float)
+    if n > IRWIN_HALL_MAX_N:
+        return mean_pdf_fft(lambda t: uniform_pdf(t, a, b - a), n, (a, b), x=x)
+    width = b - a
+    return n / width * irwin_hall_pdf(n * (x - a) / width, n)
+
+
+def exponential_mean_pdf(x, n, scale=1):
+    # Gamma(shape=n, scale=scale/n) density, computed in logs
+    x = np.asarray(x, dtype=float)
+    theta = scale / n
+    positive = np.where(x > 0, x, 1.0)
+    log_pdf = (n - 1) * np.log(positive) - positive / theta - math.lgamma(n) - n * math.log(theta)
+    density = np.where(x > 0, np.exp(log_pdf), 0.0)
+    if n == 1:
+        density = np.where(x == 0, 1 / theta, density)
+    return density
+
+
+def normal_mean_pdf(x, n, loc=0, scale=1):
+    return norm_pdf(x, loc=loc, scale=scale / np.sqrt(n))
+
+
+def mean_pdf_fft(pdf, n, support, x=None, grid_points=2049):
+    """
+    Density of the mean of n draws from an arbitrary distribution.
+
+    Parameters:
+    - pdf: vectorized density function of one draw.
+    - n: sample size.
+    - support: (lo, hi) interval that holds essentially all of the mass; for
+      unbounded distributions use e.g. dist.ppf(1e-10), dist.ppf(1 - 1e-10).
+    - x: points at which to evaluate the density of the mean.  If omitted the
+      grid itself is returned.
+    - grid_points: resolution of the discretized PDF.
+
+    Returns the density at x, or (grid, density) when x is None.
+    """
+    lo, hi = support
+    grid = np.linspace(lo, hi, grid_points)
+    h = grid[1] - grid[0]
+    # trapezoid weights give the probability mass carried by each grid point.
+    mass = pdf(grid) * h
+    mass[0] *= 0.5
+    mass[-1] *= 0.5
+    mass /= mass.sum()
+
+    length = n * (grid_points - 1) + 1
+    size = 1 << int(np.ceil(np.log2(length)))
+    spectrum = np.fft.rfft(mass, size)
+    summed = np.fft.irfft(spectrum ** n, size)[:length]
+    summed = np.clip(summed, 0, None)
+
+    # sum of n draws lives on n*lo + j*h; the mean on lo + j*h/n.
+    mean_grid = lo + np.arange(length) * (h / n)
+    density = summed / (h / n)
+    if x is None:
+        return mean_grid, density
+    return np.interp(x, mean_grid, density, left=0.0, right=0.0)
+
+
+def sample_mean_pdf(distribution, n, x, **params):
+    """
+    Exact density of the sample mean for n draws, evaluated at x.
+
+    `distribution` is 'uniform' (params a, b), 'exponential' (scale),
+    'normal' (loc, scale), or a frozen scipy.stats distribution.  Frozen
+    distributions with a matching closed form use it; others go through
+    mean_pdf_fft.
+    """
+    if distribution == "uniform":
+        return uniform_mean_pdf(x, n, params.get("a", 0), params.get("b", 1))
+    if distribution == "exponential":
+        return exponential_mean_pdf(x, n, params.get("scale", 1))
+    if distribution == "normal":
+        return normal_mean_pdf(x, n, params.get("loc", 0), params.get("scale", 1))
+
+    name = getattr(getattr(distribution, "dist", None), "name", None)
+    if name in ("uniform", "expon", "norm"):
+        loc, scale = distribution.kwds.get("loc", 0), distribution.kwds.get("scale", 1)
+        if distribution.args:
+            loc = distribution.args[0]
+            scale = distribution.args[1] if len(distribution.args) > 1 else scale
+        if name == "uniform":
+            return uniform_mean_pdf(x, n, loc, loc + scale)
+        if name == "expon":
+            return exponential_mean_pdf(np.asarray(x) - loc, n, scale)
+        return normal_mean_pdf(x, n, loc, scale)
+
+    tail = params.get("tail", 1e-10)
+    support = (distribution.ppf(tail), distribution.ppf(1 - tail))
+    return mean_pdf_fft(distribution.pdf, n, support, x=x, grid_points=params.get("grid_points", 2049))
+
+
+if __name__ == "__main__":
+    import time
+    import matplotlib.pyplot as plt
+    from scipy import stats
+
+    x = np.linspace(0, 1, 1000)
+    fig, axes = plt.subplots(1, 3, figsize=(15, 4))
+    for n in (1, 2, 4, 30):
+        axes[0].plot(x, uniform_mean_pdf(x, n), label=f"n={n}")
+    axes[0].set_title("Mean of n U[0,1] (Irwin-Hall)")
+
+    x = np.linspace(0, 3, 1000)
+    for n in (1, 2, 4, 30):
+        axes[1].plot(x, exponential_mean_pdf(x, n), label=f"n={n}")
+    axes[1].set_title("Mean of n Exp(1) (Gamma)")
+
+    # a distribution with no closed form for the mean: a triangular one.
+    triangular = stats.triang(c=1.0, loc=-2/3, scale=1)
+    x = np.linspace(-2/3, 1/3, 1000)
+    for n in (1, 2, 4, 30):
+        start_time = time.time()
+        density = sample_mean_pdf(triangular, n, x)
+        print(f"triangular n={n}: {1000 * (time.time() - start_time):.1f} ms")
+        axes[2].plot(x, density, label=f"n={n}")
+    axes[2].set_title("Mean of n Triangular (FFT convolution)")
+
+    for ax in axes:
+        ax.legend()
+    plt.tight_layout()
+    plt.show()
@@ -0,0 +1,244 @@
+import json
+import os
+import signal
+import sys
+import time
+import numpy as np
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)      # the repository root, for common/
+from common.rng_streams import RandomStreams
+
+
+# Long Monte Carlo runs that survive interruption and don't live in RAM.
+#
+# The simulations in the notes keep every result in a Python list or array
+# (sample_means, all_samples, perm_f_values, the 100,000-draw `ks`), so a
+# billion-trial run needs the memory for all of it and starts over after a
+# crash or preemption.  A SimulationRun instead appends each chunk of results
+# to a flat binary file in the run directory and periodically writes a
+# checkpoint with the random generator's state and the counters:
+#
+#   run_dir/
+#     meta.json         dtype and shape of one trial, chunk size, seed
+#     results.bin       trials so far, one fixed-size record each
+#     checkpoint.json   trials/chunks done, elapsed time, bit generator state
+#
+#   def permuted_f(rng, size):               # any (rng, size) -> (size, ...) array
+#       ...
+#   run = SimulationRun("runs/perm_f", permuted_f, dtype="f8", seed=1)
+#   run.run(1_000_000_000)                    # Ctrl-C or SIGTERM, then rerun:
+#   run = SimulationRun("runs/perm_f", permuted_f, dtype="f8", seed=1)
+#   run.run(1_000_000_000)                    # continues where it stopped
+#   values = run.results()                    # np.memmap, loaded lazily
+#
+# On resume anything written after the last checkpoint is cut off and the
+# generator is rewound to the checkpointed state, so the finished results are
+# identical to an uninterrupted run with the same seed and chunk size.
+# The checkpoint is written to a temporary file and renamed over the old one,
+# so a crash mid-write leaves the previous checkpoint intact.
+
+META = "meta.json"
+RESULTS = "results.bin"
+CHECKPOINT = "checkpoint.json"
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(data, fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+class SimulationRun:
+    """
+    Parameters:
+    - directory: where the run lives; created if needed, resumed if it exists.
+    - simulate: function (rng, size) -> array of `size` trials, each of
+      shape trial_shape.
+    - dtype, trial_shape: layout of one trial's result.
+    - seed: seed of a new run (ignored when resuming; the stored state wins).
+    - chunk_size: trials per call to simulate.
+    - bit_generator: 'PCG64', 'PCG64DXSM' or 'Philox' (see common/rng_streams.py).
+    """
+    def __init__(self, directory, simulate, dtype="f8", trial_shape=(), seed=None,
+                 chunk_size=1_000_000, bit_generator="PCG64"):
+        self.directory = directory
+        self.simulate = simulate
+        self.meta_path = os.path.join(directory, META)
+        self.results_path = os.path.join(directory, RESULTS)
+        self.checkpoint_path = os.path.join(directory, CHECKPOINT)
+        os.makedirs(directory, exist_ok=True)
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as fh:
+                self.meta = json.load(fh)
+            if np.dtype(self.meta["dtype"]) != np.dtype(dtype) or tuple(self.meta["trial_shape"]) != tuple(trial_shape):
+                raise ValueError(f"{directory} holds {self.meta['dtype']} trials of shape "
+                                 f"{tuple(self.meta['trial_shape'])}, not {np.dtype(dtype).str} {tuple(trial_shape)}")
+        else:
+            streams = RandomStreams(seed, bit_generator)
+            self.meta = {"dtype": np.dtype(dtype).str, "trial_shape": list(trial_shape),
+                         "chunk_size": chunk_size, "bit_generator": bit_generator,
+                         "entropy": streams.entropy}
+            _write_json(self.meta_path, self.meta)
+
+        self.dtype = np.dtype(self.meta["dtype"])
+        self.trial_shape = tuple(self.meta["trial_shape"])
+        self.chunk_size = self.meta["chunk_size"]
+        self.record_bytes = self.dtype.itemsize * int(np.prod(self.trial_shape, dtype=np.int64))
+        self._restore()
+
+    def _restore(self):
+        self.rng = RandomStreams(self.meta["entropy"], self.meta["bit_generator"]).root()
+        self.trials_done = 0
+        self.chunks_done = 0
+        self.elapsed = 0.0
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as fh:
+                checkpoint = json.load(fh)
+            self.rng.bit_generator.state = checkpoint["rng_state"]
+            self.trials_done = checkpoint["trials_done"]
+            self.chunks_done = checkpoint["chunks_done"]
+            self.elapsed = checkpoint["elapsed"]
+        # drop results written after the last checkpoint; they will be
+        # regenerated from the restored generator state.
+        with open(self.results_path, "ab") as fh:
+            fh.truncate(self.trials_done * self.record_bytes)
+
+    def checkpoint(self):
+        _write_json(self.checkpoint_path, {
+            "trials_done": self.trials_done,
+            "chunks_done": self.chunks_done,
+            "elapsed": self.elapsed,
+            "rng_state": self.rng.bit_generator.state,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+
+    def run(self, trials, checkpoint_every=60.0, progress=None):
+        """
+        Simulates until `trials` trials are stored in total.
+
+        A checkpoint is written at least every `checkpoint_every` seconds and
+        when the run finishes or is interrupted.  SIGTERM stops after the
+        chunk in progress; an exception (e.g. KeyboardInterrupt) abandons it
+        and rewinds the generator to its start.  progress, if
+        given, is called as progress(trials_done, trials) after every chunk.
+
+        Returns the number of trials stored.
+        """
+        stop = []
+        previous_handler = None
+        try:
+            previous_handler = signal.signal(signal.SIGTERM, lambda signum, frame: stop.append(signum))
+        except ValueError:
+            pass  # not in the main thread; SIGTERM keeps its default behaviour
+
+        last_checkpoint = time.time()
+        try:
+            with open(self.results_path, "ab") as fh:
+                while self.trials_done < trials and not stop:
+                    start_time = time.time()
+                    size = min(self.chunk_size, trials - self.trials_done)
+                    rng_state = self.rng.bit_generator.state
+                    try:
+                        chunk = np.asarray(self.simulate(self.rng, size), dtype=self.dtype)
+                        if chunk.shape != (size,) + self.trial_shape:
+                            raise ValueError(f"simulate returned shape {chunk.shape}, "
+                                             f"expected {(size,) + self.trial_shape}")
+                        fh.write(np.ascontiguousarray(chunk).tobytes())
+                    except BaseException:
+                        # interrupted mid-chunk: rewind so the checkpoint below
+                        # matches the trials actually stored.
+                        self.rng.bit_generator.state = rng_state
+                        raise
+                    self.trials_done += size
+                    self.chunks_done += 1
+                    self.elapsed += time.time() - start_time
+                    if progress is not None:
+                        progress(self.trials_done, trials)
+                    if time.time() - last_checkpoint >= checkpoint_every:
+                        fh.flush()
+                        os.fsync(fh.fileno())
+                        self.checkpoint()
+                        last_checkpoint = time.time()
+        finally:
+            # the data file is closed (and flushed) before the checkpoint that
+            # refers to it is written.
+            with open(self.results_path, "ab") as fh:
+                os.fsync(fh.fileno())
+            self.checkpoint()
+            if previous_handler is not None:
+                signal.signal(signal.SIGTERM, previous_handler)
+        return self.trials_done
+
+    def results(self):
+        """
+        Read-only memory map of the stored trials, shape (trials,) + trial_shape.
+        Nothing is read from disk until it is indexed.
+        """
+        if self.trials_done == 0:
+            return np.empty((0,) + self.trial_shape, dtype=self.dtype)
+        return np.memmap(self.results_path, dtype=self.dtype, mode="r",
+                         shape=(self.trials_done,) + self.trial_shape)
+
+    def iter_results(self, rows=None):
+        """
+        Yields the stored trials in blocks of `rows` (default chunk_size), for
+        reductions over runs larger than memory.
+        """
+        rows = rows or self.chunk_size
+        results = self.results()
+        for start in range(0, len(results), rows):
+            yield np.asarray(results[start:start + rows])
+
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+
+    # the lecture 24 simulation, ks = rng.binomial(1000, 0.003, size=...),
+    # interrupted part way through and resumed.
+    def binomial_ks(rng, size):
+        return rng.binomial(1000, 0.003, size=size)
+
+    workdir = tempfile.mkdtemp()
+    run_dir = os.path.join(workdir, "ks")
+
+    class Interrupted(Exception):
+        pass
+
+    def interrupt_at(limit):
+        def progress(done, total):
+            if done >= limit:
+                raise Interrupted
+        return progress
+
+    run = SimulationRun(run_dir, binomial_ks, dtype="i2", seed=24, chunk_size=1_000_000)
+    try:
+        run.run(20_000_000, checkpoint_every=0, progress=interrupt_at(7_000_000))
+    except Interrupted:
+        print(f"interrupted after {run.trials_done} trials")
+
+    start_time = time.time()
+    run = SimulationRun(run_dir, binomial_ks, dtype="i2", seed=24)
+    print(f"resuming at {run.trials_done} trials")
+    run.run(20_000_000)
+    print(f"finished {run.trials_done} trials in {time.time() - start_time:.2f} s")
+
+    # identical to an uninterrupted run
+    reference = SimulationRun(os.path.join(workdir, "reference"), binomial_ks, dtype="i2", seed=24,
+                              chunk_size=1_000_000)
+    reference.run(20_000_000)
+    print(f"matches uninterrupted run: {np.array_equal(run.results(), reference.results())}")
+
+    # streaming reduction over the stored results
+    counts = np.zeros(30, dtype=np.int64)
+    for block in run.iter_results():
+        counts += np.bincount(block, minlength=30)[:30]
+    ks = run.results()
+    print(f"P(k <= 3) = {counts[:4].sum() / len(ks):.4f}, "
+          f"95% interval [{np.percentile(ks[:1_000_000], 2.5)}, {np.percentile(ks[:1_000_000], 97.5)}]")
+    shutil.rmtree(workdir)
@@ -0,0 +1,133 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+# Cold-start cost of the lecture scripts, measured with `python -X importtime`.
+#
+# Each entry point is imported in a fresh interpreter (nothing is run: the
+# scripts only start their demos under __main__).  -X importtime writes one
+# line per imported module to stderr:
+#
+#   import time: self [us] | cumulative | imported package
+#
+# From that we take the total import time of the entry point and its most
+# expensive dependencies.  Results are appended to a JSON-lines history file
+# so a change in startup latency shows up against the previous run:
+#
+#   python startup_benchmark.py                  # all entry points
+#   python startup_benchmark.py t_ci_plots       # just one
+#   python startup_benchmark.py --repeat 5 --top 8
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".startup_times.jsonl")
+
+# name -> (directory relative to the repo root, module to import)
+ENTRY_POINTS = {
+    "t_ci_plots": ("lecture11", "t_ci_plots"),
+    "s_ci_plots": ("lecture11", "s_ci_plots"),
+    "sigma_ci_plots": ("lecture11", "sigma_ci_plots"),
+    "u_sampling_distribution_2_plots": ("lecture11", "u_sampling_distribution_2_plots"),
+    "u_sampling_distribution_3_plots": ("lecture11", "u_sampling_distribution_3_plots"),
+    "exp_sampling_distribution_2_plots": ("lecture11", "exp_sampling_distribution_2_plots"),
+    "exp_sampling_distribution_3_plots": ("lecture11", "exp_sampling_distribution_3_plots"),
+    "sampling_distributions": ("lecture11", "sampling_distributions"),
+    "example_1_array_add": ("lecture01/example1", "example_1_array_add"),
+    "example_2_matrix_multi": ("lecture01/example2_matrix_mult", "example_2_matrix_multi"),
+}
+
+
+def parse_importtime(stderr):
+    """
+    Returns a list of (module, self_us, cumulative_us, depth) from the
+    -X importtime output; depth is the nesting level of the import.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def measure(name, repeat=3, top=5):
+    """
+    Imports one entry point `repeat` times in fresh interpreters and keeps
+    the fastest run (the least disturbed by the rest of the machine).
+    """
+    directory, module = ENTRY_POINTS[name]
+    cwd = os.path.join(REPO_ROOT, directory)
+    env = dict(os.environ, MPLBACKEND="Agg", PYTHONDONTWRITEBYTECODE="1")
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                   cwd=cwd, env=env, capture_output=True, text=True)
+        wall = time.perf_counter() - start_time
+        if completed.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{completed.stderr[-2000:]}")
+        rows = parse_importtime(completed.stderr)
+        # children are printed before their parent, so the entry point's own
+        # imports are the nested rows directly above its top-level row.
+        end = max(i for i, row in enumerate(rows) if row[0] == module and row[3] == 0)
+        start = end
+        while start > 0 and rows[start - 1][3] > 0:
+            start -= 1
+        total_us = rows[end][2]
+        if best is None or total_us < best["import_ms"] * 1000:
+            heaviest = sorted((r for r in rows[start:end] if r[3] == 1),
+                              key=lambda r: r[2], reverse=True)[:top]
+            best = {"entry_point": name, "import_ms": total_us / 1000, "wall_ms": 1000 * wall,
+                    "modules": len(rows),
+                    "heaviest": [(mod, cumulative / 1000) for mod, _, cumulative, _ in heaviest]}
+    return best
+
+
+def previous_results(path=HISTORY):
+    last = {}
+    if os.path.exists(path):
+        with open(path) as fh:
+            for line in fh:
+                record = json.loads(line)
+                last[record["entry_point"]] = record
+    return last
+
+
+def main(argv):
+    repeat, top = 3, 5
+    names = []
+    args = iter(argv)
+    for arg in args:
+        if arg == "--repeat":
+            repeat = int(next(args))
+        elif arg == "--top":
+            top = int(next(args))
+        else:
+            names.append(arg)
+    for name in names:
+        if name not in ENTRY_POINTS:
+            raise SystemExit(f"unknown entry point {name!r}; choose from {sorted(ENTRY_POINTS)}")
+
+    previous = previous_results()
+    stamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+    with open(HISTORY, "a") as history:
+        for name in names or ENTRY_POINTS:
+            result = measure(name, repeat, top)
+            result["time"] = stamp
+            history.write(json.dumps(result) + "\n")
+
+            change = ""
+            if name in previous:
+                change = f"  ({result['import_ms'] - previous[name]['import_ms']:+.1f} ms vs last run)"
+            print(f"{name}: import {result['import_ms']:.1f} ms, process {result['wall_ms']:.0f} ms, "
+                  f"{result['modules']} modules{change}")
+            for module, ms in result["heaviest"]:
+                print(f"    {module:<30} {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,150 @@
+import importlib
+import math
+from functools import lru_cache
+from statistics import NormalDist
+
+
+# Small, fast-loading replacements for the handful of scipy.stats calls the
+# lecture scripts make, plus lazy module imports.
+#
+# `import scipy.stats` costs over a second and `import matplotlib.pyplot` most
+# of another, which dominates short headless runs (figure builds, coverage,
+# importing a script for one function).  The scripts only need
+#
+#   stats.t.ppf(0.975, df)    -> t_ppf(0.975, df)
+#   stats.norm.pdf(x, m, s)   -> norm_pdf(x, m, s)
+#   stats.uniform.pdf(x, a, w)-> uniform_pdf(x, a, w)
+#
+# which need nothing beyond NumPy and the standard library.  Common t
+# quantiles are tabulated below (values from scipy.stats.t.ppf); anything else
+# falls back to SciPy, imported on first use and cached.
+#
+# lazy_import("matplotlib.pyplot") returns a stand-in that imports the module
+# the first time an attribute is used, so `plt.subplots(...)` works unchanged
+# and scripts that never plot never pay for pyplot.  It also means the
+# backend can still be chosen (e.g. Agg) after the script was imported.
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+_np = lazy_import("numpy")
+_scipy_stats = lazy_import("scipy.stats")
+
+# t quantiles for df = 1..30 at the usual confidence levels (one-sided q).
+_T_TABLE = {
+    0.9: (3.077683537, 1.885618083, 1.637744354, 1.533206274, 1.475884049, 1.439755747,
+          1.414923928, 1.39681531, 1.383028738, 1.372183641, 1.363430318, 1.356217334,
+          1.350171289, 1.345030374, 1.340605608, 1.336757167, 1.33337939, 1.330390944,
+          1.327728209, 1.325340707, 1.323187874, 1.321236742, 1.31946024, 1.317835934,
+          1.316345073, 1.314971864, 1.313702913, 1.312526782, 1.311433647, 1.310415025),
+    0.95: (6.313751515, 2.91998558, 2.353363435, 2.131846786, 2.015048373, 1.943180281,
+           1.894578605, 1.859548038, 1.833112933, 1.812461123, 1.795884819, 1.782287556,
+           1.770933396, 1.761310136, 1.753050356, 1.745883676, 1.739606726, 1.734063607,
+           1.729132812, 1.724718243, 1.720742903, 1.717144374, 1.713871528, 1.71088208,
+           1.708140761, 1.70561792, 1.703288446, 1.701130934, 1.699127027, 1.697260887),
+    0.975: (12.70620474, 4.30265273, 3.182446305, 2.776445105, 2.570581836, 2.446911851,
+            2.364624252, 2.306004135, 2.262157163, 2.228138852, 2.20098516, 2.17881283,
+            2.160368656, 2.144786688, 2.131449546, 2.119905299, 2.109815578, 2.10092204,
+            2.093024054, 2.085963447, 2.079613845, 2.073873068, 2.06865761, 2.063898562,
+            2.059538553, 2.055529439, 2.051830516, 2.048407142, 2.045229642, 2.042272456),
+    0.99: (31.82051595, 6.964556734, 4.540702859, 3.746947388, 3.364929999, 3.142668403,
+           2.997951567, 2.896459448, 2.821437925, 2.763769458, 2.718079184, 2.680997993,
+           2.650308838, 2.624494068, 2.602480295, 2.583487185, 2.566933984, 2.55237963,
+           2.539483191, 2.527977003, 2.517648016, 2.508324553, 2.499866739, 2.492159473,
+           2.485107175, 2.478629824, 2.472659912, 2.467140098, 2.46202136, 2.457261542),
+    0.995: (63.65674116, 9.924843201, 5.84090931, 4.604094871, 4.032142984, 3.707428021,
+            3.499483297, 3.355387331, 3.249835542, 3.169272673, 3.105806516, 3.054539589,
+            3.012275839, 2.976842734, 2.946712883, 2.920781622, 2.89823052, 2.878440473,
+            2.860934606, 2.84533971, 2.831359558, 2.818756061, 2.807335684, 2.796939505,
+            2.787435814, 2.778714533, 2.770682957, 2.763262455, 2.756385904, 2.749995654),
+}
+
+_STANDARD_NORMAL = NormalDist()
+
+
+@lru_cache(maxsize=None)
+def norm_ppf(q, loc=0.0, scale=1.0):
+    return loc + scale * _STANDARD_NORMAL.inv_cdf(q)
+
+
+def norm_cdf(x, loc=0.0, scale=1.0):
+    if isinstance(x, (int, float)):
+        return 0.5 * math.erfc(-(x - loc) / (scale * math.sqrt(2)))
+    # vectorized erfc without SciPy: evaluate the float cdf elementwise.
+    z = (_np.asarray(x, dtype=float) - loc) / scale
+    return _np.vectorize(_STANDARD_NORMAL.cdf, otypes=[float])(z)
+
+
+def norm_pdf(x, loc=0.0, scale=1.0):
+    if isinstance(x, (int, float)):
+        z = (x - loc) / scale
+        return math.exp(-0.5 * z * z) / (scale * math.sqrt(2 * math.pi))
+    z = (_np.asarray(x, dtype=float) - loc) / scale
+    return _np.exp(-0.5 * z * z) / (scale * math.sqrt(2 * math.pi))
+
+
+def uniform_pdf(x, loc=0.0, scale=1.0):
+    if isinstance(x, (int, float)):
+        return 1.0 / scale if loc <= x <= loc + scale else 0.0
+    x = _np.asarray(x, dtype=float)
+    return _np.where((x >= loc) & (x <= loc + scale), 1.0 / scale, 0.0)
+
+
+@lru_cache(maxsize=None)
+def t_ppf(q, df):
+    """
+    Quantile of Student's t with df degrees of freedom.  Tabulated levels and
+    their lower tails (q and 1 - q) with integer df <= 30 are a lookup;
+    everything else is computed by SciPy once and cached.
+    """
+    lower = q < 0.5
+    upper_q = round(1 - q, 12) if lower else q
+    if upper_q in _T_TABLE and df == int(df) and 1 <= df <= 30:
+        value = _T_TABLE[upper_q][int(df) - 1]
+        return -value if lower else value
+    return float(_scipy_stats.t.ppf(q, df))
+
+
+def t_critical(confidence, df):
+    # two-sided critical value, e.g. t_critical(0.95, n - 1)
+    return t_ppf(1 - (1 - confidence) / 2, df)
+
+
+def z_critical(confidence):
+    return norm_ppf(1 - (1 - confidence) / 2)
+
+
+if __name__ == "__main__":
+    import time
+
+    start_time = time.perf_counter()
+    for df in range(1, 31):
+        t_critical(0.95, df)
+    print(f"30 table lookups: {1e6 * (time.perf_counter() - start_time):.0f} us "
+          f"(scipy.stats {_scipy_stats!r})")
+
+    start_time = time.perf_counter()
+    value = t_ppf(0.975, 45)
+    print(f"t_ppf(0.975, 45) = {value:.6f}: first fallback {time.perf_counter() - start_time:.3f} s")
+    start_time = time.perf_counter()
+    t_ppf(0.975, 45)
+    print(f"cached: {1e6 * (time.perf_counter() - start_time):.1f} us")
@@ -0,0 +1,219 @@
+import threading
+from collections import deque
+import numpy as np
+from precision import as_policy
+
+
+# Background precomputation of trials for the interactive sampling demos.
+#
+# The *_sampling_distribution_* scripts used to draw inside on_key, on the GUI
+# thread: a keypress drew one sample, 'a' drew 500, and 'n' redrew the whole
+# history with one more value per trial, which freezes the window for a long
+# history.  A TrialPrefetcher draws ahead on a producer thread:
+#
+#   * a few single trials and 'a' batches for the current n, in bounded
+#     queues, so a keypress only pops a ready result;
+#   * a shadow copy of the history for n + 1, extended in the background every
+#     time the history grows, so 'n' swaps it in instead of regenerating.
+#     After the swap the producer starts on the shadow for n + 2.
+#
+# The event handlers only wait if the producer has fallen behind, e.g. 'n'
+# pressed twice in quick succession on a long history.
+#
+# Every kind of draw has its own random stream per n, derived from the rng
+# passed in.  Results depend only on the seed and the keys pressed, not on how
+# far the producer happened to get: whatever was prefetched for an old n is
+# simply dropped together with its streams.
+
+SINGLE, BATCH, SHADOW = 0, 1, 2
+
+
+def stream_entropy(rng):
+    """The entropy every per-n stream is derived from, drawn from rng."""
+    return [int(v) for v in rng.integers(0, 2**63, size=4)]
+
+
+def trial_stream(entropy, n, kind):
+    """The Generator for draws of `kind` (SINGLE, BATCH or SHADOW) at sample size n."""
+    return np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(n, kind)))
+
+
+class TrialPrefetcher:
+    """
+    Parameters:
+    - draw: function (rng, size) -> array of draws, e.g.
+      lambda g, size: policy.uniform(g, 0, 1, size=size).
+    - n: starting sample size.
+    - rng: Generator the prefetcher's streams are derived from.
+    - policy: DtypePolicy used for the sample means (see precision.py).
+    - batch_size: trials per 'a' batch.
+    - singles_ahead, batches_ahead: how many of each to keep ready.
+    - shadow_chunk: history rows regenerated per step for n + 1, so single
+      trials and batches are refilled in between.
+    """
+    def __init__(self, draw, n, rng, policy=None, batch_size=500, singles_ahead=16, batches_ahead=2,
+                 shadow_chunk=20_000):
+        self.draw = draw
+        self.policy = as_policy(policy)
+        self.batch_size = batch_size
+        self.singles_ahead = singles_ahead
+        self.batches_ahead = batches_ahead
+        self.shadow_chunk = shadow_chunk
+        self._entropy = stream_entropy(rng)
+
+        self._cond = threading.Condition()
+        self._closed = False
+        self._error = None
+        self._history = 0                  # trials handed out for the current n
+        self._start(n, shadow=None, shadow_rows=0)
+        self._thread = threading.Thread(target=self._run, name="trial-prefetch", daemon=True)
+        self._thread.start()
+
+    def _stream(self, n, kind):
+        return trial_stream(self._entropy, n, kind)
+
+    def _start(self, n, shadow, shadow_rows):
+        # called with the lock held (or before the thread starts)
+        self.n = n
+        self._epoch = getattr(self, "_epoch", -1) + 1
+        self._streams = {SINGLE: self._stream(n, SINGLE), BATCH: self._stream(n, BATCH),
+                         SHADOW: self._stream(n + 1, SHADOW)}
+        self._singles = deque()
+        self._batches = deque()
+        self._shadow = [] if shadow is None else shadow   # chunks of (samples, means) for n + 1
+        self._shadow_rows = shadow_rows
+
+    def _task(self):
+        # what to compute next, most urgent first; None if everything is ready
+        if len(self._singles) < self.singles_ahead:
+            return SINGLE, 1
+        if len(self._batches) < self.batches_ahead:
+            return BATCH, self.batch_size
+        if self._shadow_rows < self._history:
+            return SHADOW, min(self.shadow_chunk, self._history - self._shadow_rows)
+        return None
+
+    def _run(self):
+        try:
+            while True:
+                with self._cond:
+                    while not self._closed and self._task() is None:
+                        self._cond.wait()
+                    if self._closed:
+                        return
+                    kind, rows = self._task()
+                    epoch, n, stream = self._epoch, self.n, self._streams[kind]
+                    if kind == SHADOW:
+                        n += 1
+                        # claim the rows so the next task doesn't redo them
+                        self._shadow_rows += rows
+
+                samples = self.draw(stream, (rows, n))
+                means = self.policy.mean(samples, axis=1)
+
+                with self._cond:
+                    if epoch != self._epoch:
+                        continue               # n changed meanwhile: drop it
+                    if kind == SINGLE:
+                        self._singles.append((samples[0], means[0]))
+                    elif kind == BATCH:
+                        self._batches.append((samples, means))
+                    else:
+                        self._shadow.append((samples, means))
+                    self._cond.notify_all()
+        except BaseException as error:
+            with self._cond:
+                self._error = error
+                self._cond.notify_all()
+
+    def _wait_for(self, ready):
+        # with the lock held: wait until ready() or the producer failed
+        while not ready():
+            if self._error is not None:
+                raise RuntimeError("trial prefetch thread failed") from self._error
+            if self._closed:
+                raise RuntimeError("TrialPrefetcher is closed")
+            self._cond.wait()
+
+    def next_trial(self):
+        """One trial: (sample of n values, its mean)."""
+        with self._cond:
+            self._wait_for(lambda: self._singles)
+            sample, mean = self._singles.popleft()
+            self._history += 1
+            self._cond.notify_all()
+            return sample, mean
+
+    def next_batch(self):
+        """batch_size trials: (samples, shape (batch_size, n), and their means)."""
+        with self._cond:
+            self._wait_for(lambda: self._batches)
+            samples, means = self._batches.popleft()
+            self._history += len(means)
+            self._cond.notify_all()
+            return samples, means
+
+    def increase_n(self):
+        """
+        Moves to n + 1 and returns the history regenerated with n + 1 values
+        per trial: (samples, shape (trials, n + 1), and their means).
+        """
+        with self._cond:
+            history = self._history
+            self._wait_for(lambda: sum(len(means) for _, means in self._shadow) >= history)
+            if self._shadow:
+                samples = np.concatenate([s for s, _ in self._shadow])[:history]
+                means = np.concatenate([m for _, m in self._shadow])[:history]
+            else:
+                samples = np.empty((0, self.n + 1), dtype=self.policy.dtype)
+                means = np.empty(0, dtype=self.policy.dtype)
+            # the shadow for n + 2 starts empty and catches up in the background
+            self._start(self.n + 1, shadow=None, shadow_rows=0)
+            self._history = history
+            self._cond.notify_all()
+            return samples, means
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+
+if __name__ == "__main__":
+    import time
+
+    # one long history, then 'n': how long does the keypress take?
+    rng = np.random.default_rng(42)
+    prefetch = TrialPrefetcher(lambda g, size: g.uniform(0, 1, size=size), 4, rng)
+    for _ in range(400):
+        prefetch.next_batch()
+    time.sleep(1.0)     # the user looking at the plot; the producer catches up
+    start_time = time.perf_counter()
+    samples, means = prefetch.increase_n()
+    print(f"'n' with {len(means)} trials in the history: {1000 * (time.perf_counter() - start_time):.1f} ms "
+          f"-> samples {samples.shape}")
+
+    start_time = time.perf_counter()
+    regenerated = np.random.default_rng(1).uniform(0, 1, size=(len(means), 6)).mean(axis=1)
+    print(f"regenerating synchronously instead: {1000 * (time.perf_counter() - start_time):.1f} ms")
+
+    latencies = []
+    for _ in range(200):
+        start_time = time.perf_counter()
+        prefetch.next_trial()
+        latencies.append(time.perf_counter() - start_time)
+        time.sleep(0.001)
+    print(f"single trial: median {1e6 * np.median(latencies):.0f} us, max {1e6 * max(latencies):.0f} us")
+    prefetch.close()
+
+    # same seed and keys, same results, however far the producer got
+    def replay(pause):
+        prefetch = TrialPrefetcher(lambda g, size: g.uniform(0, 1, size=size), 4, np.random.default_rng(7))
+        results = [prefetch.next_trial()[1], prefetch.next_batch()[1].sum()]
+        time.sleep(pause)
+        results.append(prefetch.increase_n()[1].sum())
+        results.append(prefetch.next_trial()[1])
+        prefetch.close()
+        return results
+    print(f"reproducible: {replay(0) == replay(0.2)}")
@@ -1,16 +1,28 @@
+import os
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
-import scipy.stats as stats
-
-def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None):
-    np.random.seed(seed)
+from stats_kernels import lazy_import, norm_pdf
+from sampling_distributions import uniform_mean_pdf
+from precision import as_policy
+from trial_prefetch import TrialPrefetcher
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)      # the repository root, for common/
+from common.instrumentation import counter, timed
+from common.rng_streams import as_generator
+
+plt = lazy_import("matplotlib.pyplot")
+
+def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None, rng=None, policy=None):
+    rng = as_generator(rng, seed)
+    policy = as_policy(policy)  # e.g. 'float32'; see precision.py
     
     a, b = 0, 1  # Uniform U[0,1] parameters
     population_mean = (a + b) / 2  # Mean of U[0,1] is 0.5
     population_std_dev = (b - a) / np.sqrt(12)  # Standard deviation of U[0,1]
     
-    sample_means = []  # Stores sample means over trials
-    all_samples = []   # Stores all individual sample values
+    sample_means = policy.store()  # Stores sample means over trials
+    all_samples = policy.store()   # Stores all individual sample values
     total_trials = 0   # Tracks the number of trials
 
     buffer = 0.2  # ✅ Extra padding for X-axis
@@ -20,6 +32,11 @@ def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None
     plt.ion()
     fig, axes = plt.subplots(2, 1, figsize=(8, 10), gridspec_kw={'height_ratios': [1, 2]})
 
+    # ✅ Trials are drawn ahead on a background thread (see trial_prefetch.py)
+    prefetch = TrialPrefetcher(lambda g, size: policy.uniform(g, a, b, size=size), n, rng, policy)
+
+    trials = counter("trials_total", "sample means drawn by keypresses")
+
     def on_key(event):
         nonlocal total_trials, n, sample_means, all_samples  
 
@@ -28,12 +45,12 @@ def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None
         if event.key == 'a':  # ✅ Advance 500 sample means
             num_iterations = 500  
             print(f"Advancing 500 sample means (n={n})...")
-            for _ in range(num_iterations):
-                total_trials += 1
-                sample = np.random.uniform(a, b, size=n)
-                sample_mean = np.mean(sample)
-                sample_means.append(sample_mean)
-                all_samples.extend(sample)
+            samples, means = prefetch.next_batch()  # ✅ Drawn ahead on the prefetch thread
+            total_trials += num_iterations
+            trials.inc(num_iterations)
+            sample_means.extend(means)
+            all_samples.extend(samples.ravel())
+            sample = samples[-1]
 
         elif event.key == 'n':  # ✅ Increase n and regenerate from scratch
             n += 1  
@@ -43,18 +60,20 @@ def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None
 
         elif event.key == 'q':  # Quit
             print("Exiting...")
+            prefetch.close()
             plt.close()
             return
 
         else:  # Default: advance by 1 sample mean
             total_trials += 1
-            sample = np.random.uniform(a, b, size=n)
-            sample_mean = np.mean(sample)
+            trials.inc()
+            sample, sample_mean = prefetch.next_trial()
             sample_means.append(sample_mean)
             all_samples.extend(sample)
 
         update_plot(sample, sample_means, all_samples, total_trials)  # ✅ Now `sample` is always valid
 
+    @timed("recompute_sample_means_seconds")
     def recompute_sample_means():
         """ Resets and recomputes sample means with the updated `n`. """
         nonlocal total_trials
@@ -62,13 +81,13 @@ def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None
         sample_means.clear()
         all_samples.clear()
 
-        for _ in range(total_trials):  # Regenerate the same number of trials
-            sample = np.random.uniform(a, b, size=n)
-            sample_means.append(np.mean(sample))
-            all_samples.extend(sample)
+        samples, means = prefetch.increase_n()  # History for the new n, regenerated in the background
+        sample_means.extend(means)
+        all_samples.extend(samples.ravel())
 
         update_plot([], sample_means, all_samples, total_trials)
 
+    @timed("update_plot_seconds")
     def update_plot(sample, sample_means, all_samples, total_trials):
         axes[0].clear()
         axes[1].clear()
@@ -96,13 +115,14 @@ def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None
 
         # --- Bottom Plot: Histogram of Sample Means ---
         if len(sample_means) > 0:
-            axes[1].hist(sample_means, bins=bins, density=True, alpha=0.8, color='lightblue')
+            axes[1].hist(sample_means.view(), bins=bins, density=True, alpha=0.8, color='lightblue')
 
             x_vals = np.linspace(x_min, x_max, 1000)
             
             # ✅ Green Theoretical Normal Approximation
-            normal_approx = stats.norm.pdf(x_vals, loc=population_mean, scale=population_std_dev / np.sqrt(n))
+            normal_approx = norm_pdf(x_vals, loc=population_mean, scale=population_std_dev / np.sqrt(n))
             axes[1].plot(x_vals, normal_approx, color='green', linestyle='-', label="Gaussian Approximation")
+            axes[1].plot(x_vals, uniform_mean_pdf(x_vals, n, a, b), color='black', linestyle=':', linewidth=2, label="Exact (Irwin-Hall)")
             
             # ✅ Magenta Line for Latest Sample Mean
             latest_sample_mean = sample_means[-1]
@@ -138,8 +158,7 @@ def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None
     fig.canvas.mpl_connect('key_press_event', on_key)
 
     # ✅ Run the first trial automatically
-    first_sample = np.random.uniform(a, b, size=n)
-    first_sample_mean = np.mean(first_sample)
+    first_sample, first_sample_mean = prefetch.next_trial()
     sample_means.append(first_sample_mean)
     all_samples.extend(first_sample)
     total_trials += 1
@@ -147,5 +166,6 @@ def animated_sampling_distribution(n=4, initial_bins=30, max_bins=120, seed=None
 
     plt.show(block=True)  
 
-# Run the interactive animation
-animated_sampling_distribution(n=4, seed=42)
+if __name__ == "__main__":
+    # Run the interactive animation
+    animated_sampling_distribution(n=4, seed=42)
@@ -0,0 +1,268 @@
+import os
+import sys
+from collections import namedtuple
+import numpy as np
+from scipy import stats
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)      # the repository root, for common/
+from common.rng_streams import as_generator
+
+
+# Power and sample size by simulation: "how many users do we need?"
+#
+# A design simulates one experiment (two groups, k groups, or two conversion
+# rates) and turns it into a p-value with the test used elsewhere in the
+# course: the two-sample t-test of the final worksheet, a difference-in-means
+# permutation test (lecture 17), the one-way ANOVA F-test (lecture 22), or the
+# 2x2 chi-square test (lecture 23).  Every test is vectorized over the
+# replicates, so one call evaluates thousands of simulated experiments.
+#
+# Common random numbers: a design first draws standardized noise for all
+# replicates, and every (effect, n) cell of a grid is built from that same
+# noise (the first n columns, shifted by the effect).  Neighbouring cells then
+# differ only through effect and n, not through simulation luck, so power
+# curves are smooth and monotone with far fewer replicates, and bisection on n
+# works on a deterministic function.
+
+PowerResult = namedtuple("PowerResult", ["power", "effects", "ns"])
+SampleSizeResult = namedtuple("SampleSizeResult", ["n", "power", "evaluations"])
+
+
+# --- vectorized tests: axis 0 is the replicate -------------------------------
+
+def t_test_pvalues(a, b, equal_var=True):
+    n_a, n_b = a.shape[-1], b.shape[-1]
+    mean_a, mean_b = a.mean(axis=-1), b.mean(axis=-1)
+    var_a, var_b = a.var(axis=-1, ddof=1), b.var(axis=-1, ddof=1)
+    if equal_var:
+        df = n_a + n_b - 2
+        se = np.sqrt(((n_a - 1) * var_a + (n_b - 1) * var_b) / df * (1 / n_a + 1 / n_b))
+    else:
+        v_a, v_b = var_a / n_a, var_b / n_b
+        se = np.sqrt(v_a + v_b)
+        df = (v_a + v_b) ** 2 / (v_a ** 2 / (n_a - 1) + v_b ** 2 / (n_b - 1))
+    t_stat = (mean_b - mean_a) / se
+    return 2 * stats.t.sf(np.abs(t_stat), df)
+
+
+def permutation_pvalues(a, b, permutations, chunk_size=64):
+    """
+    Two-sided difference-in-means permutation test for every replicate.
+
+    `permutations` is an array of index permutations of the pooled sample,
+    shape (P, n_a + n_b); sharing them across replicates and grid cells is
+    another common random number.
+    """
+    n_a = a.shape[-1]
+    pooled = np.concatenate([a, b], axis=-1)
+    observed = np.abs(b.mean(axis=-1) - a.mean(axis=-1))
+    exceed = np.zeros(len(pooled))
+    for start in range(0, len(pooled), chunk_size):
+        block = pooled[start:start + chunk_size][:, permutations]   # (chunk, P, n)
+        diff = block[..., n_a:].mean(axis=-1) - block[..., :n_a].mean(axis=-1)
+        exceed[start:start + chunk_size] = np.sum(np.abs(diff) >= observed[start:start + chunk_size, None] - 1e-12, axis=1)
+    return (exceed + 1) / (len(permutations) + 1)
+
+
+def anova_pvalues(groups):
+    # groups: (replicates, k, n) with equal group sizes
+    _, k, n = groups.shape
+    means = groups.mean(axis=-1)
+    grand_mean = means.mean(axis=-1, keepdims=True)
+    ss_between = n * np.sum((means - grand_mean) ** 2, axis=-1)
+    ss_within = np.sum((groups - means[..., None]) ** 2, axis=(-2, -1))
+    f_stat = (ss_between / (k - 1)) / (ss_within / (k * n - k))
+    return stats.f.sf(f_stat, k - 1, k * n - k)
+
+
+def chi2_2x2_pvalues(successes_a, successes_b, n, correction=False):
+    # Pearson chi-square on [[s_a, n - s_a], [s_b, n - s_b]] for every replicate.
+    observed = np.stack([successes_a, n - successes_a, successes_b, n - successes_b], axis=-1).astype(float)
+    column = np.stack([successes_a + successes_b, 2 * n - successes_a - successes_b], axis=-1)
+    expected = np.concatenate([column, column], axis=-1) / 2.0
+    deviation = np.abs(observed - expected)
+    if correction:
+        deviation = np.clip(deviation - 0.5, 0, None)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        chi2 = np.sum(np.where(expected > 0, deviation ** 2 / expected, 0.0), axis=-1)
+    return stats.chi2.sf(chi2, 1)
+
+
+# --- designs -------------------------------------------------------------------
+#
+# noise(rng, replicates, n) draws the shared randomness with the sample size on
+# the last axis; pvalues(noise, n, effect) builds the experiment of size n from
+# the first n columns and tests it.
+
+class TwoSampleNormal:
+    """
+    Control ~ Normal(0, sd), treatment ~ Normal(effect, sd_treatment), n per
+    group.  test is 't' (pooled), 'welch' or 'permutation'.
+    """
+    def __init__(self, sd=1.0, sd_treatment=None, test="t", permutations=999, seed=None):
+        if test not in ("t", "welch", "permutation"):
+            raise ValueError(f"unknown test {test!r}")
+        self.sd = sd
+        self.sd_treatment = sd if sd_treatment is None else sd_treatment
+        self.test = test
+        self.permutations = permutations
+        self._perm_rng = np.random.default_rng(seed)
+        self._perm_cache = {}
+
+    def noise(self, rng, replicates, n):
+        return rng.standard_normal((replicates, 2, n))
+
+    def _permutation_indices(self, n):
+        # one fixed set of permutations per n, reused across effects.
+        if n not in self._perm_cache:
+            self._perm_cache[n] = np.argsort(self._perm_rng.random((self.permutations, 2 * n)), axis=1)
+        return self._perm_cache[n]
+
+    def pvalues(self, noise, n, effect):
+        control = self.sd * noise[:, 0, :n]
+        treatment = effect + self.sd_treatment * noise[:, 1, :n]
+        if self.test == "permutation":
+            return permutation_pvalues(control, treatment, self._permutation_indices(n))
+        return t_test_pvalues(control, treatment, equal_var=self.test == "t")
+
+
+class KGroupNormal:
+    """
+    One-way ANOVA with k groups of n: group g has mean effect * pattern[g]
+    (default: the last group is shifted, the others are not).
+    """
+    def __init__(self, k=4, sd=1.0, pattern=None):
+        self.k = k
+        self.sd = sd
+        self.pattern = np.eye(k)[-1] if pattern is None else np.asarray(pattern, dtype=float)
+
+    def noise(self, rng, replicates, n):
+        return rng.standard_normal((replicates, self.k, n))
+
+    def pvalues(self, noise, n, effect):
+        groups = effect * self.pattern[:, None] + self.sd * noise[:, :, :n]
+        return anova_pvalues(groups)
+
+
+class TwoProportion:
+    """
+    Conversion rates p0 (control) and p0 + effect (treatment), n per group,
+    tested with the 2x2 chi-square test.  The noise is uniforms, turned into
+    successes by comparing against the rate, so a larger effect can only add
+    conversions to the same simulated users.
+    """
+    def __init__(self, p0=0.1, correction=False):
+        self.p0 = p0
+        self.correction = correction
+
+    def noise(self, rng, replicates, n):
+        return rng.random((replicates, 2, n))
+
+    def pvalues(self, noise, n, effect):
+        successes_a = np.sum(noise[:, 0, :n] < self.p0, axis=-1)
+        successes_b = np.sum(noise[:, 1, :n] < self.p0 + effect, axis=-1)
+        return chi2_2x2_pvalues(successes_a, successes_b, n, self.correction)
+
+
+# --- power and sample size --------------------------------------------------------
+
+def _extend(noise, design, rng, n):
+    # more columns of noise for a larger n; the existing columns stay put, so
+    # every earlier cell keeps its random numbers.
+    if noise.shape[-1] >= n:
+        return noise
+    extra = design.noise(rng, noise.shape[0], n - noise.shape[-1])
+    return np.concatenate([noise, extra], axis=-1)
+
+
+def power_grid(design, effects, ns, replicates=2000, alpha=0.05, rng=None, seed=None):
+    """
+    Estimated power for every (effect, n) pair.
+
+    Parameters:
+    - design: TwoSampleNormal, KGroupNormal, TwoProportion or any object with
+      noise(rng, replicates, n) and pvalues(noise, n, effect).
+    - effects, ns: grid values (n is per group).
+    - replicates: simulated experiments per cell, shared by all cells.
+    - alpha: significance level.
+
+    Returns PowerResult(power, effects, ns) with power of shape (len(effects), len(ns)).
+    """
+    rng = as_generator(rng, seed)
+    effects = np.atleast_1d(effects)
+    ns = np.atleast_1d(ns).astype(int)
+    noise = design.noise(rng, replicates, int(ns.max()))
+    power = np.empty((len(effects), len(ns)))
+    for i, effect in enumerate(effects):
+        for j, n in enumerate(ns):
+            power[i, j] = np.mean(design.pvalues(noise, n, effect) < alpha)
+    return PowerResult(power, effects, ns)
+
+
+def sample_size(design, effect, target_power=0.8, alpha=0.05, n_min=2, n_max=None,
+                replicates=4000, rng=None, seed=None):
+    """
+    Smallest n per group whose simulated power reaches target_power, found by
+    bisection: about log2(n_max) power evaluations instead of one per n.
+
+    n_max is doubled (with extra noise columns) until it reaches the target,
+    unless given.  Returns SampleSizeResult(n, power, evaluations) where
+    evaluations maps each n tried to its power.
+    """
+    rng = as_generator(rng, seed)
+    evaluations = {}
+
+    def power_at(n):
+        nonlocal noise
+        if n not in evaluations:
+            noise = _extend(noise, design, rng, n)
+            evaluations[n] = np.mean(design.pvalues(noise, n, effect) < alpha)
+        return evaluations[n]
+
+    hi = n_max or max(2 * n_min, 16)
+    noise = design.noise(rng, replicates, hi)
+    while power_at(hi) < target_power:
+        if n_max is not None:
+            raise ValueError(f"power {evaluations[hi]:.3f} at n_max={n_max} is below {target_power}")
+        hi *= 2
+        if hi > 10_000_000:
+            raise ValueError("target power not reached; is the effect zero?")
+
+    lo = n_min
+    if power_at(lo) >= target_power:
+        return SampleSizeResult(lo, evaluations[lo], evaluations)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if power_at(mid) >= target_power:
+            hi = mid
+        else:
+            lo = mid
+    return SampleSizeResult(hi, evaluations[hi], evaluations)
+
+
+if __name__ == "__main__":
+    import time
+
+    # two groups, effect of half a standard deviation: the textbook answer is
+    # n = 64 per group for 80% power at alpha = 0.05.
+    start_time = time.time()
+    result = sample_size(TwoSampleNormal(), effect=0.5, seed=1)
+    print(f"t-test, d = 0.5: n = {result.n} per group (power {result.power:.3f}), "
+          f"{len(result.evaluations)} evaluations in {time.time() - start_time:.2f} s")
+
+    start_time = time.time()
+    result = sample_size(TwoProportion(p0=0.10), effect=0.02, replicates=2000, seed=1)
+    print(f"conversion 10% -> 12%: n = {result.n} per group (power {result.power:.3f}), "
+          f"{len(result.evaluations)} evaluations in {time.time() - start_time:.2f} s")
+
+    start_time = time.time()
+    grid = power_grid(KGroupNormal(k=4), effects=[0.25, 0.5, 0.75], ns=[10, 20, 40, 80], seed=1)
+    print(f"ANOVA power grid ({time.time() - start_time:.2f} s):")
+    for effect, row in zip(grid.effects, grid.power):
+        print(f"  effect {effect:.2f}: " + "  ".join(f"n={n}: {p:.2f}" for n, p in zip(grid.ns, row)))
+
+    start_time = time.time()
+    grid = power_grid(TwoSampleNormal(test="permutation", permutations=199, seed=2),
+                      effects=[0.5], ns=[20, 40, 64], replicates=500, seed=1)
+    print(f"permutation test, d = 0.5: {np.round(grid.power[0], 2)} ({time.time() - start_time:.2f} s)")
@@ -0,0 +1,172 @@
+import os
+import sys
+import numpy as np
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)      # the repository root, for common/
+from common.rng_streams import as_generator
+
+
+# Running means and variances for the power-law convergence study.
+#
+# The lecture 14 notes draw a brand-new sample for every sample size in
+# np.logspace(1, 5, 300), so the total number of draws is the sum of all the
+# sizes.  Here a single stream of samples is drawn and the mean and variance
+# are read off at every checkpoint as the stream grows, so the work is the
+# largest sample size and nothing more.  The stream is generated in chunks,
+# which keeps memory bounded for 10^8 samples, and many independent replicate
+# paths are advanced together as the rows of one array.
+#
+# Variances are accumulated with Chan et al.'s pairwise update (mean and sum of
+# squared deviations per chunk, then merged) rather than from cumsum(x) and
+# cumsum(x**2), which loses all precision for heavy-tailed data.
+
+
+def generate_power_law_samples(n, alpha, x_min, rng=None, replicates=None):
+    """
+    Inverse-transform samples from a power law with density proportional to
+    x^(-alpha) for x >= x_min.  With `replicates` the result has shape (replicates, n).
+    """
+    rng = as_generator(rng)
+    shape = n if replicates is None else (replicates, n)
+    r = rng.uniform(0, 1, shape)
+    return x_min * (1 - r) ** (-1 / (alpha - 1))
+
+
+def power_law_sampler(alpha, x_min):
+    return lambda rng, shape: x_min * (1 - rng.uniform(0, 1, shape)) ** (-1 / (alpha - 1))
+
+
+def exponential_sampler(scale=1):
+    return lambda rng, shape: rng.exponential(scale=scale, size=shape)
+
+
+class RunningMoments:
+    """
+    Count, mean and sum of squared deviations (M2) for R independent streams.
+    """
+    def __init__(self, replicates):
+        self.n = 0
+        self.mean = np.zeros(replicates)
+        self.m2 = np.zeros(replicates)
+
+    def update(self, chunk):
+        # chunk has shape (replicates, b)
+        b = chunk.shape[1]
+        if b == 0:
+            return
+        chunk_mean = chunk.mean(axis=1)
+        chunk_m2 = np.sum((chunk - chunk_mean[:, None]) ** 2, axis=1)
+        n_new = self.n + b
+        delta = chunk_mean - self.mean
+        self.mean += delta * (b / n_new)
+        self.m2 += chunk_m2 + delta ** 2 * (self.n * b / n_new)
+        self.n = n_new
+
+    def variance(self, ddof=1):
+        if self.n - ddof <= 0:
+            return np.full_like(self.m2, np.nan)
+        return self.m2 / (self.n - ddof)
+
+
+def _checkpoints(checkpoints):
+    checkpoints = np.unique(np.asarray(checkpoints, dtype=np.int64))
+    if checkpoints[0] < 1:
+        raise ValueError("checkpoints must be positive sample sizes")
+    return checkpoints
+
+
+def running_moments(samples, checkpoints, ddof=1):
+    """
+    Means and variances of samples[..., :c] for each checkpoint c of an array
+    already in memory.
+
+    Parameters:
+    - samples: shape (n,) or (replicates, n).
+    - checkpoints: sample sizes at which to report (duplicates are dropped).
+
+    Returns (checkpoints, means, variances); means and variances have shape
+    (len(checkpoints),) or (replicates, len(checkpoints)).
+    """
+    samples = np.asarray(samples, dtype=float)
+    squeeze = samples.ndim == 1
+    samples = np.atleast_2d(samples)
+    checkpoints = _checkpoints(checkpoints)
+    if checkpoints[-1] > samples.shape[1]:
+        raise ValueError("checkpoint beyond the end of the samples")
+
+    moments = RunningMoments(samples.shape[0])
+    means = np.empty((samples.shape[0], len(checkpoints)))
+    variances = np.empty_like(means)
+    start = 0
+    for i, stop in enumerate(checkpoints):
+        moments.update(samples[:, start:stop])
+        means[:, i] = moments.mean
+        variances[:, i] = moments.variance(ddof)
+        start = stop
+
+    if squeeze:
+        return checkpoints, means[0], variances[0]
+    return checkpoints, means, variances
+
+
+def convergence_study(sampler, checkpoints, replicates=1, rng=None,
+                      chunk_size=4_000_000, ddof=1):
+    """
+    Streams samples from `sampler` up to the largest checkpoint and records the
+    running mean and variance of every replicate path at each checkpoint.
+
+    Parameters:
+    - sampler: function (rng, shape) -> array of samples, e.g. power_law_sampler(2, 1).
+    - checkpoints: sample sizes at which to report, e.g. np.logspace(1, 8, 300).astype(int).
+    - replicates: number of independent paths.
+    - rng: numpy Generator.
+    - chunk_size: upper bound on the number of samples held in memory at once.
+
+    Returns (checkpoints, means, variances) with means and variances of shape
+    (replicates, len(checkpoints)).
+    """
+    rng = as_generator(rng)
+    checkpoints = _checkpoints(checkpoints)
+    columns = max(1, chunk_size // replicates)
+
+    moments = RunningMoments(replicates)
+    means = np.empty((replicates, len(checkpoints)))
+    variances = np.empty_like(means)
+    for i, stop in enumerate(checkpoints):
+        while moments.n < stop:
+            b = min(columns, stop - moments.n)
+            moments.update(sampler(rng, (replicates, b)))
+        means[:, i] = moments.mean
+        variances[:, i] = moments.variance(ddof)
+
+    return checkpoints, means, variances
+
+
+if __name__ == "__main__":
+    import time
+    import matplotlib.pyplot as plt
+
+    rng = np.random.default_rng(17)
+    sample_sizes = np.logspace(1, 5, 300).astype(int)
+
+    start_time = time.time()
+    sizes, means, _ = convergence_study(power_law_sampler(2, 1), sample_sizes, replicates=5, rng=rng)
+    _, means_exponential, _ = convergence_study(exponential_sampler(1), sample_sizes, replicates=5, rng=rng)
+    sizes3, _, variances = convergence_study(power_law_sampler(3, 1), sample_sizes, replicates=5, rng=rng)
+    print(f"computed 3 studies x 5 paths in {time.time() - start_time:.2f} s")
+
+    fig, axes = plt.subplots(1, 2, figsize=(14, 6))
+    axes[0].loglog(sizes, means.T, color='blue', alpha=0.6)
+    axes[0].loglog(sizes, means_exponential.T, color='red', alpha=0.6)
+    axes[0].set_xlabel('Number of Samples')
+    axes[0].set_ylabel('Sample Mean')
+    axes[0].set_title(r'Running Mean: Power Law ($\alpha=2$, blue) vs Exponential (red)')
+    axes[0].grid(True, which="both", ls="--")
+
+    axes[1].loglog(sizes3, variances.T, color='blue', alpha=0.6)
+    axes[1].set_xlabel('Number of Samples')
+    axes[1].set_ylabel('Sample Variance')
+    axes[1].set_title(r'Running Variance: Power Law ($\alpha=3$)')
+    axes[1].grid(True, which="both", ls="--")
+    plt.show()
@@ -0,0 +1,299 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)      # the repository root, for common/
+from common.ordered_map import ordered_starmap
+from common.rng_streams import as_generator
+
+
+# k-fold cross validation across folds and hyperparameter settings.
+#
+#   folds = kfold(len(y), k=5, seed=0)            # or stratified_kfold / group_kfold
+#   results = cross_validate(Ridge, X, y, folds,
+#                            param_grid=[{"alpha": a} for a in (0.1, 1, 10)],
+#                            preprocess=Standardize, workers=4)
+#   results.best_params
+#
+# Folds are computed once as index arrays and reused for every setting, so all
+# settings are compared on exactly the same splits.
+#
+# A model is anything with fit(X, y) and score(X, y) (scikit-learn estimators
+# qualify), created by model_factory(**params).  preprocess, if given, is a
+# factory for an object with fit(X, y) and transform(X); it is fitted on the
+# training part of each fold only.
+#
+# With workers > 0 the (setting, fold) tasks run in a process pool.  X and y
+# are written once to .npy files and opened by every worker with
+# np.load(mmap_mode="r"), so they are shared through the page cache instead of
+# being pickled for each task.  Per-fold preprocessing runs once per fold (in
+# parallel) and its output is cached the same way for all settings.
+
+class Folds:
+    """
+    Precomputed train/test index arrays.  `fold_of[i]` is the fold that
+    sample i is tested in.
+    """
+    def __init__(self, fold_of, k):
+        self.fold_of = np.asarray(fold_of)
+        self.k = k
+        order = np.argsort(self.fold_of, kind="stable")
+        bounds = np.searchsorted(self.fold_of[order], np.arange(k + 1))
+        self.test = [order[bounds[i]:bounds[i + 1]] for i in range(k)]
+        self.train = [np.flatnonzero(self.fold_of != i) for i in range(k)]
+
+    def __len__(self):
+        return self.k
+
+    def __iter__(self):
+        return iter(zip(self.train, self.test))
+
+
+def kfold(n, k=5, shuffle=True, seed=None, rng=None):
+    rng = as_generator(rng, seed)
+    order = rng.permutation(n) if shuffle else np.arange(n)
+    fold_of = np.empty(n, dtype=np.int64)
+    fold_of[order] = np.arange(n) * k // n
+    return Folds(fold_of, k)
+
+
+def stratified_kfold(y, k=5, seed=None, rng=None):
+    """
+    Every fold gets (nearly) the same share of each class: the samples of each
+    class are shuffled and dealt out round-robin, continuing where the
+    previous class stopped.
+    """
+    rng = as_generator(rng, seed)
+    y = np.asarray(y)
+    _, labels = np.unique(y, return_inverse=True)
+    order = rng.permutation(len(y))
+    order = order[np.argsort(labels[order], kind="stable")]
+    fold_of = np.empty(len(y), dtype=np.int64)
+    fold_of[order] = np.arange(len(y)) % k
+    return Folds(fold_of, k)
+
+
+def group_kfold(groups, k=5, seed=None, rng=None):
+    """
+    All samples of a group land in the same fold (e.g. all sessions of one
+    user).  Groups are assigned largest first to the currently smallest fold,
+    which balances fold sizes.
+    """
+    rng = as_generator(rng, seed)
+    unique, labels, sizes = np.unique(groups, return_inverse=True, return_counts=True)
+    if len(unique) < k:
+        raise ValueError(f"{len(unique)} groups cannot fill {k} folds")
+    # random tie-breaking between groups of equal size
+    order = np.lexsort((rng.random(len(unique)), -sizes))
+    fold_sizes = np.zeros(k, dtype=np.int64)
+    fold_of_group = np.empty(len(unique), dtype=np.int64)
+    for group in order:
+        fold = np.argmin(fold_sizes)
+        fold_of_group[group] = fold
+        fold_sizes[fold] += sizes[group]
+    return Folds(fold_of_group[labels], k)
+
+
+class CVResults:
+    def __init__(self, records, param_grid):
+        self.records = records
+        self.param_grid = param_grid
+
+    def scores(self):
+        # (settings, folds) array of test scores
+        k = 1 + max(r["fold"] for r in self.records)
+        scores = np.full((len(self.param_grid), k), np.nan)
+        for r in self.records:
+            scores[r["setting"], r["fold"]] = r["score"]
+        return scores
+
+    def mean_scores(self):
+        return self.scores().mean(axis=1)
+
+    @property
+    def best_index(self):
+        return int(np.argmax(self.mean_scores()))
+
+    @property
+    def best_params(self):
+        return self.param_grid[self.best_index]
+
+    def summary(self):
+        import pandas as pd
+        frame = pd.DataFrame(self.records)
+        table = frame.groupby("setting").agg(
+            mean_score=("score", "mean"), std_score=("score", "std"),
+            fit_time=("fit_time", "sum"), score_time=("score_time", "sum"))
+        table.insert(0, "params", [self.param_grid[i] for i in table.index])
+        return table
+
+
+# --- worker side ----------------------------------------------------------------
+
+_arrays = {}
+
+
+def _load(path):
+    # each worker opens a file once and keeps the memory map.
+    if path not in _arrays:
+        _arrays[path] = np.load(path, mmap_mode="r")
+    return _arrays[path]
+
+
+def _preprocess_fold(preprocess, X_path, y_path, train, test, out_dir, fold):
+    start_time = time.perf_counter()
+    X, y = _load(X_path), _load(y_path)
+    step = preprocess()
+    step.fit(X[train], y[train])
+    np.save(os.path.join(out_dir, f"fold{fold}_train.npy"), step.transform(X[train]))
+    np.save(os.path.join(out_dir, f"fold{fold}_test.npy"), step.transform(X[test]))
+    return time.perf_counter() - start_time
+
+
+def _fit_and_score(model_factory, params, X_path, y_path, train, test, cache_dir, fold):
+    X, y = _load(X_path), _load(y_path)
+    if cache_dir is None:
+        X_train, X_test = X[train], X[test]
+    else:
+        X_train = _load(os.path.join(cache_dir, f"fold{fold}_train.npy"))
+        X_test = _load(os.path.join(cache_dir, f"fold{fold}_test.npy"))
+
+    start_time = time.perf_counter()
+    model = model_factory(**params)
+    model.fit(X_train, y[train])
+    fit_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    score = model.score(X_test, y[test])
+    score_time = time.perf_counter() - start_time
+    return float(score), fit_time, score_time
+
+
+# --- driver -----------------------------------------------------------------------
+
+def cross_validate(model_factory, X, y, folds, param_grid=None, preprocess=None,
+                   workers=0, work_dir=None):
+    """
+    Fits and scores model_factory(**params) on every fold for every setting.
+
+    Parameters:
+    - model_factory: callable params -> model with fit(X, y) and score(X, y).
+      Must be picklable (a module-level class or function) when workers > 0.
+    - X, y: training matrix and targets.
+    - folds: a Folds object from kfold, stratified_kfold or group_kfold.
+    - param_grid: list of keyword dicts (default: one setting with no params).
+    - preprocess: optional factory for a fit/transform step, fitted per fold.
+    - workers: number of worker processes (0 runs everything in this process).
+    - work_dir: where the shared arrays are written (default: a temporary
+      directory that is removed afterwards).
+
+    Returns CVResults whose records hold, per (setting, fold), the score and
+    the fit, score and preprocessing times in seconds.
+    """
+    param_grid = [{}] if param_grid is None else list(param_grid)
+    own_dir = work_dir is None
+    work_dir = tempfile.mkdtemp(prefix="cv-") if own_dir else work_dir
+    try:
+        X_path = os.path.join(work_dir, "X.npy")
+        y_path = os.path.join(work_dir, "y.npy")
+        np.save(X_path, np.asarray(X))
+        np.save(y_path, np.asarray(y))
+        cache_dir = None
+        preprocess_times = [0.0] * len(folds)
+
+        # one pool for both phases, so the workers keep their memory maps
+        pool = ProcessPoolExecutor(max_workers=workers) if workers else None
+        try:
+            if preprocess is not None:
+                cache_dir = os.path.join(work_dir, "folds")
+                os.makedirs(cache_dir, exist_ok=True)
+                preprocess_times = list(ordered_starmap(
+                    _preprocess_fold,
+                    ((preprocess, X_path, y_path, train, test, cache_dir, fold)
+                     for fold, (train, test) in enumerate(folds)),
+                    executor=pool))
+
+            tasks = [(setting, fold) for setting in range(len(param_grid)) for fold in range(len(folds))]
+            outcomes = ordered_starmap(
+                _fit_and_score,
+                ((model_factory, param_grid[setting], X_path, y_path,
+                  folds.train[fold], folds.test[fold], cache_dir, fold) for setting, fold in tasks),
+                executor=pool)
+            records = []
+            for (setting, fold), (score, fit_time, score_time) in zip(tasks, outcomes):
+                records.append({"setting": setting, "fold": fold, "score": score,
+                                "fit_time": fit_time, "score_time": score_time,
+                                "preprocess_time": preprocess_times[fold]})
+        finally:
+            if pool:
+                pool.shutdown()
+            _arrays.clear()
+        return CVResults(records, param_grid)
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# --- small models for the demo -------------------------------------------------
+
+class Standardize:
+    def fit(self, X, y=None):
+        self.mean = X.mean(axis=0)
+        self.std = X.std(axis=0)
+        self.std[self.std == 0] = 1.0
+        return self
+
+    def transform(self, X):
+        return (X - self.mean) / self.std
+
+
+class Ridge:
+    """
+    Ridge regression, scored by R^2 like scikit-learn's regressors.
+    """
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+
+    def fit(self, X, y):
+        X = np.column_stack([np.ones(len(X)), X])
+        penalty = self.alpha * np.eye(X.shape[1])
+        penalty[0, 0] = 0.0      # don't shrink the intercept
+        self.coef = np.linalg.solve(X.T @ X + penalty, X.T @ y)
+        return self
+
+    def predict(self, X):
+        return self.coef[0] + X @ self.coef[1:]
+
+    def score(self, X, y):
+        residual = y - self.predict(X)
+        return 1 - np.sum(residual ** 2) / np.sum((y - np.mean(y)) ** 2)
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(14)
+    n, d = 20_000, 200
+    X = rng.normal(size=(n, d)) * rng.uniform(0.1, 10, size=d)
+    true_coef = rng.normal(size=d) * (rng.random(d) < 0.2)
+    y = X @ true_coef + rng.normal(scale=20, size=n)
+
+    folds = kfold(n, k=5, seed=0)
+    param_grid = [{"alpha": float(alpha)} for alpha in np.logspace(-2, 4, 12)]
+    for workers in (0, os.cpu_count()):
+        start_time = time.time()
+        results = cross_validate(Ridge, X, y, folds, param_grid, preprocess=Standardize, workers=workers)
+        print(f"workers={workers}: {len(results.records)} fits in {time.time() - start_time:.2f} s, "
+              f"best {results.best_params}")
+    print(results.summary())
+
+    # stratified and grouped folds
+    labels = rng.choice(3, size=n, p=[0.7, 0.2, 0.1])
+    for fold in stratified_kfold(labels, k=5, seed=0).test:
+        print("stratified fold class shares:", np.round(np.bincount(labels[fold]) / len(fold), 3))
+    groups = rng.integers(0, 300, size=n)
+    folds = group_kfold(groups, k=5, seed=0)
+    print("group fold sizes:", [len(test) for test in folds.test])
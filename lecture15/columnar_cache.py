@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import numpy as np
+
+
+# A columnar on-disk cache for the course CSV files.
+#
+# The first time a CSV is loaded it is parsed once and each column is written
+# as its own typed .npy file.  Every later load memory-maps those files with
+# np.load(mmap_mode='r'), so nothing is parsed, only the pages that are touched
+# are read, and processes loading the same data share those pages through the
+# OS page cache instead of each holding a parsed copy.
+#
+# The cache lives next to the CSV in .columnar_cache/<name>-<hash>/ and is keyed
+# by the SHA-256 of the CSV's contents, so editing the CSV invalidates it.  The
+# file size and modification time are recorded too, which lets an unchanged
+# file skip re-hashing.
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+DATASETS = {
+    "four_sessions": "lecture22/four_sessions.csv",
+    "tripping_socks": "lecture23/tripping_socks.csv",
+    "lagado_breakfast": "hw4/lagado_breakfast_data.csv",
+    "part7_samples1": "hw2/part7_samples1.csv",
+    "part7_samples2": "hw2/part7_samples2.csv",
+    "c_lang_results": "lecture01/example1/example_1_array_c_output.csv",
+    "c_lang_big_results": "lecture01/example1/example_1_array_c_big_output.csv",
+}
+
+CACHE_DIR_NAME = ".columnar_cache"
+FORMAT_VERSION = 1
+
+
+def file_hash(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ColumnarTable:
+    """
+    Read-only columns of a cached CSV.  table["Time"] is a memory-mapped numpy
+    array; table.index is the index column when one was requested.
+    """
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.columns = meta["columns"]
+        self._arrays = {}
+
+    def _array(self, i):
+        if i not in self._arrays:
+            path = os.path.join(self.path, f"{i}.npy")
+            try:
+                self._arrays[i] = np.load(path, mmap_mode="r")
+            except ValueError:
+                # zero-length columns cannot be memory-mapped.
+                self._arrays[i] = np.load(path)
+        return self._arrays[i]
+
+    def __getitem__(self, column):
+        return self._array(self.columns.index(column))
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    @property
+    def index(self):
+        if self.meta["index"] is None:
+            return None
+        return self._array(len(self.columns))
+
+    def to_dataframe(self):
+        import pandas as pd
+        data = {c: self[c] for c in self.columns}
+        index = self.index
+        if index is not None:
+            index = pd.Index(index, name=self.meta["index"])
+        return pd.DataFrame(data, index=index)
+
+
+def _to_fixed_width(values):
+    # Object columns cannot be memory-mapped; store strings as fixed-width unicode.
+    if values.dtype == object:
+        values = values.astype(str)
+    return np.ascontiguousarray(values)
+
+
+def _build(csv_file, cache_path, index_col, stat, source_hash):
+    import pandas as pd
+    frame = pd.read_csv(csv_file, index_col=index_col)
+
+    parent = os.path.dirname(cache_path)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent)
+    try:
+        columns = [str(c) for c in frame.columns]
+        for i, column in enumerate(frame.columns):
+            np.save(os.path.join(tmp, f"{i}.npy"), _to_fixed_width(frame[column].to_numpy()))
+        if index_col is not None:
+            np.save(os.path.join(tmp, f"{len(columns)}.npy"), _to_fixed_width(frame.index.to_numpy()))
+        meta = {
+            "version": FORMAT_VERSION,
+            "source": os.path.basename(csv_file),
+            "sha256": source_hash,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "columns": columns,
+            "index_col": index_col,
+            "index": None if index_col is None else str(frame.index.name),
+            "rows": len(frame),
+        }
+        with open(os.path.join(tmp, "meta.json"), "w") as fh:
+            json.dump(meta, fh, indent=2)
+        # another process may have built the same cache in the meantime.
+        try:
+            os.replace(tmp, cache_path)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    with open(os.path.join(cache_path, "meta.json")) as fh:
+        return json.load(fh)
+
+
+def _cache_root(csv_file, cache_dir):
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(csv_file)), CACHE_DIR_NAME)
+    return cache_dir
+
+
+def _entry_pattern(stem):
+    # <stem>-<16 hex digits of the hash>[-i<index_col>]: anchored, so the
+    # caches of data.csv don't match those of data-2.csv.
+    return re.compile(re.escape(stem) + r"-[0-9a-f]{16}(-i.*)?")
+
+
+def _find_cached(root, stem, source, index_col, stat):
+    # Cheap check: a cache built from a file with the same size and mtime.
+    if not os.path.isdir(root):
+        return None
+    pattern = _entry_pattern(stem)
+    for entry in os.listdir(root):
+        if not pattern.fullmatch(entry):
+            continue
+        meta_file = os.path.join(root, entry, "meta.json")
+        try:
+            with open(meta_file) as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        if (meta.get("version") == FORMAT_VERSION and meta.get("source") == source
+                and meta["size"] == stat.st_size
+                and meta["mtime_ns"] == stat.st_mtime_ns and meta["index_col"] == index_col):
+            return os.path.join(root, entry), meta
+    return None
+
+
+def _prune(root, stem, source, index_col, keep):
+    # drop caches of earlier versions of the same CSV.
+    pattern = _entry_pattern(stem)
+    for entry in os.listdir(root):
+        path = os.path.join(root, entry)
+        if not pattern.fullmatch(entry) or path == keep:
+            continue
+        try:
+            with open(os.path.join(path, "meta.json")) as fh:
+                meta = json.load(fh)
+            stale = meta["source"] == source and meta["index_col"] == index_col
+        except (OSError, ValueError, KeyError):
+            continue
+        if stale:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _index_tag(index_col):
+    return "" if index_col is None else f"-i{index_col}"
+
+
+def load_csv(csv_file, index_col=None, cache_dir=None, rebuild=False):
+    """
+    Loads `csv_file` through the columnar cache, building the cache if needed.
+
+    Parameters:
+    - index_col: passed to pandas.read_csv when the cache is built.
+    - cache_dir: where to keep the cache (default: .columnar_cache next to the CSV).
+    - rebuild: ignore any existing cache.
+
+    Returns a ColumnarTable.
+    """
+    stat = os.stat(csv_file)
+    root = _cache_root(csv_file, cache_dir)
+    source = os.path.basename(csv_file)
+    stem = os.path.splitext(source)[0]
+
+    if not rebuild:
+        found = _find_cached(root, stem, source, index_col, stat)
+        if found is not None:
+            return ColumnarTable(*found)
+
+    source_hash = file_hash(csv_file)
+    cache_path = os.path.join(root, f"{stem}-{source_hash[:16]}{_index_tag(index_col)}")
+    meta_file = os.path.join(cache_path, "meta.json")
+    if not rebuild and os.path.exists(meta_file):
+        # contents unchanged (e.g. the file was touched); refresh size/mtime.
+        with open(meta_file) as fh:
+            meta = json.load(fh)
+        meta["size"], meta["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+        with open(meta_file, "w") as fh:
+            json.dump(meta, fh, indent=2)
+        return ColumnarTable(cache_path, meta)
+
+    if os.path.exists(cache_path):
+        shutil.rmtree(cache_path)
+    meta = _build(csv_file, cache_path, index_col, stat, source_hash)
+    _prune(root, stem, source, index_col, cache_path)
+    return ColumnarTable(cache_path, meta)
+
+
+def load_dataset(name, **kwargs):
+    """
+    Loads one of the course datasets in DATASETS by name, e.g.
+    load_dataset("four_sessions")["Time"].
+    """
+    return load_csv(os.path.join(REPO_ROOT, DATASETS[name]), **kwargs)
+
+
+def read_c_lang_results(csv_file):
+    # cached replacement for lecture01's row-by-row csv.reader version.
+    table = load_csv(csv_file)
+    return table[table.columns[0]], table[table.columns[1]]
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    names = sys.argv[1:] or ["part7_samples1", "part7_samples2", "c_lang_results"]
+    for name in names:
+        start_time = time.time()
+        table = load_dataset(name)
+        first = time.time() - start_time
+
+        start_time = time.time()
+        table = load_dataset(name)
+        column = table[table.columns[0]]
+        second = time.time() - start_time
+        print(f"{name}: {len(table)} rows, columns {table.columns}, "
+              f"first load {first * 1000:.1f} ms, cached load {second * 1000:.1f} ms, "
+              f"mean of {table.columns[0]!r} = {np.mean(column):.4f}")
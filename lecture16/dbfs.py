@@ -0,0 +1,313 @@
+import io
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+# A DBFS-style storage layer for running the lecture 15-16 notebooks locally.
+#
+# Paths are written the way they are on Databricks:
+#
+#   dbfs:/FileStore/tables/four_sessions.csv     (Spark / dbutils style)
+#   /dbfs/FileStore/tables/four_sessions.csv     (local file API style)
+#
+# Inside a Databricks workspace both map to the /dbfs FUSE mount.  Anywhere
+# else they map to a local directory (DBFS_ROOT, default ~/.dbfs), so the same
+# analysis code runs in both places.  Relative and other absolute paths are
+# passed through unchanged.
+#
+# Reads go through a shared LRU cache of fixed-size blocks.  When a file is
+# being read sequentially the next few blocks are fetched in the background,
+# and read_many() reads several files in parallel.  Prefetches run on their
+# own threads, so they aren't queued behind read_many's readers, and a block
+# is only ever read once at a time: a reader that needs a block already being
+# fetched waits for that read.
+
+DEFAULT_BLOCK_SIZE = 1 << 20          # 1 MiB
+DEFAULT_CACHE_BYTES = 256 << 20       # 256 MiB
+DEFAULT_PREFETCH = 4                  # blocks read ahead on sequential scans
+
+
+def default_root():
+    if os.path.isdir("/dbfs"):
+        return "/dbfs"
+    return os.environ.get("DBFS_ROOT", os.path.expanduser("~/.dbfs"))
+
+
+class BlockCache:
+    """
+    Thread-safe LRU cache of file blocks keyed by (path, mtime, block number).
+    Including the modification time means a rewritten file is never served
+    stale blocks.
+    """
+    def __init__(self, capacity_bytes=DEFAULT_CACHE_BYTES):
+        self.capacity_bytes = capacity_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is None:
+                self.misses += 1
+                return None
+            self._blocks.move_to_end(key)
+            self.hits += 1
+            return block
+
+    def contains(self, key):
+        with self._lock:
+            return key in self._blocks
+
+    def put(self, key, block):
+        with self._lock:
+            if key in self._blocks:
+                return
+            self._blocks[key] = block
+            self.size += len(block)
+            while self.size > self.capacity_bytes and self._blocks:
+                _, evicted = self._blocks.popitem(last=False)
+                self.size -= len(evicted)
+
+    def invalidate(self, path):
+        with self._lock:
+            for key in [k for k in self._blocks if k[0] == path]:
+                self.size -= len(self._blocks.pop(key))
+
+
+class _CachedReader(io.RawIOBase):
+    # Raw file object whose reads are served from the block cache.
+    def __init__(self, fs, path):
+        self.fs = fs
+        self.path = path
+        stat = os.stat(path)
+        self.length = stat.st_size
+        self.mtime = stat.st_mtime_ns
+        self.position = 0
+        self._last_block = -1
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.length
+        self.position = max(0, offset)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def readinto(self, buffer):
+        if self.position >= self.length:
+            return 0
+        block_size = self.fs.block_size
+        index, start = divmod(self.position, block_size)
+        block = self.fs._block(self.path, self.mtime, index)
+        if index == self._last_block + 1:
+            self.fs._prefetch(self.path, self.mtime, index + 1, self.length)
+        self._last_block = index
+
+        # the file may have shrunk since it was opened: a block shorter than
+        # `start` means there is nothing more to read
+        n = max(0, min(len(buffer), len(block) - start))
+        if n == 0:
+            return 0
+        buffer[:n] = block[start:start + n]
+        self.position += n
+        return n
+
+
+class DBFS:
+    def __init__(self, root=None, block_size=DEFAULT_BLOCK_SIZE,
+                 cache_bytes=DEFAULT_CACHE_BYTES, prefetch=DEFAULT_PREFETCH, io_threads=8):
+        self.root = default_root() if root is None else root
+        self.block_size = block_size
+        self.prefetch = prefetch
+        self.cache = BlockCache(cache_bytes)
+        self.prefetch_waits = 0
+        self._pool = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix="dbfs-read")
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix="dbfs-prefetch")
+        self._in_flight = {}          # block key -> Future of the read in progress
+        self._in_flight_lock = threading.Lock()
+
+    def local_path(self, path):
+        """
+        Translates dbfs:/x and /dbfs/x to a path under the root.
+        """
+        path = os.fspath(path)
+        if path.startswith("dbfs:"):
+            relative = path[len("dbfs:"):].lstrip("/")
+        elif path == "/dbfs" or path.startswith("/dbfs/"):
+            relative = path[len("/dbfs"):].lstrip("/")
+        else:
+            return path
+        return os.path.join(self.root, relative)
+
+    # --- block cache ------------------------------------------------------
+
+    def _read_block(self, path, index):
+        with open(path, "rb") as fh:
+            fh.seek(index * self.block_size)
+            return fh.read(self.block_size)
+
+    def _block(self, path, mtime, index):
+        key = (path, mtime, index)
+        with self._in_flight_lock:
+            pending = self._in_flight.get(key)
+            if pending is not None:
+                self.prefetch_waits += 1
+            else:
+                block = self.cache.get(key)
+                if block is not None:
+                    return block
+                # claim the read so a prefetch of the same block won't repeat it
+                future = self._in_flight[key] = Future()
+        if pending is not None:
+            return pending.result()
+        return self._fill(key, future)
+
+    def _prefetch(self, path, mtime, first, length):
+        last = min(first + self.prefetch, (length + self.block_size - 1) // self.block_size)
+        for index in range(first, last):
+            key = (path, mtime, index)
+            with self._in_flight_lock:
+                if key in self._in_flight or self.cache.contains(key):
+                    continue
+                future = self._in_flight[key] = Future()
+            self._prefetch_pool.submit(self._fill, key, future)
+
+    def _fill(self, key, future):
+        # reads the block, caches it and completes `future` for anyone waiting
+        try:
+            block = self._read_block(key[0], key[2])
+            self.cache.put(key, block)
+            future.set_result(block)
+            return block
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+
+    # --- file API ---------------------------------------------------------
+
+    def open(self, path, mode="r", encoding="utf-8", **kwargs):
+        local = self.local_path(path)
+        if "r" in mode and "+" not in mode:
+            raw = _CachedReader(self, local)
+            buffered = io.BufferedReader(raw, buffer_size=self.block_size)
+            if "b" in mode:
+                return buffered
+            return io.TextIOWrapper(buffered, encoding=encoding, **kwargs)
+        # writes go straight to disk; drop anything cached for the old contents.
+        self.cache.invalidate(local)
+        os.makedirs(os.path.dirname(os.path.abspath(local)), exist_ok=True)
+        return open(local, mode, encoding=None if "b" in mode else encoding, **kwargs)
+
+    def read_bytes(self, path):
+        with self.open(path, "rb") as fh:
+            return fh.read()
+
+    def read_csv(self, path, **read_csv_kwargs):
+        import pandas as pd
+        with self.open(path, "rb") as fh:
+            return pd.read_csv(fh, **read_csv_kwargs)
+
+    def read_many(self, paths, reader=None):
+        """
+        Reads several files in parallel and returns the results in the order
+        of `paths`.  `reader` is a function (fs, path) -> result and defaults
+        to reading the raw bytes.
+        """
+        reader = reader or (lambda fs, p: fs.read_bytes(p))
+        return list(self._pool.map(lambda p: reader(self, p), paths))
+
+    # --- dbutils.fs-style helpers -------------------------------------------
+
+    def ls(self, path):
+        local = self.local_path(path)
+        return sorted(os.path.join(path.rstrip("/"), name) for name in os.listdir(local))
+
+    def exists(self, path):
+        return os.path.exists(self.local_path(path))
+
+    def mkdirs(self, path):
+        os.makedirs(self.local_path(path), exist_ok=True)
+        return True
+
+    def put(self, path, contents, overwrite=False):
+        local = self.local_path(path)
+        if os.path.exists(local) and not overwrite:
+            raise FileExistsError(path)
+        with self.open(path, "w") as fh:
+            fh.write(contents)
+        return True
+
+    def cp(self, source, destination):
+        local = self.local_path(destination)
+        self.cache.invalidate(local)
+        os.makedirs(os.path.dirname(os.path.abspath(local)), exist_ok=True)
+        shutil.copyfile(self.local_path(source), local)
+        return True
+
+    def rm(self, path, recurse=False):
+        local = self.local_path(path)
+        if os.path.isdir(local):
+            if not recurse:
+                raise IsADirectoryError(path)
+            shutil.rmtree(local)
+        else:
+            self.cache.invalidate(local)
+            os.remove(local)
+        return True
+
+    def head(self, path, max_bytes=65536):
+        with self.open(path, "rb") as fh:
+            return fh.read(max_bytes).decode("utf-8", errors="replace")
+
+    def close(self):
+        self._prefetch_pool.shutdown()
+        self._pool.shutdown()
+
+
+_default = None
+
+
+def get_fs():
+    # one shared instance, so every caller benefits from the same cache.
+    global _default
+    if _default is None:
+        _default = DBFS()
+    return _default
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    fs = DBFS(root=tempfile.mkdtemp(), block_size=1 << 16)
+    fs.mkdirs("dbfs:/FileStore/tables")
+    for i in range(8):
+        fs.put(f"dbfs:/FileStore/tables/part-{i}.csv",
+               "x,y\n" + "".join(f"{j},{j * i}\n" for j in range(200_000)))
+
+    paths = fs.ls("dbfs:/FileStore/tables")
+    for attempt in ("cold", "warm"):
+        start_time = time.time()
+        frames = fs.read_many(paths, reader=lambda fs, p: fs.read_csv(p))
+        print(f"{attempt}: read {len(frames)} files, {sum(len(f) for f in frames)} rows "
+              f"in {time.time() - start_time:.3f} s  (cache hits {fs.cache.hits}, misses {fs.cache.misses}, "
+              f"waited on prefetch {fs.prefetch_waits})")
+    fs.close()
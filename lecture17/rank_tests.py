@@ -0,0 +1,252 @@
+import math
+import os
+import sys
+from collections import namedtuple
+import numpy as np
+from scipy import stats
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)      # the repository root, for common/
+from common.rng_streams import as_generator
+
+
+# Rank-based permutation tests: Mann-Whitney (two samples) and Kruskal-Wallis
+# (k samples).
+#
+# The difference-in-means permutation test of the lecture notes reshuffles the
+# raw lifespans, and a handful of very long-lived bulbs dominate every
+# permuted mean, so the permutation distribution is wide and lumpy and needs
+# millions of resamples (R=10000000 in the notes) to settle.  Replacing the
+# values by their ranks bounds the influence of any one observation:
+#
+#   * the pooled data are ranked once, O(N log N), with tied values sharing
+#     the average of their ranks;
+#   * every permutation then shuffles the rank vector, not the data, and the
+#     statistic only needs a sum of ranks per group; permutations are drawn
+#     in batches of rows so one NumPy call handles thousands of them;
+#   * for small samples the null distribution of the rank sum is computed
+#     exactly by dynamic programming (no resampling error at all), and for
+#     large ones the normal (Mann-Whitney) or chi-square (Kruskal-Wallis)
+#     approximation with a tie correction is accurate.
+#
+# Average ranks are multiples of 1/2, so the dynamic programming works on
+# doubled ranks, which are integers.
+
+EXACT_MAX_N = 60           # exact Mann-Whitney null up to this many observations
+KRUSKAL_CHI2_MIN_GROUP = 5  # chi-square approximation once every group has this many
+
+RankTestResult = namedtuple("RankTestResult", ["statistic", "pvalue", "method"])
+
+
+def rankdata(values):
+    """
+    Average ranks (1-based) of values, and the sizes of the groups of ties.
+    """
+    values = np.asarray(values).ravel()
+    order = np.argsort(values, kind="stable")
+    sorted_values = values[order]
+    # start of every run of equal values in sorted order
+    starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]])
+    sizes = np.diff(np.r_[starts, len(values)])
+    # a run covering sorted positions p..p+t-1 gets the average rank p + (t + 1) / 2
+    average = starts + (sizes + 1) / 2
+    ranks = np.empty(len(values))
+    ranks[order] = np.repeat(average, sizes)
+    return ranks, sizes
+
+
+def _tie_correction(tie_sizes, n):
+    # 1 - sum(t^3 - t) / (N^3 - N); 1 when there are no ties
+    t = tie_sizes.astype(float)
+    return 1.0 - np.sum(t ** 3 - t) / (n ** 3 - n) if n > 1 else 1.0
+
+
+def permuted_rank_batches(ranks, permutations, batch_size=1000, rng=None, seed=None):
+    """
+    Yields arrays of shape (batch, N), each row a random permutation of ranks.
+    """
+    rng = as_generator(rng, seed)
+    for start in range(0, permutations, batch_size):
+        rows = min(batch_size, permutations - start)
+        yield rng.permuted(np.broadcast_to(ranks, (rows, len(ranks))), axis=1)
+
+
+# --- Mann-Whitney ---------------------------------------------------------------
+
+def rank_sum_null(doubled_ranks, n1):
+    """
+    Exact null distribution of the sum of n1 doubled ranks drawn without
+    replacement from doubled_ranks (all subsets equally likely).
+
+    Returns probabilities indexed by the doubled rank sum.  Dynamic programming
+    over the observations: ways[j, s] counts subsets of j of the observations
+    seen so far with doubled sum s; each observation r adds ways[j - 1, s - r]
+    to ways[j, s].  O(N * n1 * max_sum).
+    """
+    doubled_ranks = np.asarray(doubled_ranks, dtype=np.int64)
+    max_sum = int(np.sort(doubled_ranks)[::-1][:n1].sum())
+    # float counts: C(60, 30) ~ 1e17 is beyond exact integers in float64, but
+    # the relative error stays ~1e-16, which is all a p-value needs.
+    ways = np.zeros((n1 + 1, max_sum + 1))
+    ways[0, 0] = 1.0
+    for r in doubled_ranks:
+        ways[1:, r:] += ways[:-1, :max_sum + 1 - r].copy()
+    return ways[n1] / ways[n1].sum()
+
+
+def _mann_whitney_normal(u, n1, n2, tie_sizes, alternative):
+    n = n1 + n2
+    mean = n1 * n2 / 2
+    sd = math.sqrt(n1 * n2 * (n + 1) / 12 * _tie_correction(tie_sizes, n))
+    if sd == 0:
+        return 1.0
+    # continuity correction of 1/2 toward the mean
+    if alternative == "greater":
+        z = (u - mean - 0.5) / sd
+        return 0.5 * math.erfc(z / math.sqrt(2))
+    if alternative == "less":
+        z = (u - mean + 0.5) / sd
+        return 0.5 * math.erfc(-z / math.sqrt(2))
+    z = (abs(u - mean) - 0.5) / sd
+    return min(1.0, math.erfc(z / math.sqrt(2)))
+
+
+def mann_whitney(x, y, alternative="two-sided", method="auto", permutations=9999, batch_size=1000,
+                 rng=None, seed=None):
+    """
+    Mann-Whitney U test of whether x tends to be larger or smaller than y.
+
+    Parameters:
+    - x, y: the two samples.
+    - alternative: 'two-sided', 'greater' (x tends to be larger) or 'less'.
+    - method: 'exact' (dynamic programming), 'permutation' (batched
+      permutations of the ranks), 'normal', or 'auto' (exact up to
+      EXACT_MAX_N observations, normal beyond).
+    - permutations, batch_size, rng, seed: for method='permutation'.
+
+    Returns RankTestResult(statistic=U of x, pvalue, method).
+    """
+    if alternative not in ("two-sided", "greater", "less"):
+        raise ValueError(f"unknown alternative {alternative!r}")
+    x, y = np.asarray(x, dtype=float).ravel(), np.asarray(y, dtype=float).ravel()
+    n1, n2 = len(x), len(y)
+    if n1 == 0 or n2 == 0:
+        raise ValueError("both samples need at least one observation")
+    ranks, tie_sizes = rankdata(np.concatenate([x, y]))
+    rank_sum = ranks[:n1].sum()
+    u = rank_sum - n1 * (n1 + 1) / 2
+    if method == "auto":
+        method = "exact" if n1 + n2 <= EXACT_MAX_N else "normal"
+
+    if method == "normal":
+        return RankTestResult(u, _mann_whitney_normal(u, n1, n2, tie_sizes, alternative), method)
+
+    # exact and permutation both work with the doubled rank sum of x
+    observed = int(round(2 * rank_sum))
+    center = n1 * (n1 + n2 + 1)          # doubled mean of the rank sum
+    if method == "exact":
+        null = rank_sum_null(np.round(2 * ranks).astype(np.int64), n1)
+        sums = np.arange(len(null))
+        if alternative == "greater":
+            pvalue = null[observed:].sum()
+        elif alternative == "less":
+            pvalue = null[:observed + 1].sum()
+        else:
+            pvalue = null[np.abs(sums - center) >= abs(observed - center)].sum()
+        return RankTestResult(u, min(1.0, float(pvalue)), method)
+
+    if method == "permutation":
+        doubled = np.round(2 * ranks).astype(np.int64)
+        extreme = 0
+        for batch in permuted_rank_batches(doubled, permutations, batch_size, rng, seed):
+            sums = batch[:, :n1].sum(axis=1)
+            if alternative == "greater":
+                extreme += np.count_nonzero(sums >= observed)
+            elif alternative == "less":
+                extreme += np.count_nonzero(sums <= observed)
+            else:
+                extreme += np.count_nonzero(np.abs(sums - center) >= abs(observed - center))
+        return RankTestResult(u, (extreme + 1) / (permutations + 1), method)
+
+    raise ValueError(f"unknown method {method!r}")
+
+
+# --- Kruskal-Wallis -----------------------------------------------------------------
+
+def _kruskal_h(group_rank_sums, sizes, n, correction):
+    # H = 12 / (N (N + 1)) * sum(R_g^2 / n_g) - 3 (N + 1), divided by the tie correction
+    h = 12 / (n * (n + 1)) * np.sum(group_rank_sums ** 2 / sizes, axis=-1) - 3 * (n + 1)
+    return h / correction
+
+
+def kruskal_wallis(*groups, method="auto", permutations=9999, batch_size=1000, rng=None, seed=None):
+    """
+    Kruskal-Wallis H test that k samples come from the same distribution.
+
+    Parameters:
+    - groups: the k samples.
+    - method: 'permutation' (batched permutations of the ranks), 'chi2' (the
+      chi-square approximation with k - 1 degrees of freedom), or 'auto'
+      (chi2 once every group has KRUSKAL_CHI2_MIN_GROUP observations and
+      there are more than EXACT_MAX_N in all, permutation otherwise).
+    - permutations, batch_size, rng, seed: for method='permutation'.
+
+    Returns RankTestResult(statistic=H, pvalue, method).
+    """
+    groups = [np.asarray(g, dtype=float).ravel() for g in groups]
+    if len(groups) < 2 or any(len(g) == 0 for g in groups):
+        raise ValueError("need at least two non-empty groups")
+    sizes = np.array([len(g) for g in groups])
+    n = sizes.sum()
+    if method == "auto":
+        method = "chi2" if sizes.min() >= KRUSKAL_CHI2_MIN_GROUP and n > EXACT_MAX_N else "permutation"
+    if method not in ("chi2", "permutation"):
+        raise ValueError(f"unknown method {method!r}")
+    ranks, tie_sizes = rankdata(np.concatenate(groups))
+    correction = _tie_correction(tie_sizes, n)
+    if correction == 0:
+        # every value is the same: no evidence of any difference
+        return RankTestResult(0.0, 1.0, method)
+    starts = np.r_[0, np.cumsum(sizes)[:-1]]
+    h = float(_kruskal_h(np.add.reduceat(ranks, starts), sizes, n, correction))
+
+    if method == "chi2":
+        return RankTestResult(h, float(stats.chi2.sf(h, len(groups) - 1)), method)
+    extreme = 0
+    for batch in permuted_rank_batches(ranks, permutations, batch_size, rng, seed):
+        h_perm = _kruskal_h(np.add.reduceat(batch, starts, axis=1), sizes, n, correction)
+        extreme += np.count_nonzero(h_perm >= h - 1e-9)
+    return RankTestResult(h, (extreme + 1) / (permutations + 1), method)
+
+
+if __name__ == "__main__":
+    import time
+
+    # the lecture 17 lifespans: the 30 shortest of 100 incandescent (mean 1.3
+    # years) and LED (mean 5) bulbs
+    rng = np.random.default_rng(33)
+    incandescent = np.sort(rng.exponential(scale=1.3, size=100))[:30]
+    led = np.sort(rng.exponential(scale=5, size=100))[:30]
+
+    for method in ("exact", "permutation", "normal"):
+        start_time = time.time()
+        result = mann_whitney(led, incandescent, method=method, seed=17)
+        print(f"Mann-Whitney {method:<11}: U = {result.statistic:.0f}, p = {result.pvalue:.3g} "
+              f"({1000 * (time.time() - start_time):.1f} ms)")
+    print(f"scipy mannwhitneyu     : p = {stats.mannwhitneyu(led, incandescent, method='exact').pvalue:.3g}")
+
+    # ties: rounded lifespans, where the exact null and the tie correction matter
+    rounded_led, rounded_inc = np.round(led), np.round(incandescent)
+    print(f"rounded, exact : p = {mann_whitney(rounded_led, rounded_inc, method='exact').pvalue:.4g}")
+    print(f"rounded, normal: p = {mann_whitney(rounded_led, rounded_inc, method='normal').pvalue:.4g}, "
+          f"scipy {stats.mannwhitneyu(rounded_led, rounded_inc, method='asymptotic').pvalue:.4g}")
+
+    # four pages of session times as in lecture 22 (five sessions per page)
+    rng = np.random.default_rng(22)
+    pages = [rng.gamma(4, scale, size=5) for scale in (40, 42, 45, 55)]
+    start_time = time.time()
+    result = kruskal_wallis(*pages, method="permutation", permutations=100_000, seed=17)
+    print(f"Kruskal-Wallis permutation: H = {result.statistic:.3f}, p = {result.pvalue:.4f} "
+          f"({1000 * (time.time() - start_time):.0f} ms for 100,000 permutations)")
+    print(f"Kruskal-Wallis chi2       : p = {kruskal_wallis(*pages, method='chi2').pvalue:.4f}, "
+          f"scipy {stats.kruskal(*pages).pvalue:.4f}")
@@ -0,0 +1,202 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)      # the repository root, for common/
+from common.ordered_map import ordered_map
+
+
+# A small extract -> transform -> load framework that streams CSV files in
+# fixed-size chunks, so peak memory depends on the chunk size and not on the
+# size of the input.
+#
+#   extract:    extract_csv() yields DataFrame chunks.
+#   transform:  each step is a callable chunk -> chunk (CoerceTypes, Clip,
+#               DropMissing, or any function).  Pipeline chains them.  Steps
+#               are classes rather than closures so they can be pickled and
+#               sent to worker processes.
+#   load:       sinks receive the transformed chunks one at a time: CsvSink
+#               appends them to a file, GroupAggregator keeps running
+#               per-group statistics (the groupby('Page') of the ANOVA notes).
+#
+# run() drives the whole thing, optionally transforming chunks in a process
+# pool while still handing them to the sinks in their original order.
+
+
+def extract_csv(csv_file, chunk_rows=100_000, **read_csv_kwargs):
+    for chunk in pd.read_csv(csv_file, chunksize=chunk_rows, **read_csv_kwargs):
+        yield chunk
+
+
+class CoerceTypes:
+    """
+    Converts columns to the given dtypes.  Values that cannot be parsed as
+    numbers become NaN rather than failing the whole run.
+    """
+    def __init__(self, dtypes):
+        self.dtypes = dtypes
+
+    def __call__(self, chunk):
+        chunk = chunk.copy()
+        for column, dtype in self.dtypes.items():
+            if np.issubdtype(np.dtype(dtype), np.number):
+                chunk[column] = pd.to_numeric(chunk[column], errors="coerce")
+                if not np.issubdtype(np.dtype(dtype), np.integer):
+                    chunk[column] = chunk[column].astype(dtype)
+            else:
+                chunk[column] = chunk[column].astype(dtype)
+        return chunk
+
+
+class Clip:
+    # e.g. Clip("score", upper=100) as in np.clip(scores, a_min=None, a_max=100)
+    def __init__(self, column, lower=None, upper=None):
+        self.column = column
+        self.lower = lower
+        self.upper = upper
+
+    def __call__(self, chunk):
+        chunk = chunk.copy()
+        chunk[self.column] = np.clip(chunk[self.column].to_numpy(), self.lower, self.upper)
+        return chunk
+
+
+class DropMissing:
+    def __init__(self, columns=None):
+        self.columns = columns
+
+    def __call__(self, chunk):
+        return chunk.dropna(subset=self.columns)
+
+
+class Pipeline:
+    def __init__(self, *steps):
+        self.steps = steps
+
+    def __call__(self, chunk):
+        for step in self.steps:
+            chunk = step(chunk)
+        return chunk
+
+
+class CsvSink:
+    """
+    Appends chunks to a CSV file.  Output goes to a temporary file that only
+    replaces `csv_file` when the run completes.
+    """
+    def __init__(self, csv_file):
+        self.csv_file = csv_file
+        self._tmp = csv_file + ".tmp"
+        self._header = True
+        self.rows = 0
+
+    def write(self, chunk):
+        chunk.to_csv(self._tmp, mode="w" if self._header else "a", header=self._header, index=False)
+        self._header = False
+        self.rows += len(chunk)
+
+    def close(self):
+        if self._header:
+            # no chunks at all: still produce an (empty) file
+            open(self._tmp, "w").close()
+        os.replace(self._tmp, self.csv_file)
+
+
+class GroupAggregator:
+    """
+    Running count, mean and sum of squared deviations of `value` for each
+    distinct `key`.  Chunks are merged with Chan's pairwise update, so the
+    result matches a single groupby over the whole file.
+    """
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+        self.stats = pd.DataFrame(columns=["count", "mean", "m2"], dtype=float)
+
+    def write(self, chunk):
+        groups = chunk.groupby(self.key)[self.value]
+        part = pd.DataFrame({"count": groups.count().astype(float), "mean": groups.mean()})
+        centered = chunk[self.value] - chunk[self.key].map(part["mean"])
+        part["m2"] = (centered ** 2).groupby(chunk[self.key]).sum()
+
+        old = self.stats.reindex(part.index.union(self.stats.index), fill_value=0.0)
+        new = part.reindex(old.index, fill_value=0.0)
+        n = old["count"] + new["count"]
+        delta = new["mean"] - old["mean"]
+        safe_n = n.where(n > 0, 1.0)
+        mean = old["mean"] + delta * new["count"] / safe_n
+        m2 = old["m2"] + new["m2"] + delta ** 2 * old["count"] * new["count"] / safe_n
+        self.stats = pd.DataFrame({"count": n, "mean": mean, "m2": m2})
+
+    def close(self):
+        pass
+
+    def result(self, ddof=1):
+        result = self.stats.copy()
+        result["var"] = result["m2"] / (result["count"] - ddof)
+        return result
+
+    def f_statistic(self):
+        """
+        The one-way ANOVA F statistic of the lecture 22 notes, from the running
+        group statistics: (SSB / (k - 1)) / (SSW / (N - k)).
+        """
+        n = self.stats["count"]
+        grand_mean = np.sum(n * self.stats["mean"]) / n.sum()
+        ss_between = np.sum(n * (self.stats["mean"] - grand_mean) ** 2)
+        ss_within = self.stats["m2"].sum()
+        k = len(self.stats)
+        return (ss_between / (k - 1)) / (ss_within / (n.sum() - k))
+
+
+def run(chunks, transform, sinks, workers=0, max_in_flight=None):
+    """
+    Parameters:
+    - chunks: iterable of DataFrames, e.g. extract_csv(path).
+    - transform: callable chunk -> chunk (a Pipeline).  Must be picklable when workers > 0.
+    - sinks: objects with write(chunk) and close().
+    - workers: number of worker processes for the transform (0 runs it inline).
+    - max_in_flight: chunks submitted ahead of the one being written (default 2 * workers).
+
+    Returns the number of rows written to the sinks.
+    """
+    rows = 0
+    for chunk in ordered_map(transform, chunks, workers, max_in_flight):
+        for sink in sinks:
+            sink.write(chunk)
+        rows += len(chunk)
+    for sink in sinks:
+        sink.close()
+    return rows
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    # Build a synthetic four_sessions-like file with a few bad values, then
+    # clean it and compute per-page statistics in 50,000-row chunks.
+    rng = np.random.default_rng(17)
+    workdir = tempfile.mkdtemp()
+    raw = os.path.join(workdir, "sessions_raw.csv")
+    clean = os.path.join(workdir, "sessions_clean.csv")
+
+    n = 1_000_000
+    frame = pd.DataFrame({
+        "Page": rng.choice(["Page 1", "Page 2", "Page 3", "Page 4"], size=n),
+        "Time": rng.normal(150, 40, size=n).round(1).astype(str),
+    })
+    frame.loc[rng.choice(n, 100, replace=False), "Time"] = "n/a"
+    frame.to_csv(raw, index=False)
+
+    pipeline = Pipeline(CoerceTypes({"Time": "float64"}), DropMissing(["Time"]), Clip("Time", 0, 300))
+    for workers in (0, 2):
+        aggregator = GroupAggregator("Page", "Time")
+        start_time = time.time()
+        rows = run(extract_csv(raw, chunk_rows=50_000), pipeline, [CsvSink(clean), aggregator],
+                   workers=workers)
+        print(f"workers={workers}: {rows} rows in {time.time() - start_time:.2f} s")
+    print(aggregator.result())
+    print(f"F statistic: {aggregator.f_statistic():.4f}")
@@ -0,0 +1,85 @@
+import json
+import os
+import sys
+import time
+
+from local_broker import LocalBroker, LocalConsumer
+from worker_pool import consume_parallel
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _ROOT not in sys.path:
+  sys.path.append(_ROOT)      # the repository root, for common/
+import common.instrumentation as instrumentation
+
+
+# Measures consume_parallel throughput against the number of workers using the
+# in-memory broker, so the numbers reflect processing cost rather than the
+# network.  Threads only scale when `process` releases the GIL; the process
+# pool scales for pure-Python work at the price of pickling each message.
+#
+# benchmark_instrumentation measures what the counters and poll timer of
+# client.py add per message, with instrumentation switched on and off.
+
+def cpu_heavy(key, value, work=20000):
+  # decode the reading and burn some CPU to stand in for real statistics.
+  data = json.loads(value.decode("utf-8"))
+  acc = 0.0
+  for i in range(work):
+    acc += (data["temperature"] * i) % 7
+  return key, acc
+
+
+def fill_broker(topic, num_messages, num_keys=8, num_partitions=8):
+  broker = LocalBroker(num_partitions=num_partitions)
+  for i in range(num_messages):
+    data = {'temperature': 300 + i % 100, 'pressure': 5.5}
+    broker.produce(topic, key=f"core{i % num_keys}", value=json.dumps(data))
+  return broker
+
+
+def benchmark_scaling(worker_counts=(1, 2, 4, 8), num_messages=2000, use_processes=False):
+  topic = "TestTopic"
+  rates = []
+  for num_workers in worker_counts:
+    broker = fill_broker(topic, num_messages)
+    consumer = LocalConsumer(broker, {"group.id": "bench"})
+    start_time = time.time()
+    consume_parallel(topic, None, num_workers=num_workers, process=cpu_heavy,
+                     use_processes=use_processes, max_messages=num_messages,
+                     consumer=consumer)
+    elapsed = time.time() - start_time
+    rates.append(num_messages / elapsed)
+  return rates
+
+
+def benchmark_instrumentation(num_messages=100_000):
+  topic = "TestTopic"
+  broker = fill_broker(topic, num_messages)
+  consumed = instrumentation.counter("messages_consumed_total", "messages consumed")
+  poll_seconds = instrumentation.histogram("poll_seconds", "time spent in consumer.poll")
+  nanoseconds = {}
+  for enabled in (False, True):
+    if enabled:
+      instrumentation.enable()
+    else:
+      instrumentation.disable()
+    consumer = LocalConsumer(broker, {"group.id": f"instrumentation-{enabled}"})
+    consumer.subscribe([topic])
+    start_time = time.perf_counter()
+    for _ in range(num_messages):
+      with poll_seconds.time():
+        consumer.poll(0)
+      consumed.inc()
+    nanoseconds[enabled] = 1e9 * (time.perf_counter() - start_time) / num_messages
+  instrumentation.enable()
+  return nanoseconds
+
+
+if __name__ == "__main__":
+  worker_counts = (1, 2, 4, 8)
+  for use_processes in (False, True):
+    label = "processes" if use_processes else "threads"
+    rates = benchmark_scaling(worker_counts, use_processes=use_processes)
+    for num_workers, rate in zip(worker_counts, rates):
+      print(f"{label:9} workers={num_workers:2}  {rate:10.1f} msg/s")
+  for enabled, per_message in benchmark_instrumentation().items():
+    print(f"instrumentation enabled={enabled!s:<5} {per_message:6.0f} ns/message")
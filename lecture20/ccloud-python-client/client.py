@@ -1,6 +1,12 @@
 from confluent_kafka import Consumer
+import os
 import sys
 
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _ROOT not in sys.path:
+  sys.path.append(_ROOT)      # the repository root, for common/
+from common.instrumentation import counter, histogram
+
 def read_config():
   # reads the client configuration from client.properties
   # and returns it as a key-value map
@@ -24,16 +30,23 @@ def consume(topic, config):
   # subscribes to the specified topic
   consumer.subscribe([topic])
 
+  consumed = counter("messages_consumed_total", "messages consumed")
+  empty_polls = counter("empty_polls_total", "polls that returned no message or an error")
+  poll_seconds = histogram("poll_seconds", "time spent in consumer.poll")
+
   try:
     while True:
       # consumer polls the topic and prints any incoming messages
       # 1.0 is the maximum time to block and wait for message.
-      msg = consumer.poll(1.0)
+      with poll_seconds.time():
+        msg = consumer.poll(1.0)
       if msg is not None and msg.error() is None:
+        consumed.inc()
         key = msg.key().decode("utf-8")
         value = msg.value().decode("utf-8")
         print(f"\nConsumed message from topic {topic}: key = {key:12} value = {value:12}")
       else:
+        empty_polls.inc()
         sys.stdout.write(".")
         sys.stdout.flush()
         
@@ -50,4 +63,5 @@ def main():
   consume(topic, config)
 
 
-main()
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,178 @@
+import threading
+import time
+import zlib
+
+
+# An in-memory stand-in for a Kafka cluster.  It implements just enough of the
+# confluent_kafka Consumer interface (subscribe, assign, poll, commit,
+# committed, seek, close) that the consumers in this directory can be
+# exercised and benchmarked without a connection to Confluent Cloud.
+
+# special offsets, with the values confluent_kafka uses
+OFFSET_BEGINNING = -2
+OFFSET_END = -1
+
+
+class LocalMessage:
+  def __init__(self, topic, partition, offset, key, value):
+    self._topic = topic
+    self._partition = partition
+    self._offset = offset
+    self._key = key
+    self._value = value
+
+  def topic(self):
+    return self._topic
+
+  def partition(self):
+    return self._partition
+
+  def offset(self):
+    return self._offset
+
+  def key(self):
+    return self._key
+
+  def value(self):
+    return self._value
+
+  def error(self):
+    return None
+
+
+class LocalTopicPartition:
+  # mirrors confluent_kafka.TopicPartition for use with LocalConsumer.committed
+  def __init__(self, topic, partition, offset=-1001):
+    self.topic = topic
+    self.partition = partition
+    self.offset = offset
+
+  def __repr__(self):
+    return f"LocalTopicPartition({self.topic}, {self.partition}, {self.offset})"
+
+
+def partition_for_key(key, num_partitions):
+  # Kafka hashes keys to pick a partition so that all messages with the same
+  # key land in the same partition and therefore stay in order.
+  if isinstance(key, str):
+    key = key.encode("utf-8")
+  return zlib.crc32(key) % num_partitions
+
+
+class LocalBroker:
+  def __init__(self, num_partitions=4):
+    self.num_partitions = num_partitions
+    self._logs = {}          # (topic, partition) -> list of (key, value)
+    self._committed = {}     # (group, topic, partition) -> next offset to read
+    self._lock = threading.Lock()
+
+  def produce(self, topic, key, value):
+    if isinstance(key, str):
+      key = key.encode("utf-8")
+    if isinstance(value, str):
+      value = value.encode("utf-8")
+    partition = partition_for_key(key, self.num_partitions)
+    with self._lock:
+      log = self._logs.setdefault((topic, partition), [])
+      log.append((key, value))
+      return partition, len(log) - 1
+
+  def end_offset(self, topic, partition):
+    with self._lock:
+      return len(self._logs.get((topic, partition), []))
+
+  def read(self, topic, partition, offset):
+    with self._lock:
+      log = self._logs.get((topic, partition), [])
+      if offset < len(log):
+        key, value = log[offset]
+        return LocalMessage(topic, partition, offset, key, value)
+    return None
+
+  def commit(self, group, topic, partition, offset):
+    with self._lock:
+      self._committed[(group, topic, partition)] = offset
+
+  def committed(self, group, topic, partition):
+    with self._lock:
+      return self._committed.get((group, topic, partition))
+
+
+class LocalConsumer:
+  def __init__(self, broker, config):
+    self.broker = broker
+    self.group = config["group.id"]
+    self.reset = config.get("auto.offset.reset", "earliest")
+    self._positions = {}     # (topic, partition) -> next offset to read
+    self._next_partition = 0
+    self._on_revoke = None
+    self.closed = False
+
+  def subscribe(self, topics, on_assign=None, on_revoke=None):
+    # a single local consumer is assigned every partition of every topic.
+    # Like Kafka, on_assign(consumer, partitions) may call assign() with
+    # explicit starting offsets, and on_revoke(consumer, partitions) is called
+    # when the partitions are taken away, here only on close().
+    partitions = [LocalTopicPartition(topic, partition)
+                  for topic in topics for partition in range(self.broker.num_partitions)]
+    self._on_revoke = on_revoke
+    self.assign(partitions)
+    if on_assign is not None:
+      on_assign(self, partitions)
+
+  def assign(self, partitions):
+    # OFFSET_BEGINNING and OFFSET_END start at either end of the partition;
+    # other partitions without a valid offset start from the committed
+    # offset, or from auto.offset.reset if the group has never committed.
+    for tp in partitions:
+      offset = tp.offset
+      if offset == OFFSET_BEGINNING:
+        offset = 0
+      elif offset == OFFSET_END:
+        offset = self.broker.end_offset(tp.topic, tp.partition)
+      elif offset < 0:
+        offset = self.broker.committed(self.group, tp.topic, tp.partition)
+      if offset is None:
+        offset = 0 if self.reset == "earliest" else self.broker.end_offset(tp.topic, tp.partition)
+      self._positions[(tp.topic, tp.partition)] = offset
+
+  def assignment(self):
+    return [LocalTopicPartition(t, p) for t, p in self._positions]
+
+  def poll(self, timeout=None):
+    # round-robin over the assigned partitions and return the first message found.
+    tps = list(self._positions)
+    for i in range(len(tps)):
+      tp = tps[(self._next_partition + i) % len(tps)]
+      msg = self.broker.read(tp[0], tp[1], self._positions[tp])
+      if msg is not None:
+        self._positions[tp] += 1
+        self._next_partition = (self._next_partition + i + 1) % len(tps)
+        return msg
+    if timeout:
+      time.sleep(min(timeout, 0.01))
+    return None
+
+  def seek(self, partition):
+    self._positions[(partition.topic, partition.partition)] = partition.offset
+
+  def commit(self, message=None, offsets=None, asynchronous=True):
+    if message is not None:
+      offsets = [LocalTopicPartition(message.topic(), message.partition(), message.offset() + 1)]
+    if offsets is None:
+      offsets = [LocalTopicPartition(t, p, o) for (t, p), o in self._positions.items()]
+    for tp in offsets:
+      self.broker.commit(self.group, tp.topic, tp.partition, tp.offset)
+    return offsets
+
+  def committed(self, partitions, timeout=None):
+    result = []
+    for tp in partitions:
+      offset = self.broker.committed(self.group, tp.topic, tp.partition)
+      result.append(LocalTopicPartition(tp.topic, tp.partition, -1001 if offset is None else offset))
+    return result
+
+  def close(self):
+    if self._on_revoke is not None and not self.closed:
+      self._on_revoke(self, self.assignment())
+    self.closed = True
@@ -0,0 +1,343 @@
+import json
+import os
+import sys
+import time
+
+
+# Stateful stream processing that recovers from a snapshot instead of the
+# beginning of the topic.
+#
+# An aggregation over the topic (e.g. running statistics per reactor core)
+# keeps state per key.  With only `auto.offset.reset = earliest` to fall back
+# on, a restarted consumer would have to replay the whole topic to rebuild
+# that state.  Here the state lives in a StateStore, per partition, together
+# with the offset it reflects:
+#
+#   (topic, partition) -> next offset to process, and key -> operator state
+#
+# (a key always maps to the same partition, so the state of a key is only
+# ever in one of them).  Every `snapshot_every` messages (or
+# `snapshot_interval` seconds) the store is written to one file, atomically:
+# a temporary file is written and fsynced and then renamed over the previous
+# snapshot, so the file on disk is always a complete snapshot whose state
+# matches its offsets exactly.  On restart the consumer loads the snapshot
+# and, when partitions are assigned, seeks each to its snapshot offset.  Only
+# the messages after the last snapshot are replayed, so recovery time depends
+# on the snapshot size and interval, not on the length of the topic.
+#
+# The group's committed offsets are advanced after each snapshot, so tools
+# that show consumer lag still work, but the snapshot is what recovery trusts:
+# a partition's state always matches the snapshot offset stored with it.
+#
+# With several members in the group, partitions move between them on a
+# rebalance:
+#  * revoked partitions are snapshotted and committed first, then dropped
+#    from this member's state, so only the current owner holds (and reports)
+#    the state of a partition and no message ends up counted by two members;
+#  * an assigned partition continues from this member's snapshot if it has
+#    one, even when another member has committed past it in the meantime
+#    (the messages in between are not in this member's state yet);
+#  * an assigned partition this member has no state for is rebuilt from the
+#    beginning, not from the group's committed offset, which would leave out
+#    everything before it.
+# The fast path is therefore a restart of the member that last owned a
+# partition, e.g. the only consumer of the group.
+
+SNAPSHOT = "snapshot.json"
+
+# confluent_kafka.OFFSET_BEGINNING, without importing confluent_kafka here
+OFFSET_BEGINNING = -2
+
+
+class StateStore:
+  """
+  Per-partition state plus the offsets it reflects, snapshotted to `directory`.
+  """
+  def __init__(self, directory):
+    self.directory = directory
+    self.path = os.path.join(directory, SNAPSHOT)
+    os.makedirs(directory, exist_ok=True)
+    self.offsets = {}       # (topic, partition) -> next offset to process
+    self.partitions = {}    # (topic, partition) -> {key: state}
+    self.snapshots = 0
+    self.restored = False
+
+  @property
+  def state(self):
+    # key -> state over all partitions
+    return {key: value for state in self.partitions.values() for key, value in state.items()}
+
+  def get(self, tp, key, default=None):
+    return self.partitions.get(tp, {}).get(key, default)
+
+  def put(self, tp, key, value):
+    self.partitions.setdefault(tp, {})[key] = value
+
+  def advance(self, tp, offset):
+    # `offset` has been applied to the state; the next one to read is offset + 1
+    self.offsets[tp] = offset + 1
+
+  def drop(self, tp):
+    self.offsets.pop(tp, None)
+    self.partitions.pop(tp, None)
+
+  def restore(self):
+    """Loads the latest snapshot, if any.  Returns True if one was found."""
+    if not os.path.exists(self.path):
+      return False
+    with open(self.path) as fh:
+      snapshot = json.load(fh)
+    self.offsets, self.partitions = {}, {}
+    for topic, partitions in snapshot["topics"].items():
+      for partition, entry in partitions.items():
+        tp = (topic, int(partition))
+        self.offsets[tp] = entry["offset"]
+        self.partitions[tp] = entry["state"]
+    self.snapshots = snapshot["snapshots"]
+    self.restored = True
+    return True
+
+  def snapshot(self):
+    topics = {}
+    for (topic, partition), offset in self.offsets.items():
+      topics.setdefault(topic, {})[str(partition)] = {
+          "offset": offset, "state": self.partitions.get((topic, partition), {})}
+    self.snapshots += 1
+    tmp = self.path + ".tmp"
+    with open(tmp, "w") as fh:
+      json.dump({"topics": topics, "snapshots": self.snapshots,
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S")}, fh, separators=(",", ":"))
+      fh.flush()
+      os.fsync(fh.fileno())
+    os.replace(tmp, self.path)
+    # make the rename itself durable
+    if hasattr(os, "O_DIRECTORY"):
+      fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+      try:
+        os.fsync(fd)
+      finally:
+        os.close(fd)
+
+  def size(self):
+    return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+
+class StatefulConsumer:
+  """
+  Applies `update` to every message and keeps the result per key in a
+  StateStore.
+
+  Parameters:
+  - topic: topic to consume.
+  - store: StateStore (restored on start).
+  - update: function (old_state or None, key, value_bytes) -> new state for
+    the key.  Keys are decoded from UTF-8.
+  - consumer: consumer to use (e.g. local_broker.LocalConsumer); one is
+    created from `config` if omitted.
+  - snapshot_every, snapshot_interval: snapshot after this many messages or
+    this many seconds, whichever comes first.
+  """
+  def __init__(self, topic, store, update, config=None, consumer=None, group_id="python-state-1",
+               snapshot_every=10000, snapshot_interval=30.0):
+    if consumer is None:
+      from confluent_kafka import Consumer
+      config = dict(config)
+      config["group.id"] = group_id
+      config["auto.offset.reset"] = "earliest"
+      config["enable.auto.commit"] = "false"
+      consumer = Consumer(config)
+    self.topic = topic
+    self.store = store
+    self.update = update
+    self.consumer = consumer
+    self.snapshot_every = snapshot_every
+    self.snapshot_interval = snapshot_interval
+    self.processed = 0
+    self.rebuilt = []         # partitions without state, rebuilt from the beginning
+    self._since_snapshot = 0
+    self._closing = False
+    self._last_snapshot = time.time()
+
+    store.restore()
+    consumer.subscribe([topic], on_assign=self._on_assign, on_revoke=self._on_revoke)
+
+  def _on_assign(self, consumer, partitions):
+    for tp in partitions:
+      key = (tp.topic, tp.partition)
+      offset = self.store.offsets.get(key)
+      if offset is not None:
+        tp.offset = offset
+      else:
+        self.store.drop(key)
+        self.rebuilt.append(key)
+        tp.offset = OFFSET_BEGINNING
+    consumer.assign(partitions)
+
+  def _on_revoke(self, consumer, partitions):
+    # save and commit the work on the partitions before they move; unless
+    # the consumer is closing, their state now belongs to another member.
+    self.snapshot()
+    if not self._closing:
+      for tp in partitions:
+        self.store.drop((tp.topic, tp.partition))
+
+  def snapshot(self):
+    if self._since_snapshot == 0:
+      return
+    self.store.snapshot()
+    offsets = []
+    for tp in self.consumer.assignment():
+      offset = self.store.offsets.get((tp.topic, tp.partition))
+      if offset is not None:
+        tp.offset = offset
+        offsets.append(tp)
+    if offsets:
+      self.consumer.commit(offsets=offsets, asynchronous=False)
+    self._since_snapshot = 0
+    self._last_snapshot = time.time()
+
+  def run(self, max_messages=None, idle_timeout=None):
+    """
+    Processes messages until max_messages have been processed in this call,
+    or no message arrived for idle_timeout seconds (None: run until Ctrl-C).
+    Returns the number processed.
+    """
+    count = 0
+    idle_since = time.time()
+    while max_messages is None or count < max_messages:
+      msg = self.consumer.poll(1.0 if idle_timeout is None else min(1.0, idle_timeout))
+      now = time.time()
+      if msg is None or msg.error() is not None:
+        if idle_timeout is not None and now - idle_since >= idle_timeout:
+          break
+      else:
+        tp = (msg.topic(), msg.partition())
+        key = msg.key().decode("utf-8") if msg.key() is not None else ""
+        self.store.put(tp, key, self.update(self.store.get(tp, key), key, msg.value()))
+        self.store.advance(tp, msg.offset())
+        count += 1
+        self._since_snapshot += 1
+        idle_since = now
+      if self._since_snapshot >= self.snapshot_every or (
+          self._since_snapshot and now - self._last_snapshot >= self.snapshot_interval):
+        self.snapshot()
+    self.processed += count
+    return count
+
+  def close(self):
+    self._closing = True
+    self.snapshot()
+    self.consumer.close()
+
+
+def reactor_stats(old, key, value):
+  # running count, mean temperature and max pressure per reactor core, from
+  # the readings sent by ../ccloud-python-producer/producer.py
+  data = json.loads(value.decode("utf-8"))
+  count, mean, max_pressure = old or (0, 0.0, float("-inf"))
+  count += 1
+  mean += (data["temperature"] - mean) / count
+  return [count, mean, max(max_pressure, data["pressure"])]
+
+
+def consume_stateful(topic, config, store_dir="state", update=reactor_stats, **kwargs):
+  store = StateStore(store_dir)
+  consumer = StatefulConsumer(topic, store, update, config, **kwargs)
+  if store.restored:
+    print(f"restored snapshot {store.snapshots}: {len(store.state)} keys, {store.size()} bytes")
+  try:
+    consumer.run()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    consumer.close()
+  return store.state
+
+
+def main():
+  from client import read_config
+  config = read_config()
+  state = consume_stateful("TestTopic", config, sys.argv[1] if len(sys.argv) > 1 else "state")
+  for key, value in sorted(state.items()):
+    print(f"{key:12} {value}")
+
+
+def local_demo(messages=200_000, crash_after=150_000, snapshot_every=20_000):
+  # crash and recover on the local broker: process part of the topic, stop
+  # without close() (as a killed process would), restart from the snapshot,
+  # and compare with one uninterrupted run.
+  import shutil
+  import tempfile
+  from local_broker import LocalBroker, LocalConsumer
+
+  broker = LocalBroker(num_partitions=4)
+  for i in range(messages):
+    broker.produce("TestTopic", key=f"core{i % 8}",
+                   value=json.dumps({"temperature": 300 + i % 100, "pressure": 5.5 + (i % 13) / 10}))
+
+  def consumer(group):
+    return LocalConsumer(broker, {"group.id": group, "auto.offset.reset": "earliest"})
+
+  directory = tempfile.mkdtemp()
+  try:
+    store = StateStore(os.path.join(directory, "crash"))
+    first = StatefulConsumer("TestTopic", store, reactor_stats, consumer=consumer("crash"),
+                             snapshot_every=snapshot_every)
+    first.run(max_messages=crash_after)
+    print(f"processed {first.processed} messages, {store.snapshots} snapshots, then crashed")
+
+    start_time = time.perf_counter()
+    store = StateStore(os.path.join(directory, "crash"))
+    second = StatefulConsumer("TestTopic", store, reactor_stats, consumer=consumer("crash"),
+                              snapshot_every=snapshot_every)
+    restored = time.perf_counter() - start_time
+    second.run(idle_timeout=0.1)
+    second.close()
+    print(f"restored {store.size()} byte snapshot in {1000 * restored:.2f} ms, "
+          f"then processed {second.processed} messages "
+          f"({first.processed + second.processed - messages} replayed since the last snapshot)")
+
+    start_time = time.perf_counter()
+    full = StateStore(os.path.join(directory, "full"))
+    scratch = StatefulConsumer("TestTopic", full, reactor_stats, consumer=consumer("full"),
+                               snapshot_every=snapshot_every)
+    scratch.run(idle_timeout=0.1)
+    scratch.close()
+    print(f"rebuilding from the beginning of the topic instead: {time.perf_counter() - start_time:.2f} s")
+    print(f"recovered state equals an uninterrupted run: {store.state == full.state}")
+
+    # a new member of the group with no state of its own: it rebuilds every
+    # partition from the beginning rather than starting at the offsets the
+    # group has committed, which would leave out all the earlier messages.
+    for i in range(messages, messages + 10_000):
+      broker.produce("TestTopic", key=f"core{i % 8}",
+                     value=json.dumps({"temperature": 300 + i % 100, "pressure": 5.5 + (i % 13) / 10}))
+    other = StatefulConsumer("TestTopic", StateStore(os.path.join(directory, "other")), reactor_stats,
+                             consumer=consumer("crash"), snapshot_every=snapshot_every)
+    other.run(idle_timeout=0.1)
+    other.close()
+    # the original member again: the group has committed past its snapshot,
+    # and it continues from its own snapshot offsets
+    back = StatefulConsumer("TestTopic", StateStore(os.path.join(directory, "crash")), reactor_stats,
+                            consumer=consumer("crash"), snapshot_every=snapshot_every)
+    back.run(idle_timeout=0.1)
+    back.close()
+    full = StateStore(os.path.join(directory, "full2"))
+    scratch = StatefulConsumer("TestTopic", full, reactor_stats, consumer=consumer("full2"))
+    scratch.run(idle_timeout=0.1)
+    scratch.close()
+    print(f"new member: {len(other.rebuilt)} partitions rebuilt from the beginning, "
+          f"state equals an uninterrupted run: {other.store.state == full.state}")
+    print(f"original member after the group moved on: {back.processed} messages, "
+          f"state equals an uninterrupted run: {back.store.state == full.state}")
+  finally:
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+  # state_store.py [STATE_DIR]   consume TestTopic on Confluent Cloud
+  # state_store.py --local       crash and recovery on the local broker
+  if sys.argv[1:] == ["--local"]:
+    local_demo()
+  else:
+    main()
@@ -0,0 +1,305 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Process
+from confluent_kafka import Consumer, KafkaException, TopicPartition
+import json
+import queue
+import sys
+import threading
+import zlib
+
+from client import read_config
+
+
+# Two ways of spreading CPU-heavy message processing over several workers:
+#
+#  * consume_parallel: one consumer polls the topic and fans messages out to
+#    N worker lanes.  Every key is pinned to one lane, so messages for the same
+#    key (core1, core2, ...) are processed in the order they were produced.
+#    With use_processes=True each lane hands its work to a process pool, which
+#    sidesteps the GIL for pure-Python processing.
+#
+#  * run_consumer_group: N consumer processes join the same consumer group and
+#    Kafka divides the partitions among them.  Ordering per key comes for free
+#    because a key always maps to the same partition.
+#
+# In both modes auto commit is disabled and an offset is only committed once
+# the message (and every earlier message in its partition) has been processed.
+# Several consume_parallel processes can share the group: when a rebalance
+# revokes partitions, their messages already handed to the lanes are finished
+# and committed before the partitions move, and this member stops tracking
+# them.
+
+GROUP_ID = "python-group-1"
+
+
+def decode_and_summarize(key, value):
+  # default processing step: decode the reactor reading sent by producer.py
+  key = key.decode("utf-8") if key is not None else None
+  data = json.loads(value.decode("utf-8"))
+  return key, data
+
+
+def lane_for_key(key, num_lanes):
+  # crc32 rather than hash() so the key -> lane mapping does not change
+  # between runs (str hashing is randomized per interpreter).
+  return zlib.crc32(key or b"") % num_lanes
+
+
+class OffsetTracker:
+  """
+  Tracks which offsets are still being processed in each partition so that
+  we only ever commit an offset once everything before it has completed.
+  """
+  def __init__(self):
+    self._lock = threading.Condition()
+    self._pending = {}      # (topic, partition) -> set of in-flight offsets
+    self._next = {}         # (topic, partition) -> 1 + highest offset seen
+    self._committed = {}    # (topic, partition) -> last offset we committed
+
+  def started(self, topic, partition, offset):
+    with self._lock:
+      self._pending.setdefault((topic, partition), set()).add(offset)
+      self._next[(topic, partition)] = max(self._next.get((topic, partition), 0), offset + 1)
+
+  def finished(self, topic, partition, offset):
+    with self._lock:
+      self._pending[(topic, partition)].discard(offset)
+      self._lock.notify_all()
+
+  def committable(self, partitions=None):
+    """
+    Returns a list of (topic, partition, offset) whose committed position can
+    advance, for all partitions or only those in `partitions`.  The offset is
+    the lowest in-flight offset, or one past the highest offset seen when
+    nothing in the partition is in flight.  Nothing is recorded as committed
+    until mark_committed() is called.
+    """
+    offsets = []
+    with self._lock:
+      for tp, next_offset in self._next.items():
+        if partitions is not None and tp not in partitions:
+          continue
+        pending = self._pending.get(tp)
+        offset = min(pending) if pending else next_offset
+        if self._committed.get(tp) != offset:
+          offsets.append((tp[0], tp[1], offset))
+    return offsets
+
+  def mark_committed(self, offsets):
+    with self._lock:
+      for topic, partition, offset in offsets:
+        if (topic, partition) in self._next:
+          self._committed[(topic, partition)] = offset
+
+  def wait_drained(self, partitions, give_up):
+    # blocks until nothing in `partitions` is in flight, or give_up() is true
+    with self._lock:
+      while any(self._pending.get(tp) for tp in partitions) and not give_up():
+        self._lock.wait(0.1)
+
+  def drop(self, partitions):
+    with self._lock:
+      for tp in partitions:
+        self._pending.pop(tp, None)
+        self._next.pop(tp, None)
+        self._committed.pop(tp, None)
+
+  def in_flight(self):
+    with self._lock:
+      return sum(len(p) for p in self._pending.values())
+
+
+def _run_lane(lane, tracker, process, executor, results, errors):
+  # Each lane processes its messages strictly in arrival order.  A message
+  # whose processing raises is never marked finished, so its offset (and
+  # everything after it in the partition) stays uncommitted and is redelivered
+  # after a restart; the lane records the error and stops.
+  while True:
+    msg = lane.get()
+    if msg is None:
+      break
+    try:
+      if executor is not None:
+        result = executor.submit(process, msg.key(), msg.value()).result()
+      else:
+        result = process(msg.key(), msg.value())
+    except BaseException as error:
+      errors.append((msg, error))
+      return
+    if results is not None:
+      results.append(result)
+    tracker.finished(msg.topic(), msg.partition(), msg.offset())
+
+
+def _put(lane, item, thread, errors):
+  # a timed put, so a lane whose thread has died (or any lane failing) can't
+  # block the poll loop forever on a full queue.  Returns False if the item
+  # could not be queued.
+  while True:
+    try:
+      lane.put(item, timeout=0.1)
+      return True
+    except queue.Full:
+      if errors or not thread.is_alive():
+        return False
+
+
+def commit_processed(consumer, tracker, partitions=None):
+  # offsets only count as committed once the commit has succeeded, so a
+  # failed commit (e.g. during a rebalance) is retried next time.
+  candidates = tracker.committable(partitions)
+  if candidates:
+    consumer.commit(offsets=[TopicPartition(t, p, o) for t, p, o in candidates], asynchronous=False)
+    tracker.mark_committed(candidates)
+  return candidates
+
+
+def _try_commit(consumer, tracker, partitions=None):
+  try:
+    return commit_processed(consumer, tracker, partitions)
+  except KafkaException as error:
+    print(f"commit failed, will retry: {error}", file=sys.stderr)
+    return []
+
+
+def consume_parallel(topic, config, num_workers=4, process=decode_and_summarize,
+                     use_processes=False, max_messages=None, queue_size=1000,
+                     commit_every=100, consumer=None, results=None):
+  """
+  Polls `topic` with a single consumer and processes messages on `num_workers`
+  lanes while preserving per-key ordering.
+
+  Parameters:
+  - process: function (key_bytes, value_bytes) -> result.  Must be picklable
+    when use_processes is True.
+  - use_processes: run `process` in a process pool instead of on the lane threads.
+  - max_messages: stop after this many messages (None runs until Ctrl-C).
+  - queue_size: bound on each lane's queue, which applies backpressure to the poll loop.
+  - commit_every: commit processed offsets after this many polled messages.
+  - consumer: an already constructed consumer (e.g. local_broker.LocalConsumer);
+    one is created from `config` if omitted.
+  - results: optional list that collects the return values of `process`.
+
+  Returns the number of messages consumed.  If `process` raises, dispatching
+  stops, the offsets processed so far are committed (the failed message's is
+  not) and a RuntimeError is raised from the first failure.
+  """
+  if consumer is None:
+    config = dict(config)
+    config["group.id"] = GROUP_ID
+    config["auto.offset.reset"] = "earliest"
+    config["enable.auto.commit"] = "false"
+    consumer = Consumer(config)
+  tracker = OffsetTracker()
+  executor = ProcessPoolExecutor(max_workers=num_workers) if use_processes else None
+  lanes = [queue.Queue(maxsize=queue_size) for _ in range(num_workers)]
+  errors = []
+  threads = [threading.Thread(target=_run_lane, args=(lane, tracker, process, executor, results, errors),
+                              daemon=True)
+             for lane in lanes]
+  for t in threads:
+    t.start()
+
+  def on_revoke(consumer, partitions):
+    # let the lanes finish what they hold of the revoked partitions, commit
+    # it while this member still owns them, and forget them.  A failed or
+    # stopped lane is not waited for: its message stays uncommitted.
+    revoked = {(tp.topic, tp.partition) for tp in partitions}
+    tracker.wait_drained(revoked, lambda: errors or not all(t.is_alive() for t in threads))
+    _try_commit(consumer, tracker, revoked)
+    tracker.drop(revoked)
+
+  consumer.subscribe([topic], on_revoke=on_revoke)
+
+  count = 0
+  try:
+    while (max_messages is None or count < max_messages) and not errors:
+      msg = consumer.poll(1.0)
+      if msg is None or msg.error() is not None:
+        _try_commit(consumer, tracker)
+        continue
+      tracker.started(msg.topic(), msg.partition(), msg.offset())
+      lane = lane_for_key(msg.key(), num_workers)
+      if not _put(lanes[lane], msg, threads[lane], errors):
+        break
+      count += 1
+      if count % commit_every == 0:
+        _try_commit(consumer, tracker)
+
+  except KeyboardInterrupt:
+    pass
+  finally:
+    # drain the lanes so that everything polled gets processed and committed;
+    # a lane that has failed is not waited for.
+    for lane, t in zip(lanes, threads):
+      if _put(lane, None, t, []):
+        t.join()
+    if executor is not None:
+      executor.shutdown()
+    _try_commit(consumer, tracker)
+    consumer.close()
+
+  if errors:
+    msg, error = errors[0]
+    raise RuntimeError(f"processing failed at {msg.topic()}[{msg.partition()}] offset {msg.offset()}") from error
+  return count
+
+
+def consume_and_commit(topic, config, process=decode_and_summarize, max_messages=None):
+  # one member of a consumer group: process each message, then commit it.
+  config = dict(config)
+  config["group.id"] = GROUP_ID
+  config["auto.offset.reset"] = "earliest"
+  config["enable.auto.commit"] = "false"
+  consumer = Consumer(config)
+  consumer.subscribe([topic])
+
+  count = 0
+  try:
+    while max_messages is None or count < max_messages:
+      msg = consumer.poll(1.0)
+      if msg is None or msg.error() is not None:
+        continue
+      process(msg.key(), msg.value())
+      consumer.commit(message=msg, asynchronous=False)
+      count += 1
+  except KeyboardInterrupt:
+    pass
+  finally:
+    consumer.close()
+  return count
+
+
+def run_consumer_group(topic, config, num_consumers=4, process=decode_and_summarize):
+  """
+  Starts `num_consumers` processes that join the same consumer group.  Kafka
+  assigns each of them a share of the topic's partitions, so there is no point
+  in running more consumers than the topic has partitions.
+  """
+  procs = [Process(target=consume_and_commit, args=(topic, config, process))
+           for _ in range(num_consumers)]
+  for p in procs:
+    p.start()
+  try:
+    for p in procs:
+      p.join()
+  except KeyboardInterrupt:
+    for p in procs:
+      p.join()
+
+
+def main():
+  config = read_config()
+  topic = "TestTopic"
+  num_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+  mode = sys.argv[2] if len(sys.argv) > 2 else "threads"
+
+  if mode == "group":
+    run_consumer_group(topic, config, num_consumers=num_workers)
+  else:
+    consume_parallel(topic, config, num_workers=num_workers,
+                     use_processes=(mode == "processes"))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,263 @@
+import itertools
+import os
+import sys
+import numpy as np
+from scipy.special import gammaln
+from scipy.stats import chi2
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)      # the repository root, for common/
+from common.rng_streams import as_generator
+
+
+# Vectorized chi-square tests.  Instead of calling scipy's chisquare or
+# chi2_contingency once per table, every function here takes a whole stack of
+# tables and returns one statistic and one p-value per table.
+#
+#   goodness of fit:  observed has shape (k,) or (B, k)       -- B tables of k cells
+#   contingency:      tables   has shape (r, c) or (B, r, c)  -- B r x c tables
+#
+# Three ways to get the p-value:
+#   'asymptotic'   the chi-square distribution (what scipy does).
+#   'monte_carlo'  simulate tables under the null hypothesis and count how often
+#                  the simulated statistic is at least as large as the observed
+#                  one.  Use this when expected counts are small (< 5).
+#   'exact'        enumerate every possible table and add up the probability of
+#                  those whose statistic is at least as large as the observed one.
+
+
+def chi_square_statistic(observed, expected):
+    """
+    Pearson's statistic sum((O - E)^2 / E) over the last axis.
+    """
+    observed = np.asarray(observed, dtype=float)
+    expected = np.asarray(expected, dtype=float)
+    return np.sum((observed - expected) ** 2 / expected, axis=-1)
+
+
+def _extreme_tail(sim_stats, stat):
+    # The relative tolerance keeps ties from being lost to round-off.
+    return sim_stats >= stat * (1 - 1e-7)
+
+
+def _monte_carlo_p_value(sim_stats, stat):
+    # sim_stats has shape (B, R).  The +1 in the numerator and denominator
+    # counts the observed table as one of the draws and avoids p = 0.
+    count = np.sum(_extreme_tail(sim_stats, stat[:, None]), axis=1)
+    return (count + 1) / (sim_stats.shape[1] + 1)
+
+
+def _compositions(n, k, max_outcomes):
+    # All ways of putting n balls into k cells (stars and bars), shape (M, k).
+    n_outcomes = int(np.round(np.exp(gammaln(n + k) - gammaln(k) - gammaln(n + 1))))
+    if n_outcomes > max_outcomes:
+        raise ValueError(f"exact enumeration needs {n_outcomes} outcomes for n={n}, k={k}; "
+                         f"use method='monte_carlo' or raise max_outcomes")
+    bars = np.array(list(itertools.combinations(range(n + k - 1), k - 1)), dtype=np.int64)
+    bars = bars.reshape(-1, k - 1)
+    edges = np.hstack([np.full((len(bars), 1), -1), bars, np.full((len(bars), 1), n + k - 1)])
+    return np.diff(edges, axis=1) - 1
+
+
+def chisquare_batch(observed, expected=None, method="asymptotic", ddof=0,
+                    n_simulations=10000, rng=None, max_outcomes=2_000_000):
+    """
+    Chi-square goodness-of-fit test for many tables at once.
+
+    Parameters:
+    - observed: observed counts, shape (k,) or (B, k).
+    - expected: expected counts, same shape as observed (or broadcastable to it).
+      Each row is rescaled to the row's observed total.  Defaults to equal counts.
+    - method: 'asymptotic', 'monte_carlo' or 'exact'.
+    - ddof: adjustment to the k - 1 degrees of freedom (asymptotic method only).
+    - n_simulations: number of simulated tables per row for 'monte_carlo'.
+    - rng: a numpy Generator used by 'monte_carlo'.
+    - max_outcomes: refuse 'exact' enumerations larger than this.
+
+    Returns (statistic, p_value), each with shape () or (B,).
+    """
+    observed = np.asarray(observed)
+    squeeze = observed.ndim == 1
+    observed = np.atleast_2d(observed)
+    B, k = observed.shape
+    n = observed.sum(axis=1)
+
+    if expected is None:
+        probs = np.full((B, k), 1.0 / k)
+    else:
+        expected = np.broadcast_to(np.asarray(expected, dtype=float), (B, k))
+        probs = expected / expected.sum(axis=1, keepdims=True)
+    expected = probs * n[:, None]
+    stat = chi_square_statistic(observed, expected)
+
+    if method == "asymptotic":
+        p_value = chi2.sf(stat, k - 1 - ddof)
+
+    elif method == "monte_carlo":
+        rng = as_generator(rng)
+        # one vectorized call draws n_simulations tables for every row: (B, R, k)
+        sims = rng.multinomial(n[:, None], probs[:, None, :], size=(B, n_simulations))
+        sim_stats = chi_square_statistic(sims, expected[:, None, :])
+        p_value = _monte_carlo_p_value(sim_stats, stat)
+
+    elif method == "exact":
+        if not np.issubdtype(observed.dtype, np.integer) and np.any(observed != np.round(observed)):
+            raise ValueError("exact method needs integer counts")
+        p_value = np.empty(B)
+        # rows with the same total share one enumeration of outcomes.
+        for total in np.unique(n):
+            rows = np.nonzero(n == total)[0]
+            outcomes = _compositions(int(total), k, max_outcomes)            # (M, k)
+            log_coef = gammaln(total + 1) - gammaln(outcomes + 1).sum(axis=1)  # (M,)
+            with np.errstate(divide="ignore"):
+                log_probs = log_coef[:, None] + outcomes @ np.log(probs[rows]).T  # (M, b)
+            outcome_stats = chi_square_statistic(outcomes[None, :, :], expected[rows][:, None, :])
+            extreme = _extreme_tail(outcome_stats, stat[rows][:, None])      # (b, M)
+            p_value[rows] = np.sum(np.exp(log_probs.T) * extreme, axis=1)
+        p_value = np.minimum(p_value, 1.0)
+
+    else:
+        raise ValueError(f"unknown method {method!r}")
+
+    if squeeze:
+        return stat[0], p_value[0]
+    return stat, p_value
+
+
+def expected_frequencies(tables):
+    """
+    Expected counts under independence: row total * column total / grand total.
+    """
+    tables = np.asarray(tables, dtype=float)
+    rows = tables.sum(axis=-1, keepdims=True)
+    cols = tables.sum(axis=-2, keepdims=True)
+    return rows * cols / tables.sum(axis=(-2, -1), keepdims=True)
+
+
+def _contingency_statistic(tables, expected, correction):
+    diff = np.abs(tables - expected)
+    if correction:
+        # Yates' continuity correction, as scipy applies it for 1 degree of freedom.
+        diff = np.maximum(diff - 0.5, 0)
+    return np.sum(diff ** 2 / expected, axis=(-2, -1))
+
+
+def _random_tables(row_totals, col_totals, n_simulations, rng):
+    """
+    Draws random r x c tables with the given margins (row_totals (B, r),
+    col_totals (B, c)) as a sequence of hypergeometric draws, one per cell.
+    Each draw is vectorized over all B tables and all simulations.
+    Returns an array of shape (B, R, r, c).
+    """
+    B, r = row_totals.shape
+    c = col_totals.shape[1]
+    cols_left = np.repeat(col_totals[:, None, :], n_simulations, axis=1).astype(np.int64)
+    sims = np.zeros((B, n_simulations, r, c), dtype=np.int64)
+    for i in range(r - 1):
+        need = np.repeat(row_totals[:, None, i], n_simulations, axis=1).astype(np.int64)
+        for j in range(c - 1):
+            rest = cols_left[:, :, j + 1:].sum(axis=2)
+            x = rng.hypergeometric(cols_left[:, :, j], rest, need)
+            sims[:, :, i, j] = x
+            need -= x
+        sims[:, :, i, c - 1] = need
+        cols_left -= sims[:, :, i, :]
+    sims[:, :, r - 1, :] = cols_left
+    return sims
+
+
+def chi2_contingency_batch(tables, method="asymptotic", correction=True,
+                           n_simulations=10000, rng=None):
+    """
+    Chi-square test of independence for many contingency tables at once.
+
+    Parameters:
+    - tables: observed counts, shape (r, c) or (B, r, c).
+    - method: 'asymptotic', 'monte_carlo' (tables with the same margins are
+      simulated) or 'exact' (2 x 2 tables only; enumerates the hypergeometric
+      distribution of the top-left cell).
+    - correction: apply Yates' correction when there is 1 degree of freedom.
+      Like scipy, this only affects the 'asymptotic' method.
+    - n_simulations, rng: used by 'monte_carlo'.
+
+    Returns (statistic, p_value, dof, expected) like scipy's chi2_contingency,
+    with statistic and p_value of shape () or (B,).
+    """
+    tables = np.asarray(tables)
+    squeeze = tables.ndim == 2
+    if squeeze:
+        tables = tables[None]
+    B, r, c = tables.shape
+    dof = (r - 1) * (c - 1)
+    expected = expected_frequencies(tables)
+
+    stat = _contingency_statistic(tables, expected, correction and dof == 1 and method == "asymptotic")
+
+    if method == "asymptotic":
+        p_value = chi2.sf(stat, dof)
+
+    elif method == "monte_carlo":
+        rng = as_generator(rng)
+        sims = _random_tables(tables.sum(axis=2), tables.sum(axis=1), n_simulations, rng)
+        sim_stats = _contingency_statistic(sims, expected[:, None], False)
+        p_value = _monte_carlo_p_value(sim_stats, stat)
+
+    elif method == "exact":
+        if (r, c) != (2, 2):
+            raise ValueError("exact method is only implemented for 2 x 2 tables")
+        row1, row2 = tables[:, 0].sum(axis=1), tables[:, 1].sum(axis=1)
+        col1 = tables[:, :, 0].sum(axis=1)
+        # with the margins fixed the table is determined by its top-left cell,
+        # which is hypergeometric.  Enumerate 0..max over all tables at once.
+        lo = np.maximum(0, col1 - row2)
+        hi = np.minimum(row1, col1)
+        a = np.arange(int(hi.max()) + 1)[None, :]                       # (1, M)
+        valid = (a >= lo[:, None]) & (a <= hi[:, None])                  # (B, M)
+        a_safe = np.where(valid, a, lo[:, None])
+        total = row1 + row2
+        with np.errstate(invalid="ignore"):
+            log_probs = (gammaln(row1 + 1)[:, None] + gammaln(row2 + 1)[:, None]
+                         + gammaln(col1 + 1)[:, None] + gammaln(total - col1 + 1)[:, None]
+                         - gammaln(total + 1)[:, None]
+                         - gammaln(a_safe + 1) - gammaln(row1[:, None] - a_safe + 1)
+                         - gammaln(col1[:, None] - a_safe + 1)
+                         - gammaln(row2[:, None] - col1[:, None] + a_safe + 1))
+        enumerated = np.stack([
+            np.stack([a_safe, row1[:, None] - a_safe], axis=-1),
+            np.stack([col1[:, None] - a_safe, row2[:, None] - col1[:, None] + a_safe], axis=-1),
+        ], axis=-2)                                                       # (B, M, 2, 2)
+        enum_stats = _contingency_statistic(enumerated, expected[:, None], False)
+        extreme = _extreme_tail(enum_stats, stat[:, None]) & valid
+        p_value = np.minimum(np.sum(np.exp(log_probs) * extreme, axis=1), 1.0)
+
+    else:
+        raise ValueError(f"unknown method {method!r}")
+
+    if squeeze:
+        return stat[0], p_value[0], dof, expected[0]
+    return stat, p_value, dof, expected
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(17)
+
+    # Lecture 23: leucistic offspring, observed [83, 17] against expected [75, 25]
+    for method in ("asymptotic", "monte_carlo", "exact"):
+        stat, p = chisquare_batch([83, 17], [75, 25], method=method, rng=rng)
+        print(f"{method:12} chi2 = {stat:.3f}  p = {p:.5f}")
+
+    # Final worksheet: five flavors with 45, 35, 40, 30 and 50 votes
+    stat, p = chisquare_batch([45, 35, 40, 30, 50])
+    print(f"flavors      chi2 = {stat:.3f}  p = {p:.5f}")
+
+    # Tripping socks contingency table
+    socks = np.array([[10, 150], [20, 230], [15, 165], [5, 205]])
+    stat, p, dof, _ = chi2_contingency_batch(socks)
+    print(f"socks        chi2 = {stat:.3f}  p = {p:.5f}  dof = {dof}")
+    stat, p, dof, _ = chi2_contingency_batch(socks, method="monte_carlo", rng=rng)
+    print(f"socks (MC)   chi2 = {stat:.3f}  p = {p:.5f}")
+
+    # Thousands of 2 x 2 A/B segments in one call
+    segments = rng.poisson(20, size=(5000, 2, 2)) + 1
+    stat, p, dof, _ = chi2_contingency_batch(segments, correction=False)
+    print(f"{len(segments)} segments: {np.sum(p < 0.05)} significant at 5%")
@@ -0,0 +1,352 @@
+import math
+import os
+import sys
+import numpy as np
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)      # the repository root, for common/
+from common.rng_streams import as_generator
+
+
+# Differentially private releases of the grouped aggregates used in the
+# course (group means as in the ANOVA groupby('Page'), frequency tables like
+# the chi-square `observed` counts).
+#
+#   accountant = PrivacyAccountant(epsilon=2.0, delta=1e-6, composition="rdp")
+#   engine = DPEngine(accountant, seed=0)
+#   counts = engine.count(df["Page"], epsilon=0.5, groups=PAGES)
+#   means = engine.mean(df["Page"], df["Time"], lower=0, upper=300, epsilon=1.0, groups=PAGES)
+#
+# Each query groups the data once (a key lookup + np.bincount) and adds the noise
+# for every group in a single vectorized draw, so releasing thousands of group
+# statistics costs about as much as computing them.
+#
+# Sensitivity is derived from the query: one person (one row) changes one
+# group's count by 1 and one group's clipped sum by at most max(|lower|,
+# |upper|).  Groups are disjoint, so the whole vector of groups has that same
+# L1 and L2 sensitivity (parallel composition).  Pass `groups` with the full
+# list of possible keys; groups taken from the data itself reveal which keys
+# occur.
+#
+# The accountant adds up what every release spent and refuses a release that
+# would exceed the budget.  Composition:
+#   basic      epsilons and deltas add up.
+#   advanced   the Dwork-Rothblum-Vadhan bound, sqrt(2 k ln(1/delta')) scaling.
+#   rdp        Renyi DP: per-order costs add up exactly and are converted to
+#              (epsilon, delta) at the end; much tighter for many Gaussian
+#              releases.
+
+RDP_ORDERS = np.concatenate([np.linspace(1.25, 10, 36), np.arange(11, 65), [80, 96, 128, 256, 512]])
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+# --- mechanisms -------------------------------------------------------------------
+
+def laplace_mechanism(values, sensitivity, epsilon, rng):
+    values = np.asarray(values, dtype=float)
+    return values + rng.laplace(scale=sensitivity / epsilon, size=values.shape)
+
+
+def _gaussian_delta(sigma, sensitivity, epsilon):
+    # exact delta of the Gaussian mechanism at a given epsilon (Balle & Wang 2018)
+    a = sensitivity / (2 * sigma)
+    b = epsilon * sigma / sensitivity
+    phi = lambda z: 0.5 * math.erfc(-z / math.sqrt(2))
+    return phi(a - b) - math.exp(epsilon) * phi(-a - b)
+
+
+def gaussian_sigma(sensitivity, epsilon, delta):
+    """
+    Smallest noise standard deviation that makes the Gaussian mechanism
+    (epsilon, delta)-DP, for any epsilon (the analytic calibration rather than
+    the sqrt(2 ln(1.25/delta)) / epsilon rule, which needs epsilon < 1).
+    """
+    lo, hi = 1e-6 * sensitivity, sensitivity
+    while _gaussian_delta(hi, sensitivity, epsilon) > delta:
+        hi *= 2
+    for _ in range(100):
+        mid = (lo + hi) / 2
+        if _gaussian_delta(mid, sensitivity, epsilon) > delta:
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+
+def gaussian_mechanism(values, sensitivity, epsilon, delta, rng):
+    values = np.asarray(values, dtype=float)
+    sigma = gaussian_sigma(sensitivity, epsilon, delta)
+    return values + rng.normal(scale=sigma, size=values.shape)
+
+
+# --- accounting -------------------------------------------------------------------
+
+def laplace_rdp(epsilon, orders=RDP_ORDERS):
+    # Renyi divergence of Laplace noise with scale sensitivity / epsilon (Mironov 2017)
+    a = np.asarray(orders, dtype=float)
+    log_terms = np.logaddexp(np.log(a / (2 * a - 1)) + (a - 1) * epsilon,
+                             np.log((a - 1) / (2 * a - 1)) - a * epsilon)
+    return np.minimum(log_terms / (a - 1), epsilon)
+
+
+def gaussian_rdp(noise_multiplier, orders=RDP_ORDERS):
+    # noise_multiplier = sigma / sensitivity
+    return np.asarray(orders, dtype=float) / (2 * noise_multiplier ** 2)
+
+
+def rdp_to_dp(rdp, delta, orders=RDP_ORDERS):
+    orders = np.asarray(orders, dtype=float)
+    epsilons = rdp + np.log(1 / delta) / (orders - 1)
+    best = int(np.argmin(epsilons))
+    return float(epsilons[best]), float(orders[best])
+
+
+class PrivacyAccountant:
+    """
+    Tracks the privacy spent in a session against an (epsilon, delta) budget.
+
+    Parameters:
+    - epsilon, delta: the total budget.
+    - composition: 'basic', 'advanced' or 'rdp'.
+    - slack: the delta' that advanced composition and the RDP conversion
+      spend on top of the mechanisms' own deltas (default delta / 2).
+    """
+    def __init__(self, epsilon, delta=0.0, composition="basic", slack=None):
+        if composition not in ("basic", "advanced", "rdp"):
+            raise ValueError(f"composition must be 'basic', 'advanced' or 'rdp', got {composition!r}")
+        if composition != "basic" and delta <= 0:
+            raise ValueError(f"{composition} composition needs delta > 0")
+        self.epsilon = epsilon
+        self.delta = delta
+        self.composition = composition
+        self.slack = delta / 2 if slack is None else slack
+        self.ledger = []
+        # running sums over the ledger, so a charge costs O(1) rather than
+        # recomposing every earlier release.
+        self._sums = {"epsilon": 0.0, "delta": 0.0, "squares": 0.0, "expm1": 0.0,
+                      "rdp": np.zeros(len(RDP_ORDERS)), "pure_delta": 0.0}
+
+    @staticmethod
+    def _add(sums, entry):
+        # the sums with one more entry; `sums` itself is left unchanged.
+        epsilon = entry["epsilon"]
+        sums = dict(sums, epsilon=sums["epsilon"] + epsilon, delta=sums["delta"] + entry["delta"],
+                    squares=sums["squares"] + epsilon ** 2, expm1=sums["expm1"] + epsilon * math.expm1(epsilon))
+        # rdp: Laplace entries are pure; Gaussian entries use their noise
+        # multiplier and contribute no delta of their own.
+        if entry["mechanism"] == "gaussian":
+            sums["rdp"] = sums["rdp"] + gaussian_rdp(entry["noise_multiplier"])
+        elif entry["mechanism"] == "laplace":
+            sums["rdp"] = sums["rdp"] + laplace_rdp(epsilon)
+        else:
+            sums["rdp"] = sums["rdp"] + epsilon
+            sums["pure_delta"] += entry["delta"]
+        return sums
+
+    def _total(self, sums):
+        basic = (sums["epsilon"], sums["delta"])
+        if self.composition == "basic" or basic[0] == 0:
+            return basic
+        if self.composition == "advanced":
+            # heterogeneous form of the advanced composition theorem; never
+            # worse than basic composition.
+            epsilon = math.sqrt(2 * math.log(1 / self.slack) * sums["squares"]) + sums["expm1"]
+            if epsilon >= basic[0]:
+                return basic
+            return epsilon, basic[1] + self.slack
+        epsilon, _ = rdp_to_dp(sums["rdp"], self.slack)
+        return min(epsilon, basic[0]), self.slack + sums["pure_delta"] if epsilon < basic[0] else basic[1]
+
+    def spent(self):
+        """
+        (epsilon, delta) spent so far under the chosen composition.
+        """
+        return self._total(self._sums)
+
+    def remaining(self):
+        epsilon, delta = self.spent()
+        return self.epsilon - epsilon, self.delta - delta
+
+    def charge(self, mechanism, epsilon, delta=0.0, noise_multiplier=None, label=None):
+        """
+        Records one release, or raises BudgetExceeded (recording nothing) when
+        it would take the session over budget.
+        """
+        entry = {"mechanism": mechanism, "epsilon": epsilon, "delta": delta,
+                 "noise_multiplier": noise_multiplier, "label": label}
+        sums = self._add(self._sums, entry)
+        epsilon_total, delta_total = self._total(sums)
+        if epsilon_total > self.epsilon + 1e-12 or delta_total > self.delta + 1e-15:
+            raise BudgetExceeded(f"{label or mechanism} needs epsilon={epsilon_total:.4f}, delta={delta_total:.2e} "
+                                 f"in total; budget is epsilon={self.epsilon}, delta={self.delta}")
+        self.ledger.append(entry)
+        self._sums = sums
+
+
+# --- grouped queries ----------------------------------------------------------------
+
+def group_index(keys, groups=None):
+    """
+    Returns (groups, index) where index[i] is the position of row i's key in
+    groups.  Rows whose key is not in `groups` get -1.  keys may be a 1-d
+    array or a list of columns (grouping by several keys, e.g. the two
+    dimensions of a contingency table).
+    """
+    if isinstance(keys, (list, tuple)):
+        keys = np.rec.fromarrays([np.asarray(column) for column in keys])
+        if groups is not None:
+            groups = np.rec.fromarrays([np.asarray(column) for column in zip(*groups)], dtype=keys.dtype)
+    keys = np.asarray(keys)
+    if groups is None:
+        groups, index = np.unique(keys, return_inverse=True)
+        return groups, index.ravel()
+    groups = np.asarray(groups)
+    if np.issubdtype(keys.dtype, np.integer) and np.issubdtype(groups.dtype, np.integer) and len(groups):
+        lo, hi = int(groups.min()), int(groups.max())
+        if hi - lo < 4 * len(groups) + 1024:
+            # dense integer keys: a lookup table is O(n), no sorting
+            table = np.full(hi - lo + 1, -1, dtype=np.int64)
+            table[groups - lo] = np.arange(len(groups))
+            if len(keys) and lo <= keys.min() and keys.max() <= hi:
+                return groups, table[keys - lo]
+            index = np.full(len(keys), -1, dtype=np.int64)
+            inside = (keys >= lo) & (keys <= hi)
+            index[inside] = table[keys[inside] - lo]
+            return groups, index
+    order = np.argsort(groups)
+    position = np.searchsorted(groups[order], keys)
+    position = np.clip(position, 0, len(groups) - 1)
+    found = groups[order][position] == keys
+    return groups, np.where(found, order[position], -1)
+
+
+class DPEngine:
+    """
+    Differentially private grouped counts, sums and means.  Every query
+    charges the accountant before anything is released.
+
+    mechanism is 'laplace' (pure epsilon-DP) or 'gaussian' (needs a delta per
+    query).
+    """
+    def __init__(self, accountant, mechanism="laplace", seed=None, rng=None):
+        if mechanism not in ("laplace", "gaussian"):
+            raise ValueError(f"mechanism must be 'laplace' or 'gaussian', got {mechanism!r}")
+        self.accountant = accountant
+        self.mechanism = mechanism
+        self.rng = as_generator(rng, seed)
+
+    def _release(self, values, sensitivity, epsilon, delta, label):
+        if self.mechanism == "laplace":
+            self.accountant.charge("laplace", epsilon, 0.0, noise_multiplier=1 / epsilon, label=label)
+            return laplace_mechanism(values, sensitivity, epsilon, self.rng)
+        if delta is None or delta <= 0:
+            raise ValueError("the Gaussian mechanism needs delta > 0")
+        sigma = gaussian_sigma(sensitivity, epsilon, delta)
+        self.accountant.charge("gaussian", epsilon, delta, noise_multiplier=sigma / sensitivity, label=label)
+        return np.asarray(values, dtype=float) + self.rng.normal(scale=sigma, size=np.shape(values))
+
+    def _count(self, index, n_groups, epsilon, delta):
+        counts = np.bincount(index[index >= 0], minlength=n_groups)
+        return self._release(counts, 1.0, epsilon, delta, "count")
+
+    def _sum(self, index, n_groups, clipped, lower, upper, epsilon, delta):
+        keep = index >= 0
+        sums = np.bincount(index[keep], weights=clipped[keep], minlength=n_groups)
+        return self._release(sums, max(abs(lower), abs(upper)), epsilon, delta, "sum")
+
+    def count(self, keys, epsilon, groups=None, delta=None):
+        """
+        Noisy number of rows per group.  Returns (groups, counts).
+        """
+        groups, index = group_index(keys, groups)
+        return groups, self._count(index, len(groups), epsilon, delta)
+
+    def sum(self, keys, values, lower, upper, epsilon, groups=None, delta=None):
+        """
+        Noisy per-group sum of values clipped to [lower, upper].
+        Returns (groups, sums).
+        """
+        groups, index = group_index(keys, groups)
+        clipped = np.clip(np.asarray(values, dtype=float), lower, upper)
+        return groups, self._sum(index, len(groups), clipped, lower, upper, epsilon, delta)
+
+    def mean(self, keys, values, lower, upper, epsilon, groups=None, delta=None):
+        """
+        Noisy per-group mean as noisy sum / noisy count, each released with
+        half of epsilon (and delta).  Values are clipped to [lower, upper] and
+        shifted to be centered first, which keeps the sum's sensitivity at
+        half the range; the result is clipped back into [lower, upper].
+        Returns (groups, means, noisy_counts).
+        """
+        half_delta = None if delta is None else delta / 2
+        center = (lower + upper) / 2
+        groups, index = group_index(keys, groups)
+        counts = self._count(index, len(groups), epsilon / 2, half_delta)
+        centered = np.clip(np.asarray(values, dtype=float), lower, upper) - center
+        sums = self._sum(index, len(groups), centered, lower - center, upper - center, epsilon / 2, half_delta)
+        means = center + sums / np.maximum(counts, 1.0)
+        return groups, np.clip(means, lower, upper), counts
+
+    def histogram(self, columns, epsilon, groups=None, delta=None):
+        """
+        Noisy contingency table over several key columns, e.g.
+        histogram([df["Sex"], df["Tripped"]], ...).  Returns (cells, counts)
+        with cells a record array of key combinations.
+        """
+        return self.count(list(columns), epsilon, groups, delta)
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(25)
+
+    # four_sessions-style data: time on page for four pages.
+    pages = np.array(["Page 1", "Page 2", "Page 3", "Page 4"])
+    page = rng.choice(pages, size=2000)
+    time_on_page = rng.normal(150, 40, size=2000) + 10 * (page == "Page 3")
+
+    accountant = PrivacyAccountant(epsilon=3.0, delta=1e-6, composition="rdp")
+    engine = DPEngine(accountant, seed=1)
+    _, means, counts = engine.mean(page, time_on_page, lower=0, upper=300, epsilon=1.0, groups=pages)
+    for name, mean, count in zip(pages, means, counts):
+        true = time_on_page[page == name].mean()
+        print(f"{name}: DP mean {mean:7.2f}  true {true:7.2f}  (noisy n = {count:.0f})")
+
+    # a 2x2 frequency table like the chi-square `observed` counts
+    sex = rng.choice(["F", "M"], size=500)
+    tripped = rng.choice(["yes", "no"], size=500, p=[0.3, 0.7])
+    cells, counts = engine.histogram([sex, tripped], epsilon=0.5,
+                                     groups=[("F", "no"), ("F", "yes"), ("M", "no"), ("M", "yes")])
+    for cell, count in zip(cells, counts):
+        print(f"{tuple(cell)}: {count:.1f}")
+    print(f"spent so far: epsilon={accountant.spent()[0]:.3f}, delta={accountant.spent()[1]:.1e}")
+
+    # many groups: noise costs about as much as the groupby itself.
+    n, n_groups = 5_000_000, 10_000
+    keys = rng.integers(0, n_groups, size=n)
+    values = rng.exponential(50, size=n)
+    start_time = time.time()
+    np.bincount(keys, weights=values, minlength=n_groups) / np.bincount(keys, minlength=n_groups)
+    exact = time.time() - start_time
+    engine = DPEngine(PrivacyAccountant(epsilon=1.0), seed=2)
+    start_time = time.time()
+    engine.mean(keys, values, 0, 200, epsilon=1.0, groups=np.arange(n_groups))
+    print(f"{n_groups} group means over {n} rows: exact {exact:.3f} s, DP {time.time() - start_time:.3f} s")
+
+    # composition: 100 Gaussian releases at epsilon=0.1, delta=1e-7 each
+    for composition in ("basic", "advanced", "rdp"):
+        accountant = PrivacyAccountant(epsilon=100, delta=1e-3, composition=composition)
+        engine = DPEngine(accountant, mechanism="gaussian", seed=3)
+        for _ in range(100):
+            engine.count(keys[:1000], epsilon=0.1, delta=1e-7, groups=np.arange(10))
+        epsilon, delta = accountant.spent()
+        print(f"{composition:>8}: 100 Gaussian counts spend epsilon={epsilon:.3f}, delta={delta:.2e}")
+
+    try:
+        PrivacyAccountant(epsilon=1.0).charge("laplace", 1.5)
+    except BudgetExceeded as error:
+        print(f"refused: {error}")
@@ -1,35 +1,42 @@
-
 import numpy as np
 import matplotlib.pyplot as plt
 
-# For reproducibility
-np.random.seed(42)
+OUTPUT = "Exam_Scores_Histogram.png"
+
+
+def generate(seed=42, n=1000, mean=80, sd=12, max_score=100, bins=30):
+    # For reproducibility
+    rng = np.random.default_rng(seed)
+
+    # Generate a normal distribution around mean=80, sd=12
+    scores = rng.normal(loc=mean, scale=sd, size=n)
 
-# Generate a normal distribution around mean=80, sd=12
-scores = np.random.normal(loc=80, scale=12, size=1000)
+    # Clip the upper tail at 100
+    scores_clipped = np.clip(scores, a_min=None, a_max=max_score)
 
-# Clip the upper tail at 100
-scores_clipped = np.clip(scores, a_min=None, a_max=100)
+    # Compute mean and median after clipping
+    mean_score = np.mean(scores_clipped)
+    median_score = np.median(scores_clipped)
 
-# Compute mean and median after clipping
-mean_score = np.mean(scores_clipped)
-median_score = np.median(scores_clipped)
+    # Print to console (optional)
+    print("Mean (Clipped):", mean_score)
+    print("Median (Clipped):", median_score)
 
-# Print to console (optional)
-print("Mean (Clipped):", mean_score)
-print("Median (Clipped):", median_score)
+    # Plot the histogram
+    fig = plt.figure(figsize=(8, 5))
+    plt.hist(scores_clipped, bins=bins, color='skyblue', edgecolor='black')
+    plt.title(f'Histogram of Exam Scores (Clipped at {max_score})')
+    plt.xlabel('Score')
+    plt.ylabel('Frequency')
+    plt.grid(axis='y', alpha=0.75)
+    return fig
 
-# Plot the histogram
-plt.figure(figsize=(8, 5))
-plt.hist(scores_clipped, bins=30, color='skyblue', edgecolor='black')
-plt.title('Histogram of Exam Scores (Clipped at 100)')
-plt.xlabel('Score')
-plt.ylabel('Frequency')
-plt.grid(axis='y', alpha=0.75)
 
-# Save the figure
-plt.savefig("Exam_Scores_Histogram.png", dpi=300, bbox_inches='tight')
-plt.close()
+if __name__ == "__main__":
+    fig = generate()
 
-#plt.show()
+    # Save the figure
+    fig.savefig(OUTPUT, dpi=300, bbox_inches='tight')
+    plt.close(fig)
 
+    #plt.show()
@@ -1,35 +1,42 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
-# For reproducibility
-np.random.seed(42)
+# Written to its own file so it no longer overwrites the diminishing-returns
+# plot from Study_Time_vs_Exam_Score.py that the worksheet uses.
+OUTPUT = "Study_Time_vs_Exam_Score_v1.png"
 
-# Number of data points
-n = 200
 
-# Generate study time (in hours) uniformly between 0 and 10
-study_time = np.random.uniform(0, 10, n)
+def generate(seed=42, n=200, noise_sd=5):
+    # For reproducibility
+    rng = np.random.default_rng(seed)
 
-# Generate exam scores based on a linear trend with random noise
-# Base line: score = 50 + 5 * study_time
-# Add some random normal noise
-noise = np.random.normal(loc=0, scale=5, size=n)
-exam_scores = 50 + 5 * study_time + noise
+    # Generate study time (in hours) uniformly between 0 and 10
+    study_time = rng.uniform(0, 10, n)
 
-# Clip exam scores to the range [0, 100] just to ensure no unrealistic values
-exam_scores = np.clip(exam_scores, 0, 100)
+    # Generate exam scores based on a linear trend with random noise
+    # Base line: score = 50 + 5 * study_time
+    # Add some random normal noise
+    noise = rng.normal(loc=0, scale=noise_sd, size=n)
+    exam_scores = 50 + 5 * study_time + noise
 
-# Plot scatter
-plt.figure(figsize=(8, 5))
-plt.scatter(study_time, exam_scores, c='blue', alpha=0.6, edgecolors='black')
-plt.title('Study Time vs. Exam Score')
-plt.xlabel('Study Time (hours)')
-plt.ylabel('Exam Score')
-plt.grid(True, alpha=0.3)
+    # Clip exam scores to the range [0, 100] just to ensure no unrealistic values
+    exam_scores = np.clip(exam_scores, 0, 100)
 
-# Save to file
-plt.savefig("Study_Time_vs_Exam_Score.png", dpi=300, bbox_inches='tight')
-plt.close()
+    # Plot scatter
+    fig = plt.figure(figsize=(8, 5))
+    plt.scatter(study_time, exam_scores, c='blue', alpha=0.6, edgecolors='black')
+    plt.title('Study Time vs. Exam Score')
+    plt.xlabel('Study Time (hours)')
+    plt.ylabel('Exam Score')
+    plt.grid(True, alpha=0.3)
+    return fig
 
-print("Scatter plot saved to Study_Time_vs_Exam_Score.png")
 
+if __name__ == "__main__":
+    fig = generate()
+
+    # Save to file
+    fig.savefig(OUTPUT, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+
+    print(f"Scatter plot saved to {OUTPUT}")
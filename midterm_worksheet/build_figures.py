@@ -0,0 +1,131 @@
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Builds every figure used by the worksheet in one go.
+#
+# Each generator script exposes generate(**params) -> Figure and is registered
+# below with the PNG it produces.  The figures are rendered with the Agg backend in a process pool, so
+# matplotlib is imported (and its font cache loaded) once per worker rather
+# than once per figure.  A figure is skipped when the hash of its script,
+# parameters and dpi matches the one recorded the last time it was built and
+# the PNG on disk is the one that build produced.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST = os.path.join(BASE_DIR, ".figure_manifest.json")
+
+TASKS = {}
+
+
+def register(name, script, output, dpi=300, **params):
+    """
+    Registers the generator in `script`, which writes `output` (both relative
+    to this directory).  Output names must be unique.
+    """
+    if name in TASKS:
+        raise ValueError(f"figure {name!r} is already registered")
+    script = os.path.join(BASE_DIR, script)
+    output = os.path.join(BASE_DIR, output)
+    for task in TASKS.values():
+        if task["output"] == output:
+            raise ValueError(f"{name!r} and {task['name']!r} would both write {output}")
+    TASKS[name] = {"name": name, "script": script, "output": output, "dpi": dpi, "params": params}
+
+
+def _load(script):
+    module_name = os.path.splitext(os.path.basename(script))[0]
+    spec = importlib.util.spec_from_file_location(module_name, script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _file_hash(path):
+    with open(path, "rb") as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+def task_hash(task):
+    h = hashlib.sha256()
+    h.update(_file_hash(task["script"]).encode())
+    h.update(json.dumps({"params": task["params"], "dpi": task["dpi"]}, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401  (pay the import once per worker)
+
+
+def render(task):
+    # runs in a worker process
+    import matplotlib.pyplot as plt
+    start_time = time.time()
+    module = _load(task["script"])
+    fig = module.generate(**task["params"])
+    fig.savefig(task["output"], dpi=task["dpi"], bbox_inches='tight')
+    plt.close(fig)
+    return task["name"], _file_hash(task["output"]), time.time() - start_time
+
+
+def _read_manifest():
+    if os.path.exists(MANIFEST):
+        with open(MANIFEST) as fh:
+            return json.load(fh)
+    return {}
+
+
+def _write_manifest(manifest):
+    tmp = MANIFEST + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    os.replace(tmp, MANIFEST)
+
+
+def build(names=None, force=False, max_workers=None):
+    """
+    Renders the registered figures that are out of date.  Returns the list of
+    figure names that were rebuilt.
+    """
+    manifest = _read_manifest()
+    tasks = [TASKS[name] for name in (names or TASKS)]
+
+    stale = []
+    for task in tasks:
+        entry = manifest.get(task["name"], {})
+        up_to_date = (not force
+                      and entry.get("source") == task_hash(task)
+                      and os.path.exists(task["output"])
+                      and entry.get("output") == _file_hash(task["output"]))
+        if up_to_date:
+            print(f"{task['name']}: up to date")
+        else:
+            stale.append(task)
+
+    if stale:
+        workers = min(len(stale), max_workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for name, output_hash, elapsed in pool.map(render, stale):
+                manifest[name] = {"source": task_hash(TASKS[name]), "output": output_hash}
+                print(f"{name}: wrote {os.path.basename(TASKS[name]['output'])} ({elapsed:.2f} s)")
+        _write_manifest(manifest)
+
+    return [task["name"] for task in stale]
+
+
+register("exam_scores_histogram", "Exam_Scores_Histogram.py", "Exam_Scores_Histogram.png")
+register("study_time_vs_exam_score", "Study_Time_vs_Exam_Score.py", "Study_Time_vs_Exam_Score.png")
+register("study_time_vs_exam_score_v1", "Study_Time_vs_Exam_Score_v1.py",
+         "Study_Time_vs_Exam_Score_v1.png")
+
+
+if __name__ == "__main__":
+    force = "--force" in sys.argv
+    names = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    build(names or None, force=force)